@@ -0,0 +1,17 @@
+"""Configuration de gunicorn, lue au lancement depuis la racine du projet
+
+REPXP_SERVEUR choisit le mode de service :
+- « wsgi » (par défaut) : repxp.wsgi avec les workers synchrones ;
+- « asgi » : repxp.asgi avec des workers uvicorn, où une requête lente
+  n'occupe plus tout un worker pendant qu'elle attend la base ou le cache.
+
+Le nombre de workers reste réglé par WEB_CONCURRENCY.
+"""
+
+import os
+
+if os.environ.get("REPXP_SERVEUR", "wsgi") == "asgi":
+    wsgi_app = "repxp.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "repxp.wsgi:application"
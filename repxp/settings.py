@@ -41,7 +41,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'site_web.statiques.ServeurStatiques',
+    'site_web.metriques.MesureMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,7 +55,8 @@ ROOT_URLCONF = 'repxp.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates chronométré pour les métriques par vue
+        'BACKEND': 'site_web.metriques.GabaritsMesures',
         'DIRS': [os.path.join(BASE_DIR, "templates")],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -70,22 +72,80 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "repxp.wsgi.application"
 
+# Mode de service : « wsgi » (workers synchrones) ou « asgi » (workers uvicorn), voir gunicorn.conf.py
+SERVEUR = os.environ.get('REPXP_SERVEUR', 'wsgi')
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# Réglages appliqués par SQLite à chaque nouvelle connexion : journal WAL (les lectures ne bloquent
+# plus l'écriture), fsync seulement aux points de contrôle, lecture par mmap, attente d'un verrou
+# plutôt qu'une erreur « database is locked » et cache de pages de 20 Mo. BEGIN IMMEDIATE prend le
+# verrou d'écriture dès le début de la transaction : une transaction qui lit puis écrit ne peut plus
+# échouer sans attendre en voulant passer du verrou de lecture au verrou d'écriture.
+SQLITE_OPTIONS = {
+    'init_command': (
+        'PRAGMA busy_timeout=20000;'
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA mmap_size=134217728;'
+        'PRAGMA cache_size=-20000;'
+    ),
+    'transaction_mode': 'IMMEDIATE',
+}
+# Pool de connexions natif de Django 5.2 (psycopg 3) ; REPXP_POOL=0 revient aux connexions persistantes
+POOL_BASE = os.environ.get('REPXP_POOL', '1') == '1'
+
 if os.environ.get('DATABASE_URL'):
     # Use PostgreSQL on Heroku
-    DATABASES = {
-        'default': dj_database_url.config(conn_max_age=600, ssl_require=True)
-    }
+    if POOL_BASE:
+        # Le pool remplace les connexions persistantes : CONN_MAX_AGE doit rester à 0. Avec
+        # CONN_HEALTH_CHECKS, une connexion est vérifiée avant d'être prêtée et remplacée si le serveur l'a coupée.
+        DATABASES = {
+            'default': dj_database_url.config(conn_max_age=0, conn_health_checks=True, ssl_require=True)
+        }
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(os.environ.get('REPXP_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('REPXP_POOL_MAX', 10)),
+            'timeout': 10,
+            'max_idle': 300,
+        }
+    else:
+        DATABASES = {
+            'default': dj_database_url.config(conn_max_age=600, conn_health_checks=True, ssl_require=True)
+        }
 else:
     # Use SQLite for local development
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            'OPTIONS': SQLITE_OPTIONS,
         }
     }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Cache sur disque partagé par tous les workers gunicorn d'une même machine.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, '.cache', 'default'),
+    },
+    'select2': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, '.cache', 'select2'),
+        'TIMEOUT': 60 * 60 * 24,
+    },
+}
+SELECT2_CACHE_BACKEND = 'select2'
+# Entrées gardées en mémoire par chaque processus devant le cache partagé (site_web.caches) ; 0 la désactive
+CACHE_LOCAL_ENTREES = int(os.environ.get('REPXP_CACHE_LOCAL', '512'))
+
+# Métriques par vue (/metrics) : un fichier par processus, additionnés à la lecture
+METRIQUES_DOSSIER = os.path.join(BASE_DIR, '.cache', 'metriques')
+# Jeton « Authorization: Bearer … » d'un collecteur Prometheus, en plus des comptes du personnel
+METRIQUES_JETON = os.environ.get('METRIQUES_JETON')
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -106,13 +166,25 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# STATICFILES_STORAGE n'est plus lu depuis Django 5.1 : les stockages passent par STORAGES
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'site_web.statiques.StockageStatiques'},
+}
 LOGOUT_REDIRECT_URL = '/'
 LOGIN_URL = '/accounts/signin'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # Activate Django-Heroku.
-django_heroku.settings(locals())
+# Les statiques sont déjà configurées : django_heroku ajouterait un second WhiteNoise, seulement synchrone.
+# La base est déjà configurée : django_heroku remettrait conn_max_age=600, incompatible avec le pool
+django_heroku.settings(locals(), staticfiles=False, databases=False)
+
+if SERVEUR == 'asgi':
+    # Sous ASGI chaque requête ouvre sa propre connexion : une connexion persistante ne serait jamais réutilisée
+    # (le pool, lui, les réutilise)
+    for base in DATABASES.values():
+        base['CONN_MAX_AGE'] = 0
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
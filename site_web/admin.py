@@ -1,11 +1,34 @@
 """Affichage de la base de données sur la partie admin du site"""
 
 from django.contrib import admin
-from .models import User, GroupeMusculaire, Exercice, Entrainement, ExerciceEntrainement, Badge, Statistiques
+from . import exports
+from .models import User, GroupeMusculaire, Exercice, Entrainement, ExerciceEntrainement, Badge, Statistiques, CompletionEntrainement
+
+
+class ExportEnFluxMixin:
+    """Actions d'export en flux de la sélection, jointures comprises (voir exports.MODELES)"""
+
+    actions = ["exporter_csv", "exporter_jsonl", "exporter_colonnes"]
+
+    def _exporter(self, request, queryset, format):
+        nom = next(nom for nom, (modele, _) in exports.MODELES.items() if modele is self.model)
+        return exports.reponse(request, [exports.MODELES[nom][1](queryset)], format, f"repxp-{nom}")
+
+    @admin.action(description="Exporter la sélection en CSV")
+    def exporter_csv(self, request, queryset):
+        return self._exporter(request, queryset, "csv")
+
+    @admin.action(description="Exporter la sélection en JSON Lines")
+    def exporter_jsonl(self, request, queryset):
+        return self._exporter(request, queryset, "jsonl")
+
+    @admin.action(description="Exporter la sélection en colonnes")
+    def exporter_colonnes(self, request, queryset):
+        return self._exporter(request, queryset, "colonnes")
 
 # Register your models here.
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(ExportEnFluxMixin, admin.ModelAdmin):
     """Affichage des utilisateurs"""
 
     list_display = (
@@ -56,7 +79,7 @@ class ExerciceAdmin(admin.ModelAdmin):
     search_field = "nom"
 
 @admin.register(Entrainement)
-class EntrainementAdmin(admin.ModelAdmin):
+class EntrainementAdmin(ExportEnFluxMixin, admin.ModelAdmin):
     """Affichage des entrainements"""
 
     list_display = (
@@ -96,7 +119,7 @@ class BadgeAdmin(admin.ModelAdmin):
     prepopulated_fields = {"code": ("nom",)}
 
 @admin.register(Statistiques)
-class StatistiquesAdmin(admin.ModelAdmin):
+class StatistiquesAdmin(ExportEnFluxMixin, admin.ModelAdmin):
     """Affichage des statistiques"""
 
     list_display = (
@@ -109,4 +132,24 @@ class StatistiquesAdmin(admin.ModelAdmin):
         "badges_obtenus"
     )
     list_filter = ("user_id",)
-    search_fields = ("user_id__username",)
\ No newline at end of file
+    search_fields = ("user_id__username",)
+
+@admin.register(CompletionEntrainement)
+class CompletionEntrainementAdmin(admin.ModelAdmin):
+    """Affichage du journal des complétions"""
+
+    list_display = (
+        "id",
+        "user",
+        "entrainement",
+        "date_completion",
+        "sets",
+        "reps",
+        "exercices",
+        "entrainements"
+    )
+    list_filter = ("date_completion", "est_reprise")
+    search_fields = ("user__username",)
+
+    def has_change_permission(self, request, obj=None):
+        return False
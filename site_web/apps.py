@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SiteWebConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'site_web'
+
+    def ready(self):
+        from . import signals  # noqa: F401
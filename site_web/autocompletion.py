@@ -0,0 +1,91 @@
+"""Index de préfixes en mémoire pour l'autocomplétion des exercices
+
+Chaque processus garde une liste triée des débuts de mots des noms d'exercices
+approuvés (sans accents) et y cherche un préfixe par bisection, sans requête
+à la base. L'index est construit au premier appel et porte un numéro de
+version conservé dans le cache ; les signaux incrémentent ce numéro quand un
+exercice est approuvé, modifié ou supprimé, et chaque processus reconstruit
+son index au prochain appel. Une durée de vie maximale borne le retard quand
+le cache n'est pas partagé entre les processus.
+"""
+
+import bisect
+import threading
+import time
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from . import caches
+from .models import Exercice
+from .recherche import normaliser
+
+ESPACE = 'autocompletion'
+DUREE_VIE = 300
+LIMITE = 10
+
+_verrou = threading.Lock()
+_index = None
+
+
+class _Index:
+    def __init__(self, version):
+        self.version = version
+        self.construit = time.monotonic()
+        entrees = []
+        exercices = Exercice.objects.filter(est_approuve=True).values_list('id', 'nom', 'groupe_musculaire__nom')
+        for exercice_id, nom, groupe in exercices:
+            nom_normalise = normaliser(nom)
+            debut = 0
+            for mot in nom_normalise.split():
+                debut = nom_normalise.index(mot, debut)
+                entrees.append((nom_normalise[debut:], debut, exercice_id, nom, groupe))
+                debut += len(mot)
+        entrees.sort()
+        self.cles = [entree[0] for entree in entrees]
+        self.entrees = entrees
+
+    def perime(self, version):
+        return version != self.version or time.monotonic() - self.construit > DUREE_VIE
+
+    def chercher(self, prefixe, limite):
+        resultats = {}
+        position = bisect.bisect_left(self.cles, prefixe)
+        while position < len(self.cles) and self.cles[position].startswith(prefixe):
+            cle, debut, exercice_id, nom, groupe = self.entrees[position]
+            resultats.setdefault(exercice_id, (debut, nom, groupe))
+            position += 1
+        # Les noms qui commencent par le préfixe passent avant ceux où il débute un mot plus loin
+        meilleurs = sorted(resultats.items(), key=lambda item: (item[1][0], item[1][1]))[:limite]
+        return [{'id': exercice_id, 'nom': nom, 'groupe': groupe} for exercice_id, (_, nom, groupe) in meilleurs]
+
+
+@receiver(setting_changed)
+def _oublier_index(setting, **kwargs):
+    """Un autre cache partagé recommence ses versions à 1 : l'index en mémoire ne peut plus s'y fier"""
+    global _index
+    if setting == "CACHES":
+        _index = None
+
+
+def invalider():
+    """Demande à tous les processus de reconstruire leur index au prochain appel"""
+    caches.invalider(ESPACE)
+
+
+def index():
+    global _index
+    courante = caches.version(ESPACE)
+    if _index is None or _index.perime(courante):
+        with _verrou:
+            if _index is None or _index.perime(courante):
+                _index = _Index(courante)
+    return _index
+
+
+def suggestions(prefixe, limite=LIMITE):
+    """Exercices approuvés dont un mot du nom commence par le préfixe ; toutes les correspondances si « limite » est None"""
+    prefixe = ' '.join(normaliser(prefixe).split())
+    if not prefixe:
+        return []
+    return index().chercher(prefixe, limite)
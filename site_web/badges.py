@@ -0,0 +1,245 @@
+"""Règles d'attribution des badges des défis
+
+Le code d'un badge désigne son critère : « reps-1000 » est obtenu à 1000
+répétitions effectuées, « entrainements-10 » à dix entraînements complétés
+(voir PREFIXES et REGLES). Un badge dont le code n'est pas une règle reste
+attribué à la main.
+
+Un défi est borné dans le temps : seule compte l'activité enregistrée dans le
+journal des complétions entre sa création et sa date limite, pas les
+compteurs accumulés avant qu'il existe. Les compteurs de Statistiques, qui
+bornent cette activité par le haut, servent de premier tri.
+
+Après une complétion, evaluer() ne regarde que les règles des défis en cours
+qui portent sur les compteurs modifiés ; ces règles sont gardées dans le
+cache et les signaux des badges et des défis l'invalident. evaluer_defi()
+note tous les utilisateurs sur un défi avec quelques requêtes ensemblistes
+par badge. Statistiques.badges_obtenus compte les progressions complétées.
+"""
+
+import re
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models import Count, DateTimeField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import caches, classement, profils
+from .models import CompletionEntrainement, DefiBadge, Defis, Statistiques, UserBadgeProgress
+
+ESPACE = "regles_defis"
+DUREE_VIE = 3600
+
+# Préfixe du code -> compteur de Statistiques
+PREFIXES = {
+    "reps": "reps_effectuees",
+    "series": "sets_effectues",
+    "sets": "sets_effectues",
+    "entrainements": "entrainements_completes",
+    "exercices": "exercices_completes",
+}
+
+# Compteur de Statistiques -> champ du journal des complétions dont il est la somme
+JOURNAL = {
+    "reps_effectuees": "reps",
+    "sets_effectues": "sets",
+    "entrainements_completes": "entrainements",
+    "exercices_completes": "exercices",
+}
+
+# Codes nommés -> (compteur, seuil)
+REGLES = {
+    "premier-entrainement": ("entrainements_completes", 1),
+}
+
+_CODE = re.compile(rf"^({'|'.join(PREFIXES)})-(\d+)$")
+
+Regle = namedtuple("Regle", "defi_id badge_id compteur seuil date_debut date_limite")
+
+
+def critere(code):
+    """(compteur, seuil) désigné par un code de badge, ou None"""
+    if code in REGLES:
+        return REGLES[code]
+    correspondance = _CODE.match(code or "")
+    if correspondance:
+        return PREFIXES[correspondance[1]], int(correspondance[2])
+    return None
+
+
+def invalider():
+    caches.invalider(ESPACE)
+
+
+def _regles():
+    regles = []
+    liens = (
+        DefiBadge.objects
+        .filter(defi__date_limite__gt=timezone.now())
+        .values_list("defi_id", "badge_id", "badge__code", "defi__date_creation", "defi__date_limite")
+    )
+    for defi_id, badge_id, code, date_debut, date_limite in liens:
+        regle = critere(code)
+        if regle is not None:
+            regles.append(Regle(defi_id, badge_id, *regle, date_debut, date_limite))
+    return regles
+
+
+def regles_actives():
+    """Règles des badges des défis non échus"""
+    regles = caches.obtenir(ESPACE, (), _regles, DUREE_VIE)
+    maintenant = timezone.now()
+    return [regle for regle in regles if regle.date_limite > maintenant]
+
+
+def activite(debut, fin):
+    """Complétions enregistrées entre deux dates, hors reprise des compteurs antérieurs au journal"""
+    return CompletionEntrainement.objects.filter(est_reprise=False, date_completion__gte=debut, date_completion__lte=fin)
+
+
+def _totaux_fenetres(user_id, regles):
+    """{(défi, compteur): total de l'utilisateur dans la fenêtre du défi}, en une requête"""
+    agregats = {
+        f"d{regle.defi_id}_{regle.compteur}": Coalesce(Sum(
+            JOURNAL[regle.compteur],
+            filter=Q(date_completion__gte=regle.date_debut, date_completion__lte=regle.date_limite),
+        ), 0)
+        for regle in regles
+    }
+    totaux = activite(min(regle.date_debut for regle in regles), max(regle.date_limite for regle in regles)) \
+        .filter(user_id=user_id).aggregate(**agregats)
+    return {(regle.defi_id, regle.compteur): totaux[f"d{regle.defi_id}_{regle.compteur}"] for regle in regles}
+
+
+def recompter(statistiques=None):
+    """Recalcule badges_obtenus à partir des progressions complétées, en une requête"""
+    obtenus = (
+        UserBadgeProgress.objects
+        .filter(user_id=OuterRef("user_id_id"), est_complete=True)
+        .values("user_id")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    statistiques = Statistiques.objects.all() if statistiques is None else statistiques
+    return statistiques.update(badges_obtenus=Coalesce(Subquery(obtenus, output_field=IntegerField()), 0))
+
+
+def evaluer(statistiques, compteurs=None):
+    """Complète les progressions que l'utilisateur satisfait désormais ; retourne leur nombre
+
+    « compteurs » limite l'évaluation aux règles qui portent sur ces champs de
+    Statistiques, ceux qu'une complétion vient de modifier.
+    """
+    # Le compteur de toute une vie borne l'activité dans la fenêtre d'un défi : premier tri sans requête
+    candidates = [
+        regle for regle in regles_actives()
+        if (compteurs is None or regle.compteur in compteurs) and getattr(statistiques, regle.compteur) >= regle.seuil
+    ]
+    if not candidates:
+        return 0
+
+    user_id = statistiques.user_id_id
+    totaux = _totaux_fenetres(user_id, candidates)
+    satisfaites = [regle for regle in candidates if totaux[(regle.defi_id, regle.compteur)] >= regle.seuil]
+    if not satisfaites:
+        return 0
+
+    maintenant = timezone.now()
+    with transaction.atomic():
+        existantes = {
+            (progression.defi_id, progression.badge_id): progression
+            for progression in UserBadgeProgress.objects.select_for_update().filter(
+                user_id=user_id, defi_id__in={regle.defi_id for regle in satisfaites},
+            )
+        }
+        a_completer = [
+            existantes[cle].pk for cle in ((regle.defi_id, regle.badge_id) for regle in satisfaites)
+            if cle in existantes and not existantes[cle].est_complete
+        ]
+        nouvelles = [
+            UserBadgeProgress(
+                user_id=user_id, badge_id=regle.badge_id, defi_id=regle.defi_id,
+                est_complete=True, date_completion=maintenant,
+            )
+            for regle in satisfaites if (regle.defi_id, regle.badge_id) not in existantes
+        ]
+        if not a_completer and not nouvelles:
+            return 0
+
+        UserBadgeProgress.objects.filter(pk__in=a_completer).update(est_complete=True, date_completion=maintenant)
+        UserBadgeProgress.objects.bulk_create(nouvelles, ignore_conflicts=True)
+        # Recompté plutôt qu'incrémenté : deux complétions simultanées ne comptent pas deux fois un badge
+        statistiques.badges_obtenus = UserBadgeProgress.objects.filter(user_id=user_id, est_complete=True).count()
+        Statistiques.objects.filter(pk=statistiques.pk).update(badges_obtenus=statistiques.badges_obtenus)
+    return len(a_completer) + len(nouvelles)
+
+
+def _inserer_completees(defi_id, badge_id, atteints, maintenant):
+    """INSERT … SELECT des progressions complétées des utilisateurs qui n'en ont pas encore pour ce badge"""
+    lignes = (
+        atteints
+        .exclude(user_id__in=UserBadgeProgress.objects.filter(defi_id=defi_id, badge_id=badge_id).values("user_id"))
+        .annotate(
+            badge=Value(badge_id),
+            defi=Value(defi_id),
+            complete=Value(True),
+            date=Value(maintenant, output_field=DateTimeField()),
+            fige=Value(False),
+        )
+        .values_list("user_id", "badge", "defi", "complete", "date", "fige")
+        .order_by()
+        .distinct()
+    )
+    sql, parametres = lignes.query.sql_with_params()
+    nom = connection.ops.quote_name
+    colonnes = ", ".join(
+        nom(colonne) for colonne in ("user_id", "badge_id", "defi_id", "est_complete", "date_completion", "est_fige")
+    )
+    with connection.cursor() as curseur:
+        curseur.execute(f"INSERT INTO {nom(UserBadgeProgress._meta.db_table)} ({colonnes}) {sql}", parametres)
+        return curseur.rowcount
+
+
+def evaluer_defi(defi):
+    """Note tous les utilisateurs sur les badges d'un défi sans boucle par utilisateur
+
+    Pour chaque badge à règle : un UPDATE des progressions déjà ouvertes et un
+    INSERT … SELECT pour les autres utilisateurs dont l'activité entre la
+    création du défi et sa date limite atteint le seuil ; puis
+    badges_obtenus et son classement sont recalculés en bloc. Retourne le
+    nombre de progressions complétées.
+    """
+    defi_id = defi.pk if isinstance(defi, Defis) else defi
+    fenetre = Defis.objects.filter(pk=defi_id).values("date_creation", "date_limite", "date_cloture").first()
+    if fenetre is None or fenetre["date_cloture"] is not None:
+        return 0  # progressions figées à la clôture
+    maintenant = timezone.now()
+    completees = 0
+    with transaction.atomic():
+        for badge_id, code in DefiBadge.objects.filter(defi_id=defi_id).values_list("badge_id", "badge__code"):
+            regle = critere(code)
+            if regle is None:
+                continue
+            compteur, seuil = regle
+            actifs = (
+                activite(fenetre["date_creation"], fenetre["date_limite"])
+                .values("user_id")
+                .annotate(total=Sum(JOURNAL[compteur]))
+                .filter(total__gte=seuil)
+                .values("user_id")
+            )
+            atteints = Statistiques.objects.filter(user_id__in=actifs)
+            completees += UserBadgeProgress.objects.filter(
+                defi_id=defi_id, badge_id=badge_id, est_complete=False, user_id__in=atteints.values("user_id"),
+            ).update(est_complete=True, date_completion=maintenant)
+            completees += _inserer_completees(defi_id, badge_id, atteints, maintenant)
+
+        if completees:
+            recompter(Statistiques.objects.filter(
+                user_id__in=UserBadgeProgress.objects.filter(defi_id=defi_id).values("user_id"),
+            ))
+            classement.reconstruire(["badges_obtenus"])
+    if completees:
+        profils.invalider_tout()
+    return completees
@@ -0,0 +1,156 @@
+"""Banc d'essai des écritures concurrentes sous SQLite
+
+Plusieurs threads complètent des entraînements en même temps, chacun avec sa
+propre connexion, pendant que d'autres lisent le classement. Chaque profil
+de connexion est mesuré sur sa propre base SQLite temporaire : « defaut »
+(journal de rollback, transactions différées, délai de 5 s du module
+sqlite3) et « optimise » (settings.SQLITE_OPTIONS). On compte les
+complétions réussies, les erreurs « database is locked », le débit et la
+latence des écritures, et le nombre de lectures faites pendant ce temps.
+"""
+
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections
+from django.test import override_settings
+
+from . import banc_essai, classement, completions, generation, metriques
+from .models import Entrainement, User
+
+PROFILS = {
+    "defaut": {},
+    "optimise": settings.SQLITE_OPTIONS,
+}
+
+
+@contextmanager
+def base_temporaire(options):
+    """Base SQLite neuve et migrée, ouverte avec les OPTIONS données, et cache temporaire"""
+    reglages = connections.settings[DEFAULT_DB_ALIAS]
+    if reglages["ENGINE"] != "django.db.backends.sqlite3":
+        raise ValueError("Le banc de concurrence ne s'applique qu'à SQLite")
+    avant = {"NAME": reglages["NAME"], "OPTIONS": reglages["OPTIONS"]}
+    temporaire = tempfile.mkdtemp()
+    caches = override_settings(
+        CACHES={
+            nom: {**configuration, "LOCATION": str(Path(temporaire) / nom)}
+            for nom, configuration in settings.CACHES.items()
+        },
+        METRIQUES_DOSSIER=str(Path(temporaire) / "metriques"),
+    )
+    # Les threads créent leurs connexions à partir de ce même dictionnaire de réglages
+    connection.close()
+    reglages.update(NAME=str(Path(temporaire) / "banc.sqlite3"), OPTIONS=dict(options))
+    try:
+        with caches:
+            call_command("migrate", verbosity=0, interactive=False)
+            yield
+            metriques.registre.vider()
+    finally:
+        connection.close()
+        reglages.update(avant)
+        shutil.rmtree(temporaire, ignore_errors=True)
+
+
+def _ecrire(user, entrainements, completions_par_ecrivain, depart, resultats, verrou):
+    durees, reussies, verrouillees = [], 0, 0
+    depart.wait()
+    try:
+        for iteration in range(completions_par_ecrivain):
+            entrainement = entrainements[iteration % len(entrainements)]
+            debut = time.perf_counter()
+            try:
+                completions.completer_entrainement(user, entrainement, uuid.uuid4().hex)
+                reussies += 1
+            except OperationalError as erreur:
+                if "locked" not in str(erreur):
+                    raise
+                verrouillees += 1
+            durees.append((time.perf_counter() - debut) * 1000)
+    finally:
+        connections.close_all()
+    with verrou:
+        resultats["durees"].extend(durees)
+        resultats["reussies"] += reussies
+        resultats["verrouillees"] += verrouillees
+
+
+def _lire(depart, arret, resultats, verrou):
+    lectures, verrouillees = 0, 0
+    depart.wait()
+    try:
+        while not arret.is_set():
+            try:
+                list(classement.RangsClassement(classement.CHAMP_DEFAUT)[0:50])
+                lectures += 1
+            except OperationalError as erreur:
+                if "locked" not in str(erreur):
+                    raise
+                verrouillees += 1
+    finally:
+        connections.close_all()
+    with verrou:
+        resultats["lectures"] += lectures
+        resultats["lectures_verrouillees"] += verrouillees
+
+
+def mesurer(ecrivains=8, lecteurs=2, completions_par_ecrivain=50):
+    """Lance écrivains et lecteurs sur la base courante ; retourne le résumé"""
+    athletes = list(User.objects.filter(is_staff=False, proposed_exercices__isnull=False).distinct().order_by("id")[:ecrivains])
+    travail = [(user, list(Entrainement.objects.filter(createur=user))) for user in athletes]
+    connection.close()
+
+    resultats = {"durees": [], "reussies": 0, "verrouillees": 0, "lectures": 0, "lectures_verrouillees": 0}
+    verrou, depart, arret = threading.Lock(), threading.Barrier(len(travail) + lecteurs + 1), threading.Event()
+    threads = [
+        threading.Thread(target=_ecrire, args=(user, entrainements, completions_par_ecrivain, depart, resultats, verrou))
+        for user, entrainements in travail
+    ]
+    threads_lecteurs = [threading.Thread(target=_lire, args=(depart, arret, resultats, verrou)) for _ in range(lecteurs)]
+    for thread in threads + threads_lecteurs:
+        thread.start()
+    depart.wait()
+    debut = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - debut
+    arret.set()
+    for thread in threads_lecteurs:
+        thread.join()
+
+    durees = resultats["durees"]
+    return {
+        "ecrivains": len(travail),
+        "lecteurs": lecteurs,
+        "completions": len(durees),
+        "reussies": resultats["reussies"],
+        "verrouillees": resultats["verrouillees"],
+        "ecritures_par_s": round(resultats["reussies"] / total, 1),
+        "p50_ms": round(banc_essai.centile(durees, 50), 3),
+        "p95_ms": round(banc_essai.centile(durees, 95), 3),
+        "p99_ms": round(banc_essai.centile(durees, 99), 3),
+        "moyenne_ms": round(statistics.fmean(durees), 3),
+        "lectures_par_s": round(resultats["lectures"] / total, 1),
+        "lectures_verrouillees": resultats["lectures_verrouillees"],
+    }
+
+
+def comparer(profils=tuple(PROFILS), ecrivains=8, lecteurs=2, completions_par_ecrivain=50, utilisateurs=200, graine=0, journal=None):
+    """{profil: résumé}, chaque profil sur une base neuve remplie avec la même graine"""
+    journal = journal or (lambda message: None)
+    resultats = {}
+    for profil in profils:
+        journal(f"Profil {profil} : {ecrivains} écrivains, {lecteurs} lecteurs…")
+        with base_temporaire(PROFILS[profil]):
+            generation.generer(max(utilisateurs, ecrivains), entrainements=3, badges=5, defis=2, graine=graine)
+            resultats[profil] = mesurer(ecrivains, lecteurs, completions_par_ecrivain)
+    return resultats
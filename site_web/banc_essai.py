@@ -0,0 +1,191 @@
+"""Banc d'essai des pages du site
+
+Construit une base synthétique, connecte des utilisateurs synthétiques avec
+le client de test de Django et appelle chaque route un nombre fixe de fois.
+Pour chaque scénario on garde les durées, le nombre de requêtes SQL et les
+codes de statut ; le résumé donne p50/p95/p99, le débit et les requêtes
+SQL médianes, et s'enregistre en JSON pour comparer deux commits.
+"""
+
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import classement, generation, metriques
+from .models import Entrainement, GroupeMusculaire, User
+
+
+def construire_donnees(utilisateurs, exercices, entrainements_par_utilisateur, graine=0):
+    """Remplit une base vide avec le générateur de données, plus un administrateur"""
+    generation.generer(utilisateurs, exercices=exercices, entrainements=entrainements_par_utilisateur, graine=graine)
+    User.objects.create(username="admin-banc", password=make_password("banc-essai"), is_staff=True)
+
+
+@contextmanager
+def environnement(utilisateurs, exercices, entrainements_par_utilisateur, graine=0, base_existante=False, journal=None):
+    """Conditions de production sur une base de test synthétique, défaites à la sortie
+
+    DEBUG est désactivé ; le cache et les métriques pointent vers un dossier
+    temporaire pour ne pas toucher à ceux du site. Avec base_existante, la
+    base configurée est utilisée telle quelle.
+    """
+    journal = journal or (lambda message: None)
+    temporaire = tempfile.mkdtemp()
+    reglages = override_settings(
+        DEBUG=False,
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+        CACHES={
+            nom: {**configuration, "LOCATION": str(Path(temporaire) / nom)}
+            for nom, configuration in settings.CACHES.items()
+        },
+        METRIQUES_DOSSIER=str(Path(temporaire) / "metriques"),
+        STORAGES={**settings.STORAGES, "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}},
+    )
+    try:
+        with reglages:
+            if base_existante:
+                yield
+            else:
+                nom_base = connection.settings_dict["NAME"]
+                connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                try:
+                    journal("Construction de la base synthétique…")
+                    construire_donnees(utilisateurs, exercices, entrainements_par_utilisateur, graine)
+                    yield
+                finally:
+                    connection.creation.destroy_test_db(nom_base, verbosity=0)
+            # Les mesures du banc ne doivent pas rejoindre celles du site à la sortie
+            metriques.registre.vider()
+    finally:
+        shutil.rmtree(temporaire, ignore_errors=True)
+
+
+def scenarios():
+    """(nom, méthode, url, données, admin) pour chaque route mesurée"""
+    autre = User.objects.filter(is_staff=False).order_by("-id").values_list("id", flat=True).first()
+    groupe = GroupeMusculaire.objects.values_list("id", flat=True).first()
+    liste = [("index", "get", reverse("index"), None, False)]
+    liste += [(f"index?sort={champ}", "get", f"{reverse('index')}?sort={champ}", None, False) for champ in classement.CHAMPS]
+    liste += [(f"index?periode={periode}", "get", f"{reverse('index')}?periode={periode}", None, False) for periode in classement.PERIODES]
+    liste += [
+        ("classement_api", "get", f"{reverse('classement_api')}?n=20", None, False),
+        ("bank", "get", reverse("bank"), None, False),
+        ("bank?recherche", "get", f"{reverse('bank')}?recherche=curl", None, False),
+        ("bank?groupemusculaire", "get", f"{reverse('bank')}?groupemusculaire={groupe}", None, False),
+        ("autocompletion_exercices", "get", f"{reverse('autocompletion_exercices')}?q=dev", None, False),
+        ("my_workouts", "get", reverse("my_workouts"), None, False),
+        ("my_workouts?recherche", "get", f"{reverse('my_workouts')}?recherche=1", None, False),
+        ("complete_workout", "post", None, None, False),
+        ("user_search", "get", reverse("user_search"), None, False),
+        ("user_search?username", "get", f"{reverse('user_search')}?username=athlete1", None, False),
+        ("profile", "get", reverse("profile"), None, False),
+        ("view_other_user_profile", "get", reverse("view_other_user_profile", args=[autre]), None, False),
+        ("badge_list", "get", reverse("badge_list"), None, True),
+        ("review", "get", reverse("review"), None, True),
+    ]
+    return liste
+
+
+def centile(valeurs, rang):
+    valeurs = sorted(valeurs)
+    return valeurs[min(len(valeurs) - 1, int(round(rang / 100 * (len(valeurs) - 1))))]
+
+
+def connecter(clients):
+    """Clients de test connectés : [(client, ids de ses entraînements)] et le client administrateur
+
+    Les premiers athlètes par id : deux exécutions à la même échelle et avec la
+    même graine utilisent les mêmes clients.
+    """
+    athletes = list(User.objects.filter(is_staff=False, proposed_exercices__isnull=False).distinct().order_by("id")[:clients])
+    admin = User.objects.filter(is_staff=True).first()
+    connectes = []
+    for user in athletes:
+        client = Client()
+        client.force_login(user)
+        entrainements = list(Entrainement.objects.filter(createur=user).values_list("id", flat=True))
+        connectes.append((client, entrainements))
+    client_admin = Client()
+    client_admin.force_login(admin)
+    return connectes, client_admin
+
+
+def appeler(scenario, client, entrainements, aleatoire, iteration=0, graine=0):
+    """Exécute un scénario avec un client ; complete_workout vise un de ses entraînements"""
+    nom, methode, url, donnees, _ = scenario
+    if nom == "complete_workout":
+        url = reverse("complete_workout", args=[aleatoire.choice(entrainements)])
+        donnees = {"cle": f"banc-{graine}-{iteration}-{aleatoire.random()}"}
+    return getattr(client, methode)(url, donnees)
+
+
+def mesurer(iterations, echauffement=3, clients=10, graine=0):
+    """Appelle chaque scénario et retourne le résumé par scénario"""
+    aleatoire = random.Random(graine)
+    connectes, client_admin = connecter(clients)
+
+    resultats = {}
+    for scenario in scenarios():
+        nom, pour_admin = scenario[0], scenario[4]
+        durees, requetes, statuts = [], [], {}
+        debut_scenario = time.perf_counter()
+        for iteration in range(echauffement + iterations):
+            client, entrainements = connectes[iteration % len(connectes)]
+            if pour_admin:
+                client = client_admin
+            if iteration == echauffement:
+                debut_scenario = time.perf_counter()
+
+            with CaptureQueriesContext(connection) as capture:
+                debut = time.perf_counter()
+                reponse = appeler(scenario, client, entrainements, aleatoire, iteration, graine)
+                duree = time.perf_counter() - debut
+
+            if iteration >= echauffement:
+                durees.append(duree * 1000)
+                requetes.append(len(capture.captured_queries))
+                statuts[reponse.status_code] = statuts.get(reponse.status_code, 0) + 1
+
+        total = time.perf_counter() - debut_scenario
+        resultats[nom] = {
+            "requetes": iterations,
+            "p50_ms": round(centile(durees, 50), 3),
+            "p95_ms": round(centile(durees, 95), 3),
+            "p99_ms": round(centile(durees, 99), 3),
+            "moyenne_ms": round(statistics.fmean(durees), 3),
+            "debit_rps": round(iterations / total, 1),
+            "sql_median": statistics.median(requetes),
+            "sql_max": max(requetes),
+            "statuts": {str(code): nombre for code, nombre in sorted(statuts.items())},
+        }
+    return resultats
+
+
+def contexte(**echelle):
+    """Métadonnées jointes au rapport pour comparer deux exécutions"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "moteur": connection.vendor,
+        "echelle": echelle,
+    }
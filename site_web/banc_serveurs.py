@@ -0,0 +1,157 @@
+"""Banc d'essai des deux modes de service, WSGI et ASGI
+
+Contrairement à banc_essai, qui appelle les vues avec le client de test dans
+le même processus, ce banc lance réellement gunicorn dans chaque mode (voir
+gunicorn.conf.py) avec le même nombre de workers, puis envoie des requêtes
+HTTP depuis plusieurs clients simultanés. Les deux serveurs lisent la base
+configurée : elle doit déjà contenir des données (commande generer_donnees).
+Chaque mode est d'abord échauffé pour que le cache soit chaud dans les deux
+mesures ; on garde ensuite le débit, les centiles de latence et les erreurs.
+"""
+
+import http.client
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.test import Client
+from django.urls import reverse
+
+from . import banc_essai
+from .models import User
+
+MODES = ("wsgi", "asgi")
+
+
+def chemins():
+    """Pages servies par les vues asynchrones en mode ASGI"""
+    autre = User.objects.filter(is_staff=False).order_by("-id").values_list("id", flat=True).first()
+    return [
+        reverse("index"),
+        f"{reverse('index')}?sort=reps_effectuees&page=2",
+        reverse("bank"),
+        f"{reverse('bank')}?recherche=curl",
+        f"{reverse('user_search')}?username=athlete1",
+        reverse("profile"),
+        reverse("view_other_user_profile", args=[autre]),
+    ]
+
+
+def sessions(clients):
+    """Cookies de session d'utilisateurs synthétiques, enregistrés dans la base partagée avec les serveurs"""
+    cookies = []
+    for user in User.objects.filter(is_staff=False).order_by("id")[:clients]:
+        client = Client()
+        client.force_login(user)
+        cookies.append(f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}")
+    return cookies
+
+
+def _port_libre():
+    with socket.socket() as prise:
+        prise.bind(("127.0.0.1", 0))
+        return prise.getsockname()[1]
+
+
+@contextmanager
+def serveur(mode, workers, delai=30):
+    """Lance gunicorn dans le mode demandé ; retourne (hôte, port) une fois qu'il accepte des connexions"""
+    port = _port_libre()
+    processus = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--workers", str(workers), "--bind", f"127.0.0.1:{port}",
+         "--log-level", "warning"],
+        cwd=settings.BASE_DIR,
+        env={**os.environ, "REPXP_SERVEUR": mode},
+    )
+    try:
+        limite = time.monotonic() + delai
+        while True:
+            if processus.poll() is not None:
+                raise RuntimeError(f"gunicorn ({mode}) s'est arrêté au démarrage")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > limite:
+                    raise RuntimeError(f"gunicorn ({mode}) ne répond pas après {delai} s")
+                time.sleep(0.2)
+        yield "127.0.0.1", port
+    finally:
+        processus.send_signal(signal.SIGTERM)
+        try:
+            processus.wait(timeout=delai)
+        except subprocess.TimeoutExpired:
+            processus.kill()
+
+
+def _requete(hote, port, chemin, cookie):
+    connexion = http.client.HTTPConnection(hote, port, timeout=60)
+    debut = time.perf_counter()
+    try:
+        connexion.request("GET", chemin, headers={"Cookie": cookie, "Host": "localhost"})
+        reponse = connexion.getresponse()
+        reponse.read()
+        return time.perf_counter() - debut, reponse.status
+    except OSError:
+        return time.perf_counter() - debut, None
+    finally:
+        connexion.close()
+
+
+def charger(hote, port, chemins, cookies, requetes, concurrence):
+    """Envoie « requetes » requêtes depuis « concurrence » clients ; retourne (durées, statuts, durée totale)"""
+    suivant = iter(range(requetes))
+    verrou = threading.Lock()
+    durees, statuts = [], {}
+
+    def client(numero):
+        cookie = cookies[numero % len(cookies)]
+        while True:
+            with verrou:
+                rang = next(suivant, None)
+            if rang is None:
+                return
+            duree, statut = _requete(hote, port, chemins[rang % len(chemins)], cookie)
+            with verrou:
+                durees.append(duree * 1000)
+                statuts[statut] = statuts.get(statut, 0) + 1
+
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(concurrence) as executeur:
+        list(executeur.map(client, range(concurrence)))
+    return durees, statuts, time.perf_counter() - debut
+
+
+def comparer(requetes=1000, concurrence=20, workers=2, echauffement=5, clients=10, modes=MODES, journal=None):
+    """{mode: résumé} pour chaque mode de service, mesuré sur les mêmes pages et les mêmes sessions"""
+    journal = journal or (lambda message: None)
+    pages = chemins()
+    cookies = sessions(clients)
+    resultats = {}
+    try:
+        for mode in modes:
+            journal(f"Mode {mode} : {workers} worker(s), {concurrence} clients simultanés…")
+            with serveur(mode, workers) as (hote, port):
+                charger(hote, port, pages, cookies, echauffement * len(pages), concurrence)
+                durees, statuts, total = charger(hote, port, pages, cookies, requetes, concurrence)
+            resultats[mode] = {
+                "requetes": requetes,
+                "debit_rps": round(requetes / total, 1),
+                "p50_ms": round(banc_essai.centile(durees, 50), 3),
+                "p95_ms": round(banc_essai.centile(durees, 95), 3),
+                "p99_ms": round(banc_essai.centile(durees, 99), 3),
+                "moyenne_ms": round(statistics.fmean(durees), 3),
+                "statuts": {str(code): nombre for code, nombre in sorted(statuts.items(), key=lambda s: str(s[0]))},
+            }
+    finally:
+        Session.objects.filter(session_key__in=[cookie.partition("=")[2] for cookie in cookies]).delete()
+    return resultats
@@ -0,0 +1,214 @@
+"""Espaces de cache versionnés, à deux niveaux, et compteurs de succès/échecs
+
+Chaque espace (par exemple « banque:tous » ou « banque:3 ») porte un numéro
+de version conservé dans le cache partagé. Les clés des entrées incluent ce
+numéro ; invalider un espace revient à incrémenter sa version, les anciennes
+entrées expirent ensuite d'elles-mêmes. Les signaux des modèles
+(signals.py) invalident les espaces qui dépendent de leurs lignes.
+
+obtenir() et le décorateur memoriser() ajoutent devant le cache partagé une
+petite mémoire LRU propre au processus. Une clé versionnée ne change jamais
+de valeur : la version est toujours relue dans le cache partagé, donc une
+invalidation faite par un autre processus est vue tout de suite, et seule la
+lecture (et le dépickle) de l'entrée est évitée. Les valeurs gardées en
+mémoire sont partagées entre les requêtes et ne doivent pas être modifiées.
+
+Chaque lecture est comptée par famille d'espaces (« banque » pour
+« banque:3 ») et par résultat : « local », « partage » ou « echec ». Les
+compteurs suivent ceux des métriques et sont additionnés sur tous les
+processus.
+
+Les fonctions préfixées par « a » sont leurs équivalents pour les vues
+asynchrones, comme aget() pour get() dans l'API du cache de Django.
+"""
+
+import functools
+import hashlib
+import inspect
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from . import metriques
+
+DUREE_VIE = 300
+# Une entrée locale est relue dans le cache partagé au plus tard après ce délai
+DUREE_LOCALE = 60
+RESULTATS = ("local", "partage", "echec")
+
+ABSENT = object()
+
+
+class MemoireLocale:
+    """LRU borné en nombre d'entrées, avec une échéance par entrée"""
+
+    def __init__(self, taille):
+        self.taille = taille
+        self.verrou = threading.Lock()
+        self.entrees = OrderedDict()
+
+    def lire(self, cle):
+        with self.verrou:
+            entree = self.entrees.get(cle)
+            if entree is None:
+                return ABSENT
+            valeur, echeance = entree
+            if echeance < time.monotonic():
+                del self.entrees[cle]
+                return ABSENT
+            self.entrees.move_to_end(cle)
+            return valeur
+
+    def ecrire(self, cle, valeur, duree):
+        if self.taille <= 0:
+            return
+        with self.verrou:
+            self.entrees[cle] = (valeur, time.monotonic() + duree)
+            self.entrees.move_to_end(cle)
+            while len(self.entrees) > self.taille:
+                self.entrees.popitem(last=False)
+
+    def vider(self):
+        with self.verrou:
+            self.entrees.clear()
+
+
+local = MemoireLocale(getattr(settings, "CACHE_LOCAL_ENTREES", 512))
+
+
+@receiver(setting_changed)
+def _vider_local(setting, **kwargs):
+    """Un autre cache partagé (override_settings des bancs d'essai) recommence ses versions à 1"""
+    if setting == "CACHES":
+        local.vider()
+
+
+def version(espace):
+    """Version courante de l'espace : une seule lecture, add() seulement si la version n'existe pas encore"""
+    numero = cache.get(f"version:{espace}")
+    if numero is None:
+        cache.add(f"version:{espace}", 1, None)
+        numero = cache.get(f"version:{espace}", 1)
+    return numero
+
+
+async def aversion(espace):
+    numero = await cache.aget(f"version:{espace}")
+    if numero is None:
+        await cache.aadd(f"version:{espace}", 1, None)
+        numero = await cache.aget(f"version:{espace}", 1)
+    return numero
+
+
+def invalider(*espaces):
+    for espace in espaces:
+        try:
+            cache.incr(f"version:{espace}")
+        except ValueError:
+            cache.set(f"version:{espace}", 2, None)
+
+
+def _empreinte(parties):
+    return hashlib.md5("\x1f".join(str(partie) for partie in parties).encode()).hexdigest()
+
+
+def cle(espace, *parties):
+    """Clé d'une entrée de l'espace à sa version courante ; les parties libres sont hachées"""
+    return f"{espace}:v{version(espace)}:{_empreinte(parties)}"
+
+
+async def acle(espace, *parties):
+    return f"{espace}:v{await aversion(espace)}:{_empreinte(parties)}"
+
+
+def compter(espace, resultat):
+    """Compte une lecture de l'espace : « local », « partage » ou « echec »"""
+    famille = espace.partition(":")[0]
+    metriques.registre.compter("repxp_cache_total", (("espace", famille), ("resultat", resultat)))
+
+
+def compteurs(famille):
+    """Lectures d'une famille d'espaces par résultat, pour tous les processus ; « succes » réunit les deux niveaux"""
+    valeurs = dict.fromkeys(RESULTATS, 0)
+    for etiquettes, valeur in metriques.cumuls("repxp_cache_total").items():
+        etiquettes = dict(etiquettes)
+        if etiquettes["espace"] == famille:
+            valeurs[etiquettes["resultat"]] += valeur
+    return {**valeurs, "succes": valeurs["local"] + valeurs["partage"]}
+
+
+async def acompteurs(famille):
+    # Lecture des fichiers de métriques de chaque processus
+    return await sync_to_async(compteurs)(famille)
+
+
+def obtenir(espace, parties, calculer, duree=DUREE_VIE):
+    """Entrée de l'espace lue dans la mémoire du processus, puis dans le cache partagé, sinon calculée"""
+    cle_entree = cle(espace, *parties)
+    valeur = local.lire(cle_entree)
+    if valeur is not ABSENT:
+        compter(espace, "local")
+        return valeur
+    valeur = cache.get(cle_entree, ABSENT)
+    if valeur is ABSENT:
+        compter(espace, "echec")
+        valeur = calculer()
+        cache.set(cle_entree, valeur, duree)
+    else:
+        compter(espace, "partage")
+    local.ecrire(cle_entree, valeur, min(duree, DUREE_LOCALE))
+    return valeur
+
+
+async def aobtenir(espace, parties, calculer, duree=DUREE_VIE):
+    """obtenir() pour les vues asynchrones ; « calculer » retourne une coroutine"""
+    cle_entree = await acle(espace, *parties)
+    valeur = local.lire(cle_entree)
+    if valeur is not ABSENT:
+        compter(espace, "local")
+        return valeur
+    valeur = await cache.aget(cle_entree, ABSENT)
+    if valeur is ABSENT:
+        compter(espace, "echec")
+        valeur = await calculer()
+        await cache.aset(cle_entree, valeur, duree)
+    else:
+        compter(espace, "partage")
+    local.ecrire(cle_entree, valeur, min(duree, DUREE_LOCALE))
+    return valeur
+
+
+def memoriser(espace, duree=DUREE_VIE):
+    """Décorateur : garde le résultat dans l'espace, sous une clé formée des arguments de l'appel
+
+    « espace » est un nom dont les champs sont remplis avec les arguments
+    (« profil:{user_id} »), ou une fonction qui reçoit les mêmes arguments et
+    retourne le nom. La fonction décorée peut être une coroutine.
+    """
+    def decorateur(fonction):
+        signature = inspect.signature(fonction)
+
+        def espace_et_parties(args, kwargs):
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            nom = espace(**arguments.arguments) if callable(espace) else espace.format(**arguments.arguments)
+            return nom, list(arguments.arguments.values())
+
+        if iscoroutinefunction(fonction):
+            @functools.wraps(fonction)
+            async def enveloppe(*args, **kwargs):
+                nom, parties = espace_et_parties(args, kwargs)
+                return await aobtenir(nom, parties, lambda: fonction(*args, **kwargs), duree)
+        else:
+            @functools.wraps(fonction)
+            def enveloppe(*args, **kwargs):
+                nom, parties = espace_et_parties(args, kwargs)
+                return obtenir(nom, parties, lambda: fonction(*args, **kwargs), duree)
+        return enveloppe
+    return decorateur
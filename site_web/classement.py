@@ -0,0 +1,332 @@
+"""Classement matérialisé des utilisateurs
+
+L'ordre est (valeur décroissante, id des statistiques croissant), comme
+l'affichage d'origine qui numérotait les lignes une à une. Classement garde
+une ligne par statistique et par champ de tri, avec sa valeur ; les lignes
+d'un champ qui partagent une valeur forment un palier (PalierClassement) qui
+retient leur nombre et le rang de la première d'entre elles. Le rang d'une
+ligne est calculé à la lecture : rang de son palier plus sa place parmi les
+égalités, et une page du classement se lit à partir du palier qui contient
+son premier rang.
+
+Quand un compteur passe de a à b, seuls les paliers de valeur comprise entre
+a et b décalent leur rang : le coût ne dépend pas du nombre d'égalités, et
+seuls les champs dont la valeur a changé sont touchés. Un palier créé lit le
+rang de son voisin du dessus ; sous PostgreSQL, chaque transaction qui touche
+aux paliers d'un champ prend donc d'abord un verrou consultatif sur ce champ,
+toujours dans le même ordre. SQLite sérialise déjà les écritures.
+"""
+
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import Classement, CumulPeriode, PalierClassement, Statistiques
+
+CHAMPS = [champ for champ, _ in Statistiques.CHAMPS_CLASSEMENT]
+CHAMP_DEFAUT = 'badges_obtenus'
+PERIODES = [granularite for granularite, _ in CumulPeriode.GRANULARITES]
+CHAMPS_PERIODE = ['reps_effectuees', 'sets_effectues', 'entrainements_completes', 'exercices_completes']
+TAILLE_LOT = 2000
+# Première clé des verrous consultatifs du classement (la seconde est le hash du champ)
+CLE_VERROU = 0x52616E67
+
+
+def _avant(valeur, statistiques_id):
+    """Lignes classées devant la clé (valeur, statistiques_id)"""
+    return Q(valeur__gte=valeur) & (Q(valeur__gt=valeur) | Q(statistiques_id__lt=statistiques_id))
+
+
+def _apres(valeur, statistiques_id):
+    """Lignes classées derrière la clé (valeur, statistiques_id)"""
+    return Q(valeur__lte=valeur) & (Q(valeur__lt=valeur) | Q(statistiques_id__gt=statistiques_id))
+
+
+def _verrouiller(champs):
+    """Sérialise jusqu'à la fin de la transaction les changements de paliers de ces champs"""
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as curseur:
+        for champ in sorted(champs):
+            curseur.execute("SELECT pg_advisory_xact_lock(%s, hashtext(%s))", [CLE_VERROU, champ])
+
+
+def _rang_valeur(champ, valeur):
+    """Rang de la première ligne qui aurait cette valeur : celui de son palier, sinon après le palier du dessus"""
+    palier = (
+        PalierClassement.objects
+        .filter(champ=champ, valeur__gte=valeur)
+        .order_by('valeur')
+        .values_list('valeur', 'rang', 'nombre')
+        .first()
+    )
+    if palier is None:
+        return 1
+    valeur_palier, rang, nombre = palier
+    return rang if valeur_palier == valeur else rang + nombre
+
+
+def _ajouter(champ, valeur):
+    """Compte une ligne de plus au palier de la valeur, créé au besoin"""
+    if not PalierClassement.objects.filter(champ=champ, valeur=valeur).update(nombre=F('nombre') + 1):
+        PalierClassement.objects.create(champ=champ, valeur=valeur, nombre=1, rang=_rang_valeur(champ, valeur))
+
+
+def _enlever(champ, valeur):
+    """Compte une ligne de moins au palier de la valeur, supprimé s'il est vide"""
+    paliers = PalierClassement.objects.filter(champ=champ, valeur=valeur)
+    paliers.update(nombre=F('nombre') - 1)
+    paliers.filter(nombre=0).delete()
+
+
+def _decaler(champ, valeurs, delta):
+    PalierClassement.objects.filter(champ=champ, **valeurs).update(rang=F('rang') + delta)
+
+
+def _inserer(champ, valeur):
+    # Les paliers du dessous reculent d'un rang ; le palier de la valeur garde le sien
+    _decaler(champ, {'valeur__lt': valeur}, 1)
+    _ajouter(champ, valeur)
+
+
+def _deplacer(champ, ancienne, valeur):
+    _enlever(champ, ancienne)
+    if valeur > ancienne:
+        # La ligne passe devant les paliers de [ancienne, valeur)
+        _decaler(champ, {'valeur__gte': ancienne, 'valeur__lt': valeur}, 1)
+    else:
+        # La ligne passe derrière les paliers de [valeur, ancienne)
+        _decaler(champ, {'valeur__gte': valeur, 'valeur__lt': ancienne}, -1)
+    _ajouter(champ, valeur)
+
+
+def synchroniser(statistiques):
+    """Aligne le classement d'une ligne de statistiques sur ses compteurs actuels"""
+    with transaction.atomic():
+        lignes = {
+            ligne.champ: ligne
+            for ligne in Classement.objects.select_for_update().filter(statistiques=statistiques)
+        }
+        modifies = [
+            champ for champ in CHAMPS
+            if champ not in lignes or lignes[champ].valeur != getattr(statistiques, champ)
+        ]
+        if not modifies:
+            return
+        _verrouiller(modifies)
+        for champ in modifies:
+            ligne = lignes.get(champ)
+            valeur = getattr(statistiques, champ)
+            if ligne is None:
+                Classement.objects.create(statistiques=statistiques, champ=champ, valeur=valeur)
+                _inserer(champ, valeur)
+            else:
+                _deplacer(champ, ligne.valeur, valeur)
+                ligne.valeur = valeur
+                ligne.save(update_fields=['valeur'])
+
+
+def retirer(statistiques):
+    """Retire des paliers une ligne de statistiques sur le point d'être supprimée"""
+    with transaction.atomic():
+        lignes = list(Classement.objects.filter(statistiques=statistiques).values_list('champ', 'valeur'))
+        _verrouiller([champ for champ, _ in lignes])
+        for champ, valeur in lignes:
+            _enlever(champ, valeur)
+            _decaler(champ, {'valeur__lt': valeur}, -1)
+
+
+def reconstruire(champs=None):
+    """Recalcule en bloc les lignes et les paliers à partir de Statistiques"""
+    champs = champs or CHAMPS
+    with transaction.atomic():
+        _verrouiller(champs)
+        Classement.objects.filter(champ__in=champs).delete()
+        PalierClassement.objects.filter(champ__in=champs).delete()
+        for champ in champs:
+            lot = []
+            for sid, valeur in Statistiques.objects.values_list('id', champ).iterator(chunk_size=TAILLE_LOT):
+                lot.append(Classement(statistiques_id=sid, champ=champ, valeur=valeur))
+                if len(lot) == TAILLE_LOT:
+                    Classement.objects.bulk_create(lot)
+                    lot = []
+            Classement.objects.bulk_create(lot)
+
+            paliers, rang = [], 1
+            for valeur, nombre in (
+                Statistiques.objects.values(champ).annotate(nombre=Count('id')).order_by(f'-{champ}')
+                .values_list(champ, 'nombre')
+            ):
+                paliers.append(PalierClassement(champ=champ, valeur=valeur, nombre=nombre, rang=rang))
+                rang += nombre
+            PalierClassement.objects.bulk_create(paliers, batch_size=TAILLE_LOT)
+
+
+def _numeroter(champ, lignes):
+    """Attribue leur rang à des lignes consécutives du classement, à partir de celui de la première"""
+    if lignes:
+        premiere = lignes[0]
+        rang = _rang_valeur(champ, premiere.valeur) + Classement.objects.filter(
+            champ=champ, valeur=premiere.valeur, statistiques_id__lt=premiere.statistiques_id,
+        ).count()
+        for decalage, ligne in enumerate(lignes):
+            ligne.rang = rang + decalage
+    return lignes
+
+
+def encoder_curseur(ligne):
+    """Curseur opaque (valeur, id des statistiques) d'une ligne du classement"""
+    return f"{ligne.valeur}.{ligne.statistiques_id}"
+
+
+def decoder_curseur(curseur):
+    """Retourne la clé (valeur, id des statistiques) d'un curseur, ou lève ValueError"""
+    valeur, _, statistiques_id = curseur.partition('.')
+    valeur, statistiques_id = int(valeur), int(statistiques_id)
+    if valeur < 0 or statistiques_id < 0:
+        raise ValueError(curseur)
+    return valeur, statistiques_id
+
+
+def _lignes(champ):
+    return Classement.objects.filter(champ=champ).select_related('statistiques__user_id')
+
+
+def _devant(champ, cle, n):
+    """Les n lignes classées juste devant la clé, dans l'ordre du classement"""
+    lignes = list(_lignes(champ).filter(_avant(*cle)).order_by('valeur', '-statistiques_id')[:n])
+    lignes.reverse()
+    return lignes
+
+
+def _derriere(champ, cle, n):
+    """Les n lignes classées juste derrière la clé, dans l'ordre du classement"""
+    return list(_lignes(champ).filter(_apres(*cle)).order_by('-valeur', 'statistiques_id')[:n])
+
+
+def page_apres(champ, curseur, n):
+    """Page de n lignes après un curseur (ou depuis le premier rang), avec ses curseurs voisins"""
+    if curseur is None:
+        lignes = list(_lignes(champ).order_by('-valeur', 'statistiques_id')[:n + 1])
+    else:
+        lignes = _derriere(champ, curseur, n + 1)
+    suite = len(lignes) > n
+    lignes = _numeroter(champ, lignes[:n])
+    return {
+        'lignes': lignes,
+        'precedent': encoder_curseur(lignes[0]) if lignes and curseur is not None else None,
+        'suivant': encoder_curseur(lignes[-1]) if suite else None,
+    }
+
+
+def page_avant(champ, curseur, n):
+    """Page de n lignes avant un curseur, avec ses curseurs voisins"""
+    lignes = _devant(champ, curseur, n + 1)
+    debut = len(lignes) > n
+    lignes = _numeroter(champ, lignes[-n:])
+    return {
+        'lignes': lignes,
+        'precedent': encoder_curseur(lignes[0]) if debut else None,
+        'suivant': encoder_curseur(lignes[-1]) if lignes else None,
+    }
+
+
+def autour(champ, statistiques, n):
+    """Le rang d'un utilisateur entouré de ses n voisins au-dessus et en dessous"""
+    moi = _lignes(champ).filter(statistiques=statistiques).first()
+    if moi is None:
+        return {'moi': None, **page_apres(champ, None, 2 * n + 1)}
+
+    cle = (moi.valeur, moi.statistiques_id)
+    dessus = _devant(champ, cle, n + 1)
+    dessous = _derriere(champ, cle, n + 1)
+    lignes = _numeroter(champ, dessus[-n:] + [moi] + dessous[:n])
+    return {
+        'moi': moi,
+        'lignes': lignes,
+        'precedent': encoder_curseur(dessus[-n]) if len(dessus) > n else None,
+        'suivant': encoder_curseur(dessous[n - 1]) if len(dessous) > n else None,
+    }
+
+
+class RangsClassement:
+    """Séquence paginable des rangs d'un champ, lue à partir du palier de son premier rang plutôt que par OFFSET"""
+
+    def __init__(self, champ):
+        self.champ = champ
+
+    def _dernier(self):
+        return PalierClassement.objects.filter(champ=self.champ).order_by('valeur')
+
+    def count(self):
+        palier = self._dernier().first()
+        return palier.rang + palier.nombre - 1 if palier else 0
+
+    async def acount(self):
+        palier = await self._dernier().afirst()
+        return palier.rang + palier.nombre - 1 if palier else 0
+
+    def __getitem__(self, tranche):
+        # Tranche paresseuse : une vue asynchrone la lit avec « async for »
+        return _Tranche(self.champ, tranche.start or 0, tranche.stop)
+
+
+class _Tranche:
+    """Lignes de rangs ]debut, fin], numérotées à la lecture"""
+
+    def __init__(self, champ, debut, fin):
+        self.champ = champ
+        self.debut = debut
+        self.fin = fin
+
+    def _palier(self):
+        # Palier qui contient le premier rang de la tranche
+        return PalierClassement.objects.filter(champ=self.champ, rang__lte=self.debut + 1).order_by('-rang')
+
+    def _lignes(self, palier):
+        # Les lignes du palier viennent en tête : la tranche commence à sa place parmi les égalités
+        decalage = palier.rang - 1
+        return (
+            Classement.objects
+            .filter(champ=self.champ, valeur__lte=palier.valeur)
+            .select_related('statistiques__user_id')
+            .order_by('-valeur', 'statistiques_id')[self.debut - decalage:self.fin - decalage]
+        )
+
+    def _numeroter(self, lignes):
+        for rang, ligne in enumerate(lignes, self.debut + 1):
+            ligne.rang = rang
+        return lignes
+
+    def __iter__(self):
+        palier = self._palier().first()
+        return iter(self._numeroter(list(self._lignes(palier)) if palier else []))
+
+    async def __aiter__(self):
+        palier = await self._palier().afirst()
+        if palier is None:
+            return
+        for ligne in self._numeroter([ligne async for ligne in self._lignes(palier)]):
+            yield ligne
+
+
+def debut_periode(granularite, jour=None):
+    """Premier jour de la période (jour, semaine commençant le lundi, mois) contenant la date"""
+    jour = jour or timezone.localdate()
+    if granularite == 'semaine':
+        return jour - timedelta(days=jour.weekday())
+    if granularite == 'mois':
+        return jour.replace(day=1)
+    return jour
+
+
+def cumuls_periode(champ, granularite):
+    """Classement de la période en cours, lu dans les cumuls de cette seule période"""
+    return (
+        CumulPeriode.objects
+        .filter(granularite=granularite, debut=debut_periode(granularite))
+        .select_related('user')
+        .order_by(f'-{champ}', 'user_id')
+    )
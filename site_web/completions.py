@@ -0,0 +1,170 @@
+"""Journal des complétions d'entraînements et projection vers Statistiques
+
+Chaque complétion est un événement immuable portant les totaux de
+l'entraînement calculés une seule fois. Les compteurs de Statistiques en sont
+une projection : ils sont incrémentés dans la base avec des expressions F()
+pour ne perdre aucune mise à jour concurrente, et peuvent être reconstruits en
+bloc à partir du journal.
+"""
+
+import hashlib
+import uuid
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from . import badges, classement, profils
+from .models import CompletionEntrainement, CumulPeriode, Statistiques
+
+TAILLE_LOT = 2000
+
+# Champ de l'événement -> compteur de Statistiques
+PROJECTION = {
+    'sets': 'sets_effectues',
+    'reps': 'reps_effectuees',
+    'exercices': 'exercices_completes',
+    'entrainements': 'entrainements_completes',
+}
+
+
+# Granularité des cumuls -> fonction de troncature de la date de complétion
+TRONCATURES = {
+    'jour': TruncDay,
+    'semaine': TruncWeek,
+    'mois': TruncMonth,
+}
+
+
+def totaux_entrainement(entrainement):
+    """Séries, répétitions et exercices d'un entraînement, calculés dans la base"""
+    totaux = entrainement.exerciceentrainement_set.aggregate(
+        total_sets=Coalesce(Sum('sets'), 0),
+        total_reps=Coalesce(Sum(F('sets') * F('reps')), 0),
+        total_exercices=Count('id'),
+    )
+    return {
+        'sets': totaux['total_sets'],
+        'reps': totaux['total_reps'],
+        'exercices': totaux['total_exercices'],
+    }
+
+
+def appliquer(completion):
+    """Incrémente atomiquement les statistiques de l'utilisateur avec un événement et réévalue ses badges"""
+    statistiques, _ = Statistiques.objects.get_or_create(user_id=completion.user)
+    Statistiques.objects.filter(pk=statistiques.pk).update(**{
+        compteur: F(compteur) + getattr(completion, champ)
+        for champ, compteur in PROJECTION.items()
+    })
+    statistiques.refresh_from_db()
+    badges.evaluer(statistiques, [compteur for champ, compteur in PROJECTION.items() if getattr(completion, champ)])
+    classement.synchroniser(statistiques)
+    cumuler(completion)
+    profils.invalider(completion.user_id)
+    return statistiques
+
+
+def cumuler(completion):
+    """Ajoute un événement aux cumuls du jour, de la semaine et du mois de sa date"""
+    jour = timezone.localdate(completion.date_completion)
+    for granularite in TRONCATURES:
+        cumul, _ = CumulPeriode.objects.get_or_create(
+            user=completion.user,
+            granularite=granularite,
+            debut=classement.debut_periode(granularite, jour),
+        )
+        CumulPeriode.objects.filter(pk=cumul.pk).update(**{
+            compteur: F(compteur) + getattr(completion, champ)
+            for champ, compteur in PROJECTION.items()
+        })
+
+
+def completer_entrainement(user, entrainement, cle=None):
+    """Enregistre une complétion une seule fois par clé et met à jour la projection
+
+    Retourne (completion, cree) ; cree est faux si la clé a déjà été utilisée,
+    par exemple quand le formulaire est soumis deux fois. La clé vient du
+    client : elle est condensée en SHA-256, 64 caractères hexadécimaux quelle
+    que soit sa longueur.
+    """
+    cle = hashlib.sha256((cle or uuid.uuid4().hex).encode()).hexdigest()
+    with transaction.atomic():
+        completion, cree = CompletionEntrainement.objects.get_or_create(
+            user=user,
+            cle_idempotence=cle,
+            defaults={'entrainement': entrainement, **totaux_entrainement(entrainement)},
+        )
+        if cree:
+            appliquer(completion)
+    return completion, cree
+
+
+def reconstruire_statistiques():
+    """Recalcule tous les compteurs de Statistiques à partir du journal, en bloc"""
+    totaux = (
+        CompletionEntrainement.objects
+        .values('user')
+        .annotate(**{f'total_{champ}': Sum(champ) for champ in PROJECTION})
+        .order_by('user')
+    )
+
+    with transaction.atomic():
+        Statistiques.objects.update(**{compteur: 0 for compteur in PROJECTION.values()})
+
+        lot = []
+        for ligne in totaux.iterator(chunk_size=TAILLE_LOT):
+            lot.append(ligne)
+            if len(lot) == TAILLE_LOT:
+                _projeter_lot(lot)
+                lot = []
+        _projeter_lot(lot)
+
+        classement.reconstruire()
+    profils.invalider_tout()
+
+
+def reconstruire_cumuls():
+    """Recalcule tous les cumuls par période à partir du journal, regroupés dans la base"""
+    with transaction.atomic():
+        CumulPeriode.objects.all().delete()
+        # Les événements de reprise portent des compteurs antérieurs au journal, sans date réelle
+        evenements = CompletionEntrainement.objects.filter(est_reprise=False)
+        for granularite, tronquer in TRONCATURES.items():
+            totaux = (
+                evenements
+                .annotate(periode=tronquer('date_completion'))
+                .values('user', 'periode')
+                .annotate(**{f'total_{champ}': Sum(champ) for champ in PROJECTION})
+                .order_by('user', 'periode')
+            )
+            lot = []
+            for ligne in totaux.iterator(chunk_size=TAILLE_LOT):
+                lot.append(CumulPeriode(
+                    user_id=ligne['user'],
+                    granularite=granularite,
+                    debut=ligne['periode'].date(),
+                    **{compteur: ligne[f'total_{champ}'] for champ, compteur in PROJECTION.items()},
+                ))
+                if len(lot) == TAILLE_LOT:
+                    CumulPeriode.objects.bulk_create(lot)
+                    lot = []
+            CumulPeriode.objects.bulk_create(lot)
+
+
+def _projeter_lot(lot):
+    par_user = {ligne['user']: ligne for ligne in lot}
+    existantes = list(Statistiques.objects.filter(user_id__in=par_user))
+    for statistiques in existantes:
+        ligne = par_user[statistiques.user_id_id]
+        for champ, compteur in PROJECTION.items():
+            setattr(statistiques, compteur, ligne[f'total_{champ}'])
+
+    trouves = {statistiques.user_id_id for statistiques in existantes}
+    Statistiques.objects.bulk_update(existantes, list(PROJECTION.values()))
+    Statistiques.objects.bulk_create([
+        Statistiques(user_id_id=user_id, **{compteur: ligne[f'total_{champ}'] for champ, compteur in PROJECTION.items()})
+        for user_id, ligne in par_user.items()
+        if user_id not in trouves
+    ])
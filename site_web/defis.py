@@ -0,0 +1,93 @@
+"""Clôture des défis échus
+
+Un défi dont la date limite est passée est clôturé une seule fois : ses
+progressions sont figées par un UPDATE unique, puis son classement final est
+écrit à partir d'un regroupement dans la base, lu et inséré par lots pour que
+la mémoire reste bornée quel que soit le nombre de participants. Le défi est
+réservé par un UPDATE conditionnel sur date_cloture, ce qui permet de faire
+tourner plusieurs workers sans qu'un défi soit clôturé deux fois.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from . import badges
+from .models import ClassementDefi, Defis, UserBadgeProgress
+
+TAILLE_LOT = 2000
+
+
+def a_cloturer(maintenant=None):
+    """Défis échus pas encore clôturés, du plus ancien au plus récent (index defi_a_cloturer_idx)"""
+    maintenant = maintenant or timezone.now()
+    return Defis.objects.filter(date_cloture__isnull=True, date_limite__lte=maintenant).order_by("date_limite")
+
+
+def prochaine_echeance():
+    """Date limite du prochain défi ouvert, ou None"""
+    return Defis.objects.filter(date_cloture__isnull=True).aggregate(prochaine=Min("date_limite"))["prochaine"]
+
+
+def classement_final(defi_id):
+    """Participants d'un défi classés par badges obtenus, puis par date du dernier badge"""
+    return (
+        UserBadgeProgress.objects
+        .filter(defi_id=defi_id)
+        .values("user_id")
+        .annotate(
+            obtenus=Count("id", filter=Q(est_complete=True)),
+            derniere=Max("date_completion", filter=Q(est_complete=True)),
+        )
+        .annotate(rang=Window(
+            RowNumber(),
+            order_by=[F("obtenus").desc(), F("derniere").asc(nulls_last=True), F("user_id").asc()],
+        ))
+        .values_list("user_id", "obtenus", "derniere", "rang")
+        .order_by()
+    )
+
+
+def cloturer(defi_id, maintenant=None):
+    """Fige les progressions d'un défi échu et écrit son classement final
+
+    Retourne le nombre de participants classés, ou None si le défi était déjà
+    clôturé (par un autre worker par exemple) ou n'est pas encore échu.
+    """
+    maintenant = maintenant or timezone.now()
+    with transaction.atomic():
+        reserve = Defis.objects.filter(
+            pk=defi_id, date_cloture__isnull=True, date_limite__lte=maintenant,
+        ).update(date_cloture=maintenant)
+        if not reserve:
+            return None
+
+        UserBadgeProgress.objects.filter(defi_id=defi_id, est_fige=False).update(est_fige=True)
+
+        ClassementDefi.objects.filter(defi_id=defi_id).delete()
+        participants, lot = 0, []
+        for user_id, obtenus, derniere, rang in classement_final(defi_id).iterator(chunk_size=TAILLE_LOT):
+            lot.append(ClassementDefi(
+                defi_id=defi_id, user_id=user_id, rang=rang, badges_obtenus=obtenus, derniere_completion=derniere,
+            ))
+            if len(lot) == TAILLE_LOT:
+                ClassementDefi.objects.bulk_create(lot)
+                participants += len(lot)
+                lot = []
+        ClassementDefi.objects.bulk_create(lot)
+        participants += len(lot)
+
+    badges.invalider()
+    return participants
+
+
+def cloturer_echus(maintenant=None):
+    """Clôture tous les défis échus ; retourne [(id du défi, participants classés)]"""
+    maintenant = maintenant or timezone.now()
+    clotures = []
+    for defi_id in list(a_cloturer(maintenant).values_list("id", flat=True)):
+        participants = cloturer(defi_id, maintenant)
+        if participants is not None:
+            clotures.append((defi_id, participants))
+    return clotures
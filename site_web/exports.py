@@ -0,0 +1,226 @@
+"""Exports en flux (CSV, JSON Lines et colonnes)
+
+Un export est une suite de sections : chacune a un nom, ses colonnes et un
+queryset de values_list() dont les jointures sont faites par la base. Les
+lignes sont lues avec iterator(chunk_size=…), un curseur côté serveur sous
+PostgreSQL, puis écrites par paquets dans le générateur que consomme
+StreamingHttpResponse. La mémoire utilisée ne dépend donc que de la taille
+d'un paquet, pas de celle de l'export.
+
+Le format « colonnes » suit la disposition des fichiers en colonnes (Parquet,
+Arrow) sans dépendance supplémentaire : chaque ligne JSON est un groupe d'au
+plus TAILLE_LOT rangées, stocké colonne par colonne.
+"""
+
+import csv
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+
+from .models import CompletionEntrainement, Entrainement, Statistiques, User
+
+TAILLE_LOT = 2000
+
+Section = namedtuple("Section", "nom colonnes lignes")
+
+
+class _Tampon:
+    """Pseudo-fichier : csv.writer retourne la ligne formatée au lieu de l'écrire"""
+
+    def write(self, valeur):
+        return valeur
+
+
+def _rangees(sections, taille_lot=TAILLE_LOT):
+    for section in sections:
+        for rangee in section.lignes.iterator(chunk_size=taille_lot):
+            yield section, rangee
+
+
+def _par_paquets(lignes, taille_lot=TAILLE_LOT):
+    """Regroupe les lignes formatées pour ne pas envoyer un morceau de réponse par ligne"""
+    paquet = []
+    for ligne in lignes:
+        paquet.append(ligne)
+        if len(paquet) == taille_lot:
+            yield "".join(paquet)
+            paquet = []
+    if paquet:
+        yield "".join(paquet)
+
+
+def colonnes(sections):
+    """Colonne « type » suivie de l'union ordonnée des colonnes des sections"""
+    resultat = ["type"] if len(sections) > 1 else []
+    for section in sections:
+        resultat.extend(colonne for colonne in section.colonnes if colonne not in resultat)
+    return resultat
+
+
+def flux_csv(sections, taille_lot=TAILLE_LOT):
+    entete = colonnes(sections)
+    ecrivain = csv.writer(_Tampon())
+
+    def lignes():
+        yield ecrivain.writerow(entete)
+        for section, rangee in _rangees(sections, taille_lot):
+            valeurs = dict(zip(section.colonnes, rangee), type=section.nom)
+            yield ecrivain.writerow([valeurs.get(colonne) for colonne in entete])
+
+    return _par_paquets(lignes(), taille_lot)
+
+
+def flux_jsonl(sections, taille_lot=TAILLE_LOT):
+    encodeur = DjangoJSONEncoder(ensure_ascii=False)
+    multiple = len(sections) > 1
+
+    def lignes():
+        for section, rangee in _rangees(sections, taille_lot):
+            objet = {"type": section.nom} if multiple else {}
+            objet.update(zip(section.colonnes, rangee))
+            yield encodeur.encode(objet) + "\n"
+
+    return _par_paquets(lignes(), taille_lot)
+
+
+def flux_colonnes(sections, taille_lot=TAILLE_LOT):
+    """Une ligne JSON par groupe de rangées : {"type", "lignes", "colonnes": {colonne: [valeurs]}}"""
+    encodeur = DjangoJSONEncoder(ensure_ascii=False)
+
+    def groupe(section, rangees):
+        return encodeur.encode({
+            "type": section.nom,
+            "lignes": len(rangees),
+            "colonnes": dict(zip(section.colonnes, (list(valeurs) for valeurs in zip(*rangees)))),
+        }) + "\n"
+
+    for section in sections:
+        rangees = []
+        for rangee in section.lignes.iterator(chunk_size=taille_lot):
+            rangees.append(rangee)
+            if len(rangees) == taille_lot:
+                yield groupe(section, rangees)
+                rangees = []
+        if rangees:
+            yield groupe(section, rangees)
+
+
+# Format -> (générateur, type de contenu, extension du fichier)
+FORMATS = {
+    "csv": (flux_csv, "text/csv; charset=utf-8", "csv"),
+    "jsonl": (flux_jsonl, "application/x-ndjson; charset=utf-8", "jsonl"),
+    "colonnes": (flux_colonnes, "application/x-ndjson; charset=utf-8", "colonnes.jsonl"),
+}
+
+
+async def _en_asynchrone(morceaux):
+    """Sous ASGI, un itérateur synchrone serait lu en entier avant l'envoi : on le lit morceau par morceau
+
+    thread_sensitive garde tous les next() sur le même thread, donc sur la
+    connexion qui tient le curseur côté serveur.
+    """
+    fin = object()
+    lire = sync_to_async(next, thread_sensitive=True)
+    while (morceau := await lire(morceaux, fin)) is not fin:
+        yield morceau
+
+
+def reponse(request, sections, format, nom_fichier):
+    """StreamingHttpResponse téléchargée sous « nom_fichier.extension »"""
+    generateur, type_contenu, extension = FORMATS[format]
+    morceaux = generateur(sections)
+    if isinstance(request, ASGIRequest):
+        morceaux = _en_asynchrone(iter(morceaux))
+    resultat = StreamingHttpResponse(morceaux, content_type=type_contenu)
+    resultat["Content-Disposition"] = f'attachment; filename="{nom_fichier}.{extension}"'
+    resultat["Cache-Control"] = "private, no-store"
+    return resultat
+
+
+def ecrire(sections, format, fichier, taille_lot=TAILLE_LOT):
+    """Écrit un export dans un fichier texte ouvert ; retourne le nombre de caractères écrits"""
+    generateur = FORMATS[format][0]
+    ecrits = 0
+    for morceau in generateur(sections, taille_lot):
+        ecrits += fichier.write(morceau) or 0
+    return ecrits
+
+
+COLONNES_STATISTIQUES = [
+    "sets_effectues", "reps_effectuees", "entrainements_completes", "exercices_completes", "badges_obtenus",
+]
+
+
+def section_utilisateurs(utilisateurs):
+    """Un utilisateur par ligne, avec ses statistiques jointes"""
+    champs = [
+        "id", "username", "email", "first_name", "last_name", "sexe", "date_naissance", "taille", "poids",
+        "is_staff", "is_superuser", "is_active", "date_joined", "last_login",
+    ]
+    return Section(
+        "utilisateur",
+        champs + COLONNES_STATISTIQUES,
+        utilisateurs.order_by("pk").values_list(
+            *champs, *(f"statistiques__{colonne}" for colonne in COLONNES_STATISTIQUES),
+        ),
+    )
+
+
+def section_statistiques(statistiques):
+    """Une ligne de statistiques par utilisateur, avec son nom d'utilisateur"""
+    return Section(
+        "statistiques",
+        ["user_id", "username", *COLONNES_STATISTIQUES],
+        statistiques.order_by("pk").values_list("user_id", "user_id__username", *COLONNES_STATISTIQUES),
+    )
+
+
+def section_entrainements(entrainements):
+    """Une ligne par exercice de chaque entraînement, avec son créateur et son groupe musculaire"""
+    return Section(
+        "entrainement",
+        ["entrainement_id", "entrainement", "createur_id", "createur", "date_creation", "date_modification",
+         "exercice", "groupe_musculaire", "sets", "reps"],
+        entrainements
+        .annotate(
+            exercice=F("exerciceentrainement__exercice__nom"),
+            groupe=F("exerciceentrainement__exercice__groupe_musculaire__nom"),
+            # Sans valeur personnalisée, l'entraînement suit les valeurs recommandées
+            series=Coalesce("exerciceentrainement__sets", "exerciceentrainement__exercice__series_sugg"),
+            repetitions=Coalesce("exerciceentrainement__reps", "exerciceentrainement__exercice__reps_sugg"),
+        )
+        .order_by("id", "exerciceentrainement__id")
+        .values_list(
+            "id", "nom", "createur_id", "createur__username", "date_creation", "date_modification",
+            "exercice", "groupe", "series", "repetitions",
+        ),
+    )
+
+
+# Modèles exportables par l'administration et la commande exporter_donnees
+MODELES = {
+    "utilisateurs": (User, section_utilisateurs),
+    "statistiques": (Statistiques, section_statistiques),
+    "entrainements": (Entrainement, section_entrainements),
+}
+
+
+def sections_utilisateur(user_id):
+    """Statistiques, entraînements (une ligne par exercice) et complétions d'un utilisateur"""
+    return [
+        section_statistiques(Statistiques.objects.filter(user_id=user_id)),
+        section_entrainements(Entrainement.objects.filter(createur_id=user_id)),
+        Section(
+            "completion",
+            ["entrainement_id", "entrainement", "date_completion", "sets", "reps", "exercices"],
+            CompletionEntrainement.objects
+            .filter(user_id=user_id)
+            .order_by("date_completion", "id")
+            .values_list("entrainement_id", "entrainement__nom", "date_completion", "sets", "reps", "exercices"),
+        ),
+    ]
@@ -1,9 +1,11 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db.models import Case, When
 from django.utils import timezone
 from django.utils.text import slugify
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm, UserChangeForm
-from django_select2.forms import Select2MultipleWidget
+from django_select2.forms import ModelSelect2Widget, Select2MultipleWidget
+from . import autocompletion, recherche
 from .models import User, Sexe, Exercice, Entrainement, Badge, Defis
 
 
@@ -163,6 +165,34 @@ class CustomUserChangeForm(UserChangeForm):
         return poids
 
 
+class ExerciceSelect2Widget(ModelSelect2Widget):
+    """Liste d'exercices chargée par pages en AJAX, seuls les exercices choisis sont rendus"""
+
+    search_fields = ["nom__icontains"]
+    max_results = 20
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs["data-minimum-input-length"] = 0
+        return attrs
+
+    def filter_queryset(self, request, term, queryset=None, **dependent_fields):
+        """Débuts de mots cherchés dans l'index de préfixes ; la recherche plein texte prend le relais s'il ne trouve rien"""
+        if not term:
+            return super().filter_queryset(request, term, queryset, **dependent_fields)
+        if queryset is None:
+            queryset = self.get_queryset()
+        ids = [suggestion["id"] for suggestion in autocompletion.suggestions(term, limite=None)]
+        if not ids:
+            return recherche.filtrer(queryset, term)
+        # La première page suit l'ordre de l'index, la suite l'ordre alphabétique
+        ordre = Case(
+            *(When(pk=exercice_id, then=position) for position, exercice_id in enumerate(ids[:self.max_results])),
+            default=self.max_results,
+        )
+        return queryset.filter(pk__in=ids).order_by(ordre, "nom", "id")
+
+
 class EntrainementForm(forms.ModelForm):
     """Formulaire pour créer un entraînement"""
 
@@ -178,7 +208,7 @@ class EntrainementForm(forms.ModelForm):
     exercice_1 = forms.ModelChoiceField(
         queryset=Exercice.objects.filter(est_approuve=True),
         label="Exercice 1",
-        widget=forms.Select(attrs={"class": "form-select mb-3"}),
+        widget=ExerciceSelect2Widget(attrs={"class": "form-select mb-3", "data-placeholder": "Rechercher un exercice...", "data-width": "100%"}),
         required=True
     )
     sets_1 = forms.IntegerField(
@@ -197,7 +227,7 @@ class EntrainementForm(forms.ModelForm):
     exercice_2 = forms.ModelChoiceField(
         queryset=Exercice.objects.filter(est_approuve=True),
         label="Exercice 2",
-        widget=forms.Select(attrs={"class": "form-select mb-3"}),
+        widget=ExerciceSelect2Widget(attrs={"class": "form-select mb-3", "data-placeholder": "Rechercher un exercice...", "data-width": "100%"}),
         required=True
     )
     sets_2 = forms.IntegerField(
@@ -216,7 +246,7 @@ class EntrainementForm(forms.ModelForm):
     exercice_3 = forms.ModelChoiceField(
         queryset=Exercice.objects.filter(est_approuve=True),
         label="Exercice 3",
-        widget=forms.Select(attrs={"class": "form-select mb-3"}),
+        widget=ExerciceSelect2Widget(attrs={"class": "form-select mb-3", "data-placeholder": "Rechercher un exercice...", "data-width": "100%"}),
         required=True
     )
     sets_3 = forms.IntegerField(
@@ -235,7 +265,7 @@ class EntrainementForm(forms.ModelForm):
     exercice_4 = forms.ModelChoiceField(
         queryset=Exercice.objects.filter(est_approuve=True),
         label="Exercice 4",
-        widget=forms.Select(attrs={"class": "form-select mb-3"}),
+        widget=ExerciceSelect2Widget(attrs={"class": "form-select mb-3", "data-placeholder": "Rechercher un exercice...", "data-width": "100%"}),
         required=True
     )
     sets_4 = forms.IntegerField(
@@ -298,6 +328,10 @@ class BadgeForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields["code"].required = False
+        self.fields["code"].help_text = (
+            "Un code comme « reps-1000 », « series-500 », « exercices-100 » ou « entrainements-10 » "
+            "attribue le badge automatiquement quand le seuil est atteint."
+        )
 
     def clean_code(self):
         code = self.cleaned_data.get("code", "").strip()
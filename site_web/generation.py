@@ -0,0 +1,632 @@
+"""Génération de données synthétiques en masse
+
+Remplace l'ancien seed.py : le catalogue de départ (groupes musculaires et
+exercices) est chargé de façon idempotente, puis on génère à l'échelle
+demandée des utilisateurs, leurs entraînements avec leurs exercices, le
+journal de leurs complétions, des badges, des défis et la progression des
+participants. Comme en production, les statistiques et les cumuls par période
+sont la projection du journal des complétions (voir completions.py).
+
+Les lignes sont produites par lots à partir de générateurs, avec des ids
+attribués d'avance pour relier les tables sans relire la base, et insérées
+dans une transaction par lot : un INSERT préparé pour tout le lot, ou COPY
+sur PostgreSQL.
+Chaque table a son propre générateur pseudo-aléatoire dérivé de la graine.
+Les dates sont tirées avant l'instant de référence « maintenant » et les mots
+de passe sont hachés avec un sel fixe : une même graine et un même instant de
+référence sur une base vide produisent toujours les mêmes données.
+"""
+
+import csv
+import io
+import random
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import autocompletion, badges, caches, classement, completions, profils, recherche
+from .models import (
+    Badge, CompletionEntrainement, CumulPeriode, DefiBadge, Defis, Entrainement, Exercice, ExerciceEntrainement,
+    GroupeMusculaire, Statistiques, User, UserBadgeProgress,
+)
+
+TAILLE_LOT = 5000
+MOT_DE_PASSE = "repxp-synthetique"
+SEL = "repxpsynthetique"
+
+GROUPES = ['Dos', 'Pectoraux', 'Épaules', 'Avant-bras', 'Biceps', 'Cardio', 'Fessiers', 'Jambes', 'Triceps']
+
+# Catalogue de départ (anciennement seed.py)
+CATALOGUE = [
+    {
+        'nom': 'Tirage vertical à la poulie',
+        'groupe_musculaire': 'Dos',
+        'series_sugg': 4,
+        'reps_sugg': 10,
+        'description': 'Assis devant la machine à poulie haute, saisissez la barre en pronation, les mains un peu plus larges que les épaules. Tirez la barre vers le haut de la poitrine en contractant le dos, puis revenez lentement à la position de départ en contrôlant la charge.',
+        'image': 'images_exercices/lat_pulldown.png',
+        'est_approuve': False,
+    },
+    {
+        'nom': 'Tirage vertical à la barre',
+        'groupe_musculaire': 'Dos',
+        'series_sugg': 4,
+        'reps_sugg': 10,
+        'description': 'Saisissez la barre en pronation et tirez votre menton au-dessus de la barre. Gardez le dos droit et contrôlez la descente.',
+        'image': 'images_exercices/bar_row.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Tractions à la barre fixe',
+        'groupe_musculaire': 'Dos',
+        'series_sugg': 4,
+        'reps_sugg': 10,
+        'description': 'Saisissez la barre en pronation et tirez votre menton au-dessus de la barre. Gardez le dos droit et contrôlez la descente.',
+        'image': 'images_exercices/pull_up.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Rowing barre',
+        'groupe_musculaire': 'Dos',
+        'series_sugg': 4,
+        'reps_sugg': 12,
+        'description': "Penchez-vous légèrement vers l'avant et tirez la barre vers votre abdomen tout en contractant les omoplates.",
+        'image': 'images_exercices/bar_row.png',
+        'est_approuve': False,
+    },
+    {
+        'nom': 'Tirage horizontal à la poulie',
+        'groupe_musculaire': 'Dos',
+        'series_sugg': 3,
+        'reps_sugg': 15,
+        'description': 'Asseyez-vous face à la poulie, tirez la poignée vers votre ventre en gardant le dos droit.',
+        'image': 'images_exercices/cable_row.png',
+        'est_approuve': False,
+    },
+    {
+        'nom': 'Développé couché à la barre',
+        'groupe_musculaire': 'Pectoraux',
+        'series_sugg': 4,
+        'reps_sugg': 8,
+        'description': "Allongez-vous sur un banc, descendez la barre jusqu'à la poitrine puis poussez-la vers le haut en contractant les pectoraux.",
+        'image': 'images_exercices/barbel_bench.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Développé couché aux haltères',
+        'groupe_musculaire': 'Pectoraux',
+        'series_sugg': 4,
+        'reps_sugg': 8,
+        'description': "Allongez-vous sur un banc, descendez les haltères jusqu'à la poitrine puis poussez-les vers le haut en contractant les pectoraux.",
+        'image': 'images_exercices/dumbbell_press.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Pompes classiques',
+        'groupe_musculaire': 'Pectoraux',
+        'series_sugg': 3,
+        'reps_sugg': 20,
+        'description': 'Placez vos mains au sol à la largeur des épaules et poussez votre corps vers le haut en contractant les pectoraux.',
+        'image': 'images_exercices/push_up.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Écarté à la poulie debout',
+        'groupe_musculaire': 'Pectoraux',
+        'series_sugg': 3,
+        'reps_sugg': 12,
+        'description': "Debout entre deux poulies hautes, saisissez les poignées et ramenez-les lentement l'une vers l'autre devant la poitrine en contractant les pectoraux. Gardez une légère flexion des coudes et contrôlez le mouvement sur toute l’amplitude.",
+        'image': 'images_exercices/cable_fly.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Développé militaire à la barre',
+        'groupe_musculaire': 'Épaules',
+        'series_sugg': 4,
+        'reps_sugg': 10,
+        'description': "Tenez la barre au niveau des épaules et poussez-la au-dessus de la tête jusqu'à l'extension complète des bras.",
+        'image': 'images_exercices/military_press_barbel.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Développé militaire aux haltères',
+        'groupe_musculaire': 'Épaules',
+        'series_sugg': 4,
+        'reps_sugg': 10,
+        'description': "Tenez les haltères au niveau des épaules et poussez-les au-dessus de la tête jusqu'à l'extension complète des bras.",
+        'image': 'images_exercices/military_press_dumbbell.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Élévations latérales aux haltères',
+        'groupe_musculaire': 'Épaules',
+        'series_sugg': 3,
+        'reps_sugg': 15,
+        'description': "Tenez un haltère dans chaque main et levez les bras latéralement jusqu'à la hauteur des épaules.",
+        'image': 'images_exercices/lateral_raise_dumbbell.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Élévations latérales à la poulie',
+        'groupe_musculaire': 'Épaules',
+        'series_sugg': 3,
+        'reps_sugg': 15,
+        'description': "Tenez une poulie dans chaque main et levez les bras latéralement jusqu'à la hauteur des épaules.",
+        'image': 'images_exercices/cable_lateral_raise.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Rotation externe à la poulie',
+        'groupe_musculaire': 'Épaules',
+        'series_sugg': 3,
+        'reps_sugg': 15,
+        'description': "Debout à côté d'une poulie réglée à hauteur du coude, tenez la poignée avec la main extérieure et tirez lentement vers l'extérieur en gardant le coude collé au corps. Contrôlez le retour sans bouger le bras. Exercice idéal pour renforcer la coiffe des rotateurs et stabiliser l'épaule.",
+        'image': 'images_exercices/shoulder_rotator.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Curl barre droite',
+        'groupe_musculaire': 'Biceps',
+        'series_sugg': 4,
+        'reps_sugg': 12,
+        'description': "Tenez la barre paumes vers le haut et pliez les coudes pour soulever la barre jusqu'aux épaules.",
+        'image': 'images_exercices/bicep_bar.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Curl alterné avec haltères',
+        'groupe_musculaire': 'Biceps',
+        'series_sugg': 3,
+        'reps_sugg': 15,
+        'description': 'Alternez les bras en soulevant les haltères en gardant les coudes près du corps.',
+        'image': 'images_exercices/bicep_dumbbell.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Extension triceps à la poulie',
+        'groupe_musculaire': 'Triceps',
+        'series_sugg': 3,
+        'reps_sugg': 15,
+        'description': "Tirez la corde vers le bas en contractant les triceps jusqu'à l'extension complète des bras.",
+        'image': 'images_exercices/cable_tricep_pushdown.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Dips entre deux bancs',
+        'groupe_musculaire': 'Triceps',
+        'series_sugg': 3,
+        'reps_sugg': 12,
+        'description': 'Placez vos mains sur un banc et descendez votre corps en pliant les coudes, puis poussez vers le haut.',
+        'image': 'images_exercices/dips.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Squat',
+        'groupe_musculaire': 'Jambes',
+        'series_sugg': 4,
+        'reps_sugg': 10,
+        'description': 'Pliez les genoux en gardant le dos droit et poussez sur les talons pour revenir debout.',
+        'image': 'images_exercices/squat.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Fentes avant',
+        'groupe_musculaire': 'Jambes',
+        'series_sugg': 3,
+        'reps_sugg': 12,
+        'description': "Avancez une jambe et descendez jusqu'à former un angle de 90° avec les genoux, puis remontez.",
+        'image': 'images_exercices/lunge.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Presse à cuisses',
+        'groupe_musculaire': 'Jambes',
+        'series_sugg': 4,
+        'reps_sugg': 10,
+        'description': 'Poussez la plateforme de la machine avec vos jambes en contrôlant le mouvement à la descente.',
+        'image': 'images_exercices/leg_press.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Hip thrust',
+        'groupe_musculaire': 'Fessiers',
+        'series_sugg': 4,
+        'reps_sugg': 12,
+        'description': 'Appuyez le haut du dos sur un banc, poussez les hanches vers le haut en contractant les fessiers.',
+        'image': 'images_exercices/hip_thrust.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Course sur tapis',
+        'groupe_musculaire': 'Cardio',
+        'series_sugg': 1,
+        'reps_sugg': 20,
+        'description': 'Courez à un rythme modéré sur le tapis pendant plusieurs minutes pour améliorer votre endurance.',
+        'image': 'images_exercices/treadmill.png',
+        'est_approuve': True,
+    },
+    {
+        'nom': 'Corde à sauter',
+        'groupe_musculaire': 'Cardio',
+        'series_sugg': 3,
+        'reps_sugg': 60,
+        'description': 'Sautez à la corde à un rythme constant pour stimuler le cardio et la coordination.',
+        'image': 'images_exercices/rope.png',
+        'est_approuve': True,
+    },
+]
+
+MOTS_EXERCICES = ["Développé", "Tirage", "Rowing", "Curl", "Presse", "Fente", "Élévation", "Extension", "Squat", "Traction"]
+QUALIFICATIFS = ["incliné", "décliné", "unilatéral", "à la poulie", "aux haltères", "à la barre", "sur banc", "lesté"]
+MOTS_DESCRIPTION = (
+    "gardez le dos droit contrôlez la descente contractez les omoplates expirez en poussant "
+    "inspirez en revenant serrez les abdominaux verrouillez les coudes sans à-coups"
+).split()
+ICONES = ["badges/icones/engrenages.png"]
+
+
+def _aleatoire(graine, table):
+    """Générateur propre à une table, pour que l'ordre de génération n'influe pas sur les autres"""
+    return random.Random(f"{graine}:{table}")
+
+
+def _lots(lignes, taille):
+    iterateur = iter(lignes)
+    while lot := list(islice(iterateur, taille)):
+        yield lot
+
+
+def _premier_id(modele):
+    return (modele.objects.aggregate(dernier=Max("pk"))["dernier"] or 0) + 1
+
+
+def _valeur_copy(valeur):
+    if valeur is None:
+        return r"\N"
+    return valeur
+
+
+def _copier(modele, champs, lot):
+    colonnes = {champ.attname: champ.column for champ in modele._meta.concrete_fields}
+    nom = connection.ops.quote_name
+    sql = (
+        f"COPY {nom(modele._meta.db_table)} ({', '.join(nom(colonnes[champ]) for champ in champs)}) "
+        r"FROM STDIN WITH (FORMAT csv, NULL '\N')"
+    )
+    tampon = io.StringIO()
+    csv.writer(tampon).writerows([_valeur_copy(valeur) for valeur in ligne] for ligne in lot)
+    tampon.seek(0)
+    with connection.cursor() as curseur:
+        brut = curseur.cursor
+        if hasattr(brut, "copy_expert"):  # psycopg2
+            brut.copy_expert(sql, tampon)
+        else:  # psycopg 3
+            with brut.copy(sql) as copie:
+                copie.write(tampon.getvalue())
+
+
+def _executer(modele, champs, lot):
+    """Un INSERT préparé exécuté pour tout le lot : ce que compile bulk_create, sans une instance par ligne"""
+    bd = connections[DEFAULT_DB_ALIAS]
+    champs_modele = {champ.attname: champ for champ in modele._meta.concrete_fields}
+    preparations = [champs_modele[champ].get_db_prep_save for champ in champs]
+    nom = bd.ops.quote_name
+    sql = (
+        f"INSERT INTO {nom(modele._meta.db_table)} "
+        f"({', '.join(nom(champs_modele[champ].column) for champ in champs)}) "
+        f"VALUES ({', '.join(['%s'] * len(champs))})"
+    )
+    with bd.cursor() as curseur:
+        # Entiers et textes passent tels quels ; dates et heures sont converties par leur champ
+        curseur.executemany(sql, [
+            [
+                valeur if valeur is None or isinstance(valeur, (int, str)) else preparer(valeur, bd)
+                for preparer, valeur in zip(preparations, ligne)
+            ]
+            for ligne in lot
+        ])
+
+
+def inserer(modele, champs, lignes, taille_lot=TAILLE_LOT):
+    """Insère des tuples de valeurs (dans l'ordre des champs) par lots ; retourne le nombre de lignes
+
+    Chaque lot est une transaction. Les valeurs sont écrites telles quelles :
+    ni signaux, ni auto_now, ni valeurs par défaut des champs absents.
+    """
+    total = 0
+    for lot in _lots(lignes, taille_lot):
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                _copier(modele, champs, lot)
+            else:
+                _executer(modele, champs, lot)
+        total += len(lot)
+    return total
+
+
+def _reinitialiser_sequences(*modeles):
+    """Réaligne les séquences d'ids après des insertions avec ids explicites (PostgreSQL)"""
+    with connection.cursor() as curseur:
+        for sql in connection.ops.sequence_reset_sql(no_style(), modeles):
+            curseur.execute(sql)
+
+
+def charger_catalogue():
+    """Groupes musculaires et exercices de départ ; sans effet sur ce qui existe déjà
+
+    bulk_create() n'envoie pas de signaux : appeler publier_exercices() ensuite
+    pour que la recherche et l'autocomplétion trouvent le catalogue.
+    """
+    GroupeMusculaire.objects.bulk_create([GroupeMusculaire(nom=nom) for nom in GROUPES], ignore_conflicts=True)
+    groupes = dict(GroupeMusculaire.objects.values_list("nom", "id"))
+    Exercice.objects.bulk_create(
+        [
+            Exercice(
+                groupe_musculaire_id=groupes[donnees["groupe_musculaire"]],
+                **{cle: valeur for cle, valeur in donnees.items() if cle != "groupe_musculaire"},
+            )
+            for donnees in CATALOGUE
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def _exercices(aleatoire, premier, nombre, groupes):
+    for exercice_id in range(premier, premier + nombre):
+        yield (
+            exercice_id,
+            f"{aleatoire.choice(MOTS_EXERCICES)} {aleatoire.choice(QUALIFICATIFS)} #{exercice_id}",
+            aleatoire.choice(groupes),
+            aleatoire.randint(2, 5),
+            aleatoire.randint(6, 15),
+            " ".join(aleatoire.choices(MOTS_DESCRIPTION, k=14)),
+            "",
+            aleatoire.random() < 0.9,
+        )
+
+
+def _utilisateurs(aleatoire, premier, nombre, maintenant):
+    mot_de_passe = make_password(MOT_DE_PASSE, salt=SEL)
+    for user_id in range(premier, premier + nombre):
+        inscription = maintenant - timedelta(minutes=aleatoire.randint(0, 2 * 365 * 24 * 60))
+        yield (
+            user_id,
+            f"athlete{user_id}",
+            mot_de_passe,
+            f"athlete{user_id}@exemple.com",
+            "",
+            "",
+            False,
+            False,
+            True,
+            inscription,
+            "avatars/default_avatar.png",
+            (maintenant - timedelta(days=aleatoire.randint(16 * 365, 60 * 365))).date(),
+            aleatoire.choice("MF"),
+        )
+
+
+def _completions(aleatoire, seances, moyenne, maintenant):
+    """Complétions de chaque entraînement, datées entre sa création et l'instant de référence"""
+    for entrainement_id, user_id, creation, sets, reps, exercices in seances:
+        duree = max(0, int((maintenant - creation).total_seconds()))
+        for _ in range(int(aleatoire.expovariate(1 / moyenne)) if moyenne else 0):
+            yield (
+                user_id,
+                entrainement_id,
+                f"{aleatoire.getrandbits(256):064x}",
+                creation + timedelta(seconds=aleatoire.randint(0, duree)),
+                sets,
+                reps,
+                exercices,
+                1,
+                False,
+            )
+
+
+def _statistiques(totaux, premier_user, nombre):
+    """Une ligne par utilisateur généré : ses totaux du journal (triés par utilisateur), sinon des zéros"""
+    suivant = next(totaux, None)
+    for user_id in range(premier_user, premier_user + nombre):
+        if suivant is not None and suivant[0] == user_id:
+            yield (*suivant, 0)
+            suivant = next(totaux, None)
+        else:
+            yield (user_id, 0, 0, 0, 0, 0)
+
+
+def _entrainements(aleatoire, premier_user, utilisateurs, moyenne, premier, maintenant, repartition):
+    entrainement_id = premier
+    for user_id in range(premier_user, premier_user + utilisateurs):
+        nombre = aleatoire.randint(0, 2 * moyenne)
+        repartition.append(nombre)
+        for numero in range(nombre):
+            creation = maintenant - timedelta(minutes=aleatoire.randint(0, 365 * 24 * 60))
+            yield (entrainement_id, f"Séance {numero + 1}", creation, creation, user_id)
+            entrainement_id += 1
+
+
+def _exercices_entrainements(aleatoire, premier, nombre, approuves):
+    for entrainement_id in range(premier, premier + nombre):
+        for exercice_id in aleatoire.sample(approuves, 4):
+            yield (entrainement_id, exercice_id, aleatoire.randint(2, 5), aleatoire.randint(6, 15))
+
+
+def _badges(aleatoire, premier, nombre):
+    categories = [code for code, _ in Badge.CATEGORIES]
+    for badge_id in range(premier, premier + nombre):
+        yield (
+            badge_id,
+            f"Badge {badge_id}",
+            " ".join(aleatoire.choices(MOTS_DESCRIPTION, k=8)),
+            aleatoire.choice(ICONES),
+            aleatoire.choice(categories),
+            f"badge-{badge_id}",
+        )
+
+
+def _defis(aleatoire, premier, nombre, maintenant):
+    for defi_id in range(premier, premier + nombre):
+        creation = maintenant - timedelta(days=aleatoire.randint(1, 120))
+        # Environ un tiers des défis sont déjà échus
+        limite = creation + timedelta(days=aleatoire.randint(7, 180))
+        yield (defi_id, f"Défi {defi_id}", creation, limite)
+
+
+def _progressions(aleatoire, defis_badges, premier_user, utilisateurs, participation, maintenant):
+    """Pour chaque défi, un échantillon de participants et leur progression sur chacun de ses badges"""
+    participants = max(1, int(utilisateurs * participation))
+    for defi_id, badges in defis_badges:
+        for user_id in sorted(aleatoire.sample(range(premier_user, premier_user + utilisateurs), participants)):
+            for badge_id in badges:
+                complete = aleatoire.random() < 0.3
+                date = maintenant - timedelta(minutes=aleatoire.randint(0, 90 * 24 * 60)) if complete else None
+                yield (user_id, badge_id, defi_id, complete, date, False)
+
+
+def generer(utilisateurs, exercices=200, entrainements=5, badges=20, defis=10, participation=0.2,
+            graine=0, taille_lot=TAILLE_LOT, journal=None, completions_par_entrainement=3, maintenant=None):
+    """Génère un jeu de données complet ; retourne le nombre de lignes insérées par modèle
+
+    « entrainements » est le nombre moyen d'entraînements par utilisateur,
+    « completions_par_entrainement » le nombre moyen de complétions de chacun
+    et « participation » la part des utilisateurs inscrits à chaque défi.
+    Les dates sont tirées avant « maintenant » (par défaut l'heure courante).
+    """
+    journal = journal or (lambda message: None)
+    maintenant = maintenant or timezone.now()
+    totaux = {}
+
+    def inserer_table(modele, champs, lignes):
+        totaux[modele.__name__] = inserer(modele, champs, lignes, taille_lot)
+        journal(f"{modele.__name__} : {totaux[modele.__name__]} lignes")
+
+    charger_catalogue()
+    groupes = list(GroupeMusculaire.objects.values_list("id", flat=True))
+
+    inserer_table(
+        Exercice,
+        ["id", "nom", "groupe_musculaire_id", "series_sugg", "reps_sugg", "description", "image", "est_approuve"],
+        _exercices(_aleatoire(graine, "exercices"), _premier_id(Exercice), exercices, groupes),
+    )
+    approuves = list(Exercice.objects.filter(est_approuve=True).order_by("id").values_list("id", flat=True))
+
+    premier_user = _premier_id(User)
+    inserer_table(
+        User,
+        ["id", "username", "password", "email", "first_name", "last_name", "is_superuser", "is_staff",
+         "is_active", "date_joined", "avatar", "date_naissance", "sexe"],
+        _utilisateurs(_aleatoire(graine, "utilisateurs"), premier_user, utilisateurs, maintenant),
+    )
+    premier_entrainement = _premier_id(Entrainement)
+    repartition = []
+    inserer_table(
+        Entrainement,
+        ["id", "nom", "date_creation", "date_modification", "createur_id"],
+        _entrainements(_aleatoire(graine, "entrainements"), premier_user, utilisateurs, entrainements,
+                       premier_entrainement, maintenant, repartition),
+    )
+    inserer_table(
+        ExerciceEntrainement,
+        ["entrainement_id", "exercice_id", "sets", "reps"],
+        _exercices_entrainements(_aleatoire(graine, "exercices_entrainements"), premier_entrainement,
+                                 sum(repartition), approuves),
+    )
+
+    # Le journal des complétions, puis sa projection : statistiques et cumuls par période
+    seances = (
+        Entrainement.objects
+        .filter(id__gte=premier_entrainement)
+        .annotate(
+            total_sets=Coalesce(Sum("exerciceentrainement__sets"), 0),
+            total_reps=Coalesce(Sum(F("exerciceentrainement__sets") * F("exerciceentrainement__reps")), 0),
+            total_exercices=Count("exerciceentrainement"),
+        )
+        .order_by("id")
+        .values_list("id", "createur_id", "date_creation", "total_sets", "total_reps", "total_exercices")
+    )
+    inserer_table(
+        CompletionEntrainement,
+        ["user_id", "entrainement_id", "cle_idempotence", "date_completion", "sets", "reps", "exercices",
+         "entrainements", "est_reprise"],
+        _completions(_aleatoire(graine, "completions"), seances.iterator(chunk_size=taille_lot),
+                     completions_par_entrainement, maintenant),
+    )
+    totaux_journal = (
+        CompletionEntrainement.objects
+        .filter(user_id__gte=premier_user)
+        .values("user")
+        .annotate(**{f"total_{champ}": Sum(champ) for champ in completions.PROJECTION})
+        .order_by("user")
+        .values_list("user", *(f"total_{champ}" for champ in completions.PROJECTION))
+    )
+    inserer_table(
+        Statistiques,
+        ["user_id_id", *completions.PROJECTION.values(), "badges_obtenus"],
+        _statistiques(totaux_journal.iterator(chunk_size=taille_lot), premier_user, utilisateurs),
+    )
+    completions.reconstruire_cumuls()
+    totaux[CumulPeriode.__name__] = CumulPeriode.objects.count()
+    journal(f"CumulPeriode : {totaux[CumulPeriode.__name__]} lignes")
+
+    premier_badge = _premier_id(Badge)
+    inserer_table(
+        Badge,
+        ["id", "nom", "description", "icone", "categorie", "code"],
+        _badges(_aleatoire(graine, "badges"), premier_badge, badges),
+    )
+    premier_defi = _premier_id(Defis)
+    inserer_table(
+        Defis,
+        ["id", "nom", "date_creation", "date_limite"],
+        _defis(_aleatoire(graine, "defis"), premier_defi, defis, maintenant),
+    )
+
+    aleatoire = _aleatoire(graine, "defis_badges")
+    defis_badges = [
+        (defi_id, aleatoire.sample(range(premier_badge, premier_badge + badges), min(badges, aleatoire.randint(1, 3))))
+        for defi_id in range(premier_defi, premier_defi + defis)
+    ] if badges else []
+    inserer_table(
+        DefiBadge,
+        ["defi_id", "badge_id"],
+        ((defi_id, badge_id) for defi_id, liste in defis_badges for badge_id in liste),
+    )
+    inserer_table(
+        UserBadgeProgress,
+        ["user_id", "badge_id", "defi_id", "est_complete", "date_completion", "est_fige"],
+        _progressions(_aleatoire(graine, "progressions"), defis_badges, premier_user, utilisateurs,
+                      participation, maintenant) if utilisateurs else (),
+    )
+
+    if connection.vendor == "postgresql":
+        _reinitialiser_sequences(Exercice, User, Statistiques, Entrainement, ExerciceEntrainement,
+                                 CompletionEntrainement, Badge, Defis, DefiBadge, UserBadgeProgress)
+    finaliser()
+    return totaux
+
+
+def publier_exercices():
+    """Index de recherche, autocomplétion et caches de la banque après un chargement sans signaux"""
+    recherche.reindexer(Exercice.objects.filter(est_approuve=True))
+    autocompletion.invalider()
+    caches.invalider(
+        "entrainements", "groupes", "banque:tous",
+        *(f"banque:{groupe_id}" for groupe_id in GroupeMusculaire.objects.values_list("id", flat=True)),
+    )
+
+
+def finaliser():
+    """Ce que les signaux auraient fait ligne par ligne, refait en quelques requêtes"""
+    badges.recompter()
+    classement.reconstruire()
+    publier_exercices()
+    badges.invalider()
+    profils.invalider_tout()
+    caches.invalider("badges")
@@ -0,0 +1,160 @@
+"""Variantes redimensionnées des images téléversées
+
+Pour chaque image (avatars, images d'exercices, icônes de badges) on produit
+des copies de 64, 150 et 400 px de côté au plus, en WebP et en JPEG, sous
+« variantes/ » dans le stockage des médias. Les gabarits les choisissent avec
+srcset (voir templatetags/images.py).
+
+La présence des variantes d'un fichier est gardée par nom, dans la mémoire
+du processus puis dans le cache partagé : afficher une page d'avatars ne
+touche pas au stockage. Une absence n'est gardée que DUREE_ABSENTES
+secondes, le temps que les variantes soient générées par un autre processus.
+"""
+
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import caches
+
+logger = logging.getLogger(__name__)
+
+TAILLES = (64, 150, 400)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+DOSSIER = 'variantes'
+DOSSIERS_SOURCES = ('contenu', 'avatars', 'images_exercices', 'badges/icones')
+EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp')
+DUREE_PRESENTES = 24 * 60 * 60
+DUREE_ABSENTES = 60
+
+_presentes = caches.MemoireLocale(4096)
+
+
+@receiver(setting_changed)
+def _vider_presentes(setting, **kwargs):
+    if setting in ("CACHES", "MEDIA_ROOT", "STORAGES"):
+        _presentes.vider()
+
+
+def nom_variante(nom, taille, extension):
+    """« avatars/IMG.jpeg » -> « variantes/avatars/IMG_150.webp »"""
+    chemin = PurePosixPath(nom)
+    return str(PurePosixPath(DOSSIER) / chemin.parent / f"{chemin.stem}_{taille}.{extension}")
+
+
+def _cle_presentes(nom):
+    return f"variantes:{hashlib.md5(nom.encode()).hexdigest()}"
+
+
+def marquer_variantes(nom, presentes):
+    """Retient que les variantes d'un fichier viennent d'être écrites ou supprimées"""
+    duree = DUREE_PRESENTES if presentes else DUREE_ABSENTES
+    cache.set(_cle_presentes(nom), presentes, duree)
+    _presentes.ecrire(_cle_presentes(nom), presentes, duree)
+
+
+def variantes_presentes(nom, storage=default_storage):
+    """Vrai si les variantes d'un fichier existent, sans toucher au stockage quand la réponse est connue"""
+    cle = _cle_presentes(nom)
+    presentes = _presentes.lire(cle)
+    if presentes is caches.ABSENT:
+        presentes = cache.get(cle)
+        if presentes is None:
+            presentes = storage.exists(nom_variante(nom, TAILLES[-1], 'jpg'))
+            cache.set(cle, presentes, DUREE_PRESENTES if presentes else DUREE_ABSENTES)
+        _presentes.ecrire(cle, presentes, DUREE_PRESENTES if presentes else DUREE_ABSENTES)
+    return presentes
+
+
+def generer_variantes(nom, storage=default_storage, forcer=False):
+    """Crée toutes les variantes d'une image du stockage ; retourne le nombre de fichiers écrits"""
+    if not forcer and storage.exists(nom_variante(nom, TAILLES[-1], 'jpg')):
+        marquer_variantes(nom, True)
+        return 0
+
+    with storage.open(nom, 'rb') as fichier:
+        image = Image.open(fichier)
+        # Les JPEG sont décodés directement à une échelle réduite proche de la plus grande taille
+        image.draft('RGB', (TAILLES[-1] * 2, TAILLES[-1] * 2))
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    ecrits = 0
+    # Chaque taille est tirée de la précédente, plus grande, plutôt que de l'original
+    for taille in sorted(TAILLES, reverse=True):
+        image.thumbnail((taille, taille), Image.LANCZOS)
+        for extension, (format_pil, options) in FORMATS.items():
+            if format_pil == 'JPEG':
+                image_format = _sur_fond_blanc(image)
+            else:
+                image_format = image if image.mode in ('RGB', 'RGBA') else image.convert('RGBA')
+            tampon = BytesIO()
+            image_format.save(tampon, format_pil, **options)
+
+            destination = nom_variante(nom, taille, extension)
+            if storage.exists(destination):
+                storage.delete(destination)
+            storage.save(destination, ContentFile(tampon.getvalue()))
+            ecrits += 1
+    marquer_variantes(nom, True)
+    return ecrits
+
+
+def _sur_fond_blanc(image):
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        fond = Image.new('RGB', image.size, (255, 255, 255))
+        fond.paste(image, mask=image.getchannel('A'))
+        return fond
+    return image.convert('RGB')
+
+
+def generer_pour(fichier):
+    """Génère les variantes d'un champ ImageField qui vient d'être enregistré"""
+    if not fichier or not fichier.name or not fichier.storage.exists(fichier.name):
+        return
+    try:
+        # Les variantes ont des noms dérivés : elles passent par le stockage ordinaire,
+        # pas par le stockage par empreinte du champ
+        generer_variantes(fichier.name)
+    except (OSError, UnidentifiedImageError) as erreur:
+        # Le gabarit retombe sur l'image d'origine tant que les variantes manquent
+        logger.warning("Variantes impossibles pour %s : %s", fichier.name, erreur)
+
+
+def images_existantes(racine=None):
+    """Noms de stockage des images déjà présentes sous MEDIA_ROOT"""
+    racine = racine or settings.MEDIA_ROOT
+    for dossier in DOSSIERS_SOURCES:
+        for parent, _, fichiers in os.walk(os.path.join(racine, dossier)):
+            for fichier in sorted(fichiers):
+                if fichier.lower().endswith(EXTENSIONS):
+                    yield os.path.relpath(os.path.join(parent, fichier), racine).replace(os.sep, '/')
+
+
+def _generer(arguments):
+    nom, forcer = arguments
+    try:
+        return nom, generer_variantes(nom, forcer=forcer), None
+    except Exception as erreur:  # une image corrompue ne doit pas arrêter le lot
+        return nom, 0, str(erreur)
+
+
+def generer_en_parallele(noms, processus=None, forcer=False):
+    """Génère les variantes de plusieurs images sur tous les cœurs ; produit (nom, écrits, erreur)"""
+    with ProcessPoolExecutor(max_workers=processus or os.cpu_count()) as executeur:
+        yield from executeur.map(_generer, ((nom, forcer) for nom in noms), chunksize=4)
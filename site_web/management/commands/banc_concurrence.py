@@ -0,0 +1,48 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from site_web import banc_concurrence, banc_essai
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les profils de connexion SQLite (défaut et optimisé : WAL, synchronous=NORMAL, mmap, "
+        "busy_timeout, cache de pages, BEGIN IMMEDIATE) sous des complétions concurrentes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ecrivains", type=int, default=8, help="Threads qui complètent des entraînements")
+        parser.add_argument("--lecteurs", type=int, default=2, help="Threads qui lisent le classement")
+        parser.add_argument("--completions", type=int, default=50, help="Complétions par écrivain")
+        parser.add_argument("--utilisateurs", type=int, default=200)
+        parser.add_argument("--graine", type=int, default=0)
+        parser.add_argument("--profil", action="append", choices=banc_concurrence.PROFILS, help="Par défaut : tous")
+        parser.add_argument("--sortie", help="Fichier JSON du rapport")
+
+    def handle(self, *args, **options):
+        resultats = banc_concurrence.comparer(
+            profils=options["profil"] or tuple(banc_concurrence.PROFILS),
+            ecrivains=options["ecrivains"],
+            lecteurs=options["lecteurs"],
+            completions_par_ecrivain=options["completions"],
+            utilisateurs=options["utilisateurs"],
+            graine=options["graine"],
+            journal=self.stdout.write,
+        )
+
+        self.stdout.write(
+            f"{'Profil':<10} {'réussies':>9} {'verrouillées':>13} {'écr./s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'lect./s':>8}"
+        )
+        for profil, mesure in resultats.items():
+            self.stdout.write(
+                f"{profil:<10} {mesure['reussies']:>9} {mesure['verrouillees']:>13} {mesure['ecritures_par_s']:>8.1f} "
+                f"{mesure['p50_ms']:>8.2f} {mesure['p95_ms']:>8.2f} {mesure['p99_ms']:>8.2f} {mesure['lectures_par_s']:>8.1f}"
+            )
+
+        if options["sortie"]:
+            echelle = {cle: options[cle] for cle in ("ecrivains", "lecteurs", "completions", "utilisateurs", "graine")}
+            rapport = {"contexte": banc_essai.contexte(**echelle), "profils": resultats}
+            Path(options["sortie"]).write_text(json.dumps(rapport, indent=2, ensure_ascii=False))
+            self.stdout.write(self.style.SUCCESS(f"Rapport enregistré dans {options['sortie']}"))
@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from site_web import banc_essai
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure la latence (p50/p95/p99), le débit et les requêtes SQL de chaque route du site "
+        "sur une base synthétique, et enregistre le résultat en JSON"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--utilisateurs", type=int, default=1000)
+        parser.add_argument("--exercices", type=int, default=300)
+        parser.add_argument("--entrainements", type=int, default=5, help="Entraînements par utilisateur")
+        parser.add_argument("--iterations", type=int, default=50, help="Requêtes mesurées par route")
+        parser.add_argument("--echauffement", type=int, default=3, help="Requêtes non mesurées par route")
+        parser.add_argument("--clients", type=int, default=10, help="Utilisateurs connectés en alternance")
+        parser.add_argument("--graine", type=int, default=0)
+        parser.add_argument("--sortie", help="Fichier JSON du rapport")
+        parser.add_argument(
+            "--base-existante", action="store_true",
+            help="Mesure la base configurée telle quelle au lieu d'une base de test synthétique",
+        )
+
+    def handle(self, *args, **options):
+        echelle = {cle: options[cle] for cle in ("utilisateurs", "exercices", "entrainements", "iterations", "graine")}
+        with banc_essai.environnement(
+            options["utilisateurs"], options["exercices"], options["entrainements"], options["graine"],
+            base_existante=options["base_existante"], journal=self.stdout.write,
+        ):
+            resultats = self.mesurer(options)
+
+        rapport = {"contexte": banc_essai.contexte(**echelle), "routes": resultats}
+        if options["sortie"]:
+            Path(options["sortie"]).write_text(json.dumps(rapport, indent=2, ensure_ascii=False))
+            self.stdout.write(self.style.SUCCESS(f"Rapport enregistré dans {options['sortie']}"))
+
+    def mesurer(self, options):
+        resultats = banc_essai.mesurer(options["iterations"], options["echauffement"], options["clients"], options["graine"])
+        self.stdout.write(f"{'Route':<40} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>8} {'SQL':>5}  statuts")
+        for nom, mesure in resultats.items():
+            self.stdout.write(
+                f"{nom:<40} {mesure['p50_ms']:>8.2f} {mesure['p95_ms']:>8.2f} {mesure['p99_ms']:>8.2f} "
+                f"{mesure['debit_rps']:>8.1f} {mesure['sql_median']:>5}  {mesure['statuts']}"
+            )
+        return resultats
@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from site_web import banc_essai, banc_serveurs
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le débit et la latence de gunicorn en mode WSGI (workers synchrones) et ASGI "
+        "(workers uvicorn) sous une charge concurrente, sur la base configurée"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requetes", type=int, default=1000, help="Requêtes mesurées par mode")
+        parser.add_argument("--concurrence", type=int, default=20, help="Clients HTTP simultanés")
+        parser.add_argument("--workers", type=int, default=2, help="Workers gunicorn dans chaque mode")
+        parser.add_argument("--echauffement", type=int, default=5, help="Passages non mesurés sur chaque page")
+        parser.add_argument("--clients", type=int, default=10, help="Utilisateurs connectés en alternance")
+        parser.add_argument("--mode", action="append", choices=banc_serveurs.MODES, help="Par défaut : les deux")
+        parser.add_argument("--sortie", help="Fichier JSON du rapport")
+
+    def handle(self, *args, **options):
+        resultats = banc_serveurs.comparer(
+            requetes=options["requetes"],
+            concurrence=options["concurrence"],
+            workers=options["workers"],
+            echauffement=options["echauffement"],
+            clients=options["clients"],
+            modes=options["mode"] or banc_serveurs.MODES,
+            journal=self.stdout.write,
+        )
+
+        self.stdout.write(f"{'Mode':<6} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}  statuts")
+        for mode, mesure in resultats.items():
+            self.stdout.write(
+                f"{mode:<6} {mesure['debit_rps']:>8.1f} {mesure['p50_ms']:>8.2f} {mesure['p95_ms']:>8.2f} "
+                f"{mesure['p99_ms']:>8.2f}  {mesure['statuts']}"
+            )
+
+        if options["sortie"]:
+            echelle = {cle: options[cle] for cle in ("requetes", "concurrence", "workers")}
+            rapport = {"contexte": banc_essai.contexte(**echelle), "modes": resultats}
+            Path(options["sortie"]).write_text(json.dumps(rapport, indent=2, ensure_ascii=False))
+            self.stdout.write(self.style.SUCCESS(f"Rapport enregistré dans {options['sortie']}"))
@@ -0,0 +1,46 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from site_web import defis
+
+
+class Command(BaseCommand):
+    help = (
+        "Clôture les défis échus : fige leurs progressions et écrit leur classement final. "
+        "Avec --boucle, tourne en continu et se réveille à la prochaine date limite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--boucle", action="store_true", help="Reste actif comme worker")
+        parser.add_argument(
+            "--intervalle", type=float, default=60,
+            help="Attente maximale entre deux passages en mode boucle, en secondes",
+        )
+
+    def handle(self, *args, **options):
+        if not options["boucle"]:
+            self.passage()
+            return
+
+        arret = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: arret.set())
+        self.stdout.write(f"Worker de clôture démarré (intervalle {options['intervalle']} s)")
+        while not arret.is_set():
+            close_old_connections()
+            self.passage()
+            # Réveil à la prochaine échéance si elle tombe avant l'intervalle
+            prochaine = defis.prochaine_echeance()
+            attente = options["intervalle"]
+            if prochaine is not None:
+                attente = min(attente, max(0.0, (prochaine - timezone.now()).total_seconds()) + 1)
+            arret.wait(attente)
+        self.stdout.write("Worker de clôture arrêté.")
+
+    def passage(self):
+        for defi_id, participants in defis.cloturer_echus():
+            self.stdout.write(self.style.SUCCESS(f"Défi {defi_id} clôturé : {participants} participant(s) classé(s)"))
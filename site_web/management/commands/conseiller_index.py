@@ -0,0 +1,55 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from site_web import banc_essai, plans
+
+
+class Command(BaseCommand):
+    help = (
+        "Capture le SQL émis par chaque vue sur une base synthétique, l'explique avec EXPLAIN "
+        "et signale les parcours de tables entières et les tris sans index"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--utilisateurs", type=int, default=5000)
+        parser.add_argument("--exercices", type=int, default=1000)
+        parser.add_argument("--entrainements", type=int, default=5, help="Entraînements par utilisateur")
+        parser.add_argument("--graine", type=int, default=0)
+        parser.add_argument(
+            "--lignes-min", type=int, default=1000,
+            help="Les tables de moins de lignes que ce seuil peuvent être parcourues sans alerte",
+        )
+        parser.add_argument("--plans", action="store_true", help="Affiche le plan de chaque requête, même sans alerte")
+        parser.add_argument("--sortie", help="Fichier JSON du rapport")
+        parser.add_argument(
+            "--base-existante", action="store_true",
+            help="Analyse la base configurée telle quelle au lieu d'une base de test synthétique",
+        )
+
+    def handle(self, *args, **options):
+        with banc_essai.environnement(
+            options["utilisateurs"], options["exercices"], options["entrainements"], options["graine"],
+            base_existante=options["base_existante"], journal=self.stdout.write,
+        ):
+            rapports = plans.analyser(plans.capturer(graine=options["graine"]), options["lignes_min"])
+
+        total = 0
+        for nom, requetes in rapports.items():
+            alertes = sum(len(requete["alertes"]) for requete in requetes)
+            total += alertes
+            style = self.style.WARNING if alertes else self.style.SUCCESS
+            self.stdout.write(style(f"{nom} : {len(requetes)} requête(s), {alertes} alerte(s)"))
+            for requete in requetes:
+                if not (requete["alertes"] or options["plans"]):
+                    continue
+                self.stdout.write(f"    {requete['sql'][:160]}")
+                lignes = requete["plan"] if options["plans"] else [detail for _, _, detail in requete["alertes"]]
+                for ligne in lignes:
+                    self.stdout.write(f"        {ligne}")
+
+        if options["sortie"]:
+            Path(options["sortie"]).write_text(json.dumps(rapports, indent=2, ensure_ascii=False))
+            self.stdout.write(self.style.SUCCESS(f"Rapport enregistré dans {options['sortie']}"))
+        self.stdout.write(f"{total} alerte(s) au total.")
@@ -0,0 +1,57 @@
+import shutil
+import subprocess
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from site_web import statiques
+
+SASS = statiques.APPLICATION / 'static' / 'site_web' / 'css' / 'styles.sass'
+CSS = SASS.with_suffix('.css')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile styles.sass, collecte les statiques (purge CSS, images allégées, variantes gzip "
+        "et Brotli) et rapporte le poids des statiques de chaque page avant et après"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sans-sass", action="store_true", help="Garde le styles.css déjà compilé")
+        parser.add_argument("--rapport", action="store_true", help="Affiche seulement le rapport, sans construire")
+
+    def handle(self, *args, **options):
+        if not options["rapport"]:
+            if not options["sans_sass"]:
+                self.compiler_sass()
+            call_command("collectstatic", interactive=False, verbosity=0)
+        self.rapporter()
+
+    def compiler_sass(self):
+        # Dart Sass (npm install sass bootstrap) ; libsass ne comprend pas « @use »
+        sass = shutil.which("sass") or shutil.which("sass", path=str(Path(settings.BASE_DIR) / "node_modules" / ".bin"))
+        bootstrap = Path(settings.BASE_DIR) / "node_modules" / "bootstrap" / "scss"
+        if not sass or not bootstrap.is_dir():
+            self.stderr.write("Sass ou les sources de Bootstrap sont absents : styles.css est gardé tel quel.")
+            return
+        resultat = subprocess.run(
+            [sass, "--no-source-map", f"--load-path={bootstrap}", str(SASS), str(CSS)],
+            capture_output=True, text=True,
+        )
+        if resultat.returncode:
+            raise CommandError(resultat.stderr)
+
+    def rapporter(self):
+        pages = sorted(
+            str(chemin.relative_to(statiques.APPLICATION / "templates"))
+            for chemin in (statiques.APPLICATION / "templates" / "site_web").rglob("*.html")
+        )
+        self.stdout.write(f"{'Page':<50} {'Source':>10} {'Construit':>10} {'Transféré':>10}")
+        for page in pages:
+            totaux = [0, 0, 0]
+            for nom in statiques.ressources_de_page(page):
+                for i, taille in enumerate(statiques.poids(nom)):
+                    totaux[i] += taille
+            self.stdout.write(f"{page:<50} " + " ".join(f"{taille / 1024:>8.1f}Ko" for taille in totaux))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from site_web import medias
+
+
+class Command(BaseCommand):
+    help = (
+        "Déplace les images existantes vers le stockage par empreinte, fusionne les copies "
+        "identiques, réécrit les chemins des modèles et recompte les références"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--supprimer-originaux",
+            action="store_true",
+            help="Supprime les fichiers d'origine une fois convertis (sauf les valeurs par défaut des champs)",
+        )
+
+    def handle(self, *args, **options):
+        conversions, nouveaux, manquants = medias.convertir(options["supprimer_originaux"])
+        for nom in manquants:
+            self.stderr.write(f"Fichier introuvable, chemin laissé tel quel : {nom}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(conversions)} chemins réécrits vers {len(nouveaux)} fichiers par empreinte, "
+            f"{len(manquants)} introuvables."
+        ))
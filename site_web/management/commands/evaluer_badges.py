@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from site_web import badges
+from site_web.models import Defis
+
+
+class Command(BaseCommand):
+    help = "Note en bloc tous les utilisateurs sur les badges à règle des défis en cours"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--defi",
+            action="append",
+            type=int,
+            help="Id du défi à évaluer (par défaut : tous les défis non échus)",
+        )
+
+    def handle(self, *args, **options):
+        defis = Defis.objects.filter(date_limite__gt=timezone.now())
+        if options["defi"]:
+            defis = Defis.objects.filter(pk__in=options["defi"])
+        for defi in defis.order_by("pk"):
+            completees = badges.evaluer_defi(defi)
+            self.stdout.write(f"{defi} : {completees} progression(s) complétée(s)")
+        self.stdout.write(self.style.SUCCESS("Évaluation terminée."))
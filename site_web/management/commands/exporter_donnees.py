@@ -0,0 +1,33 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from site_web import exports
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporte en flux les utilisateurs, les statistiques ou les entraînements, champs liés joints, "
+        "par lots de taille fixe quel que soit le nombre de lignes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("modele", choices=exports.MODELES)
+        parser.add_argument("--format", choices=exports.FORMATS, default="csv")
+        parser.add_argument("--sortie", help="Fichier de sortie (par défaut : sortie standard)")
+        parser.add_argument("--taille-lot", type=int, default=exports.TAILLE_LOT)
+
+    def handle(self, *args, **options):
+        modele, fabrique = exports.MODELES[options["modele"]]
+        sections = [fabrique(modele.objects.all())]
+        if not options["sortie"]:
+            exports.ecrire(sections, options["format"], sys.stdout, options["taille_lot"])
+            return
+
+        debut = time.perf_counter()
+        with open(options["sortie"], "w", encoding="utf-8", newline="") as fichier:
+            ecrits = exports.ecrire(sections, options["format"], fichier, options["taille_lot"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{ecrits} caractères écrits dans {options['sortie']} en {time.perf_counter() - debut:.1f} s."
+        ))
@@ -0,0 +1,69 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from site_web import generation
+
+
+def _instant(valeur):
+    instant = datetime.fromisoformat(valeur)
+    return instant if timezone.is_aware(instant) else timezone.make_aware(instant)
+
+
+class Command(BaseCommand):
+    help = (
+        "Charge le catalogue de départ puis génère en masse utilisateurs, entraînements, complétions "
+        "(et leur projection : statistiques et cumuls par période), badges, défis et progressions, "
+        "de façon reproductible pour une graine et une date de référence données"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--utilisateurs", type=int, default=1000)
+        parser.add_argument("--exercices", type=int, default=200, help="Exercices synthétiques en plus du catalogue")
+        parser.add_argument("--entrainements", type=int, default=5, help="Entraînements par utilisateur, en moyenne")
+        parser.add_argument(
+            "--completions", type=float, default=3, help="Complétions par entraînement, en moyenne",
+        )
+        parser.add_argument(
+            "--reference", type=_instant,
+            help="Instant de référence des dates générées (ISO 8601) ; par défaut l'heure courante",
+        )
+        parser.add_argument("--badges", type=int, default=20)
+        parser.add_argument("--defis", type=int, default=10)
+        parser.add_argument(
+            "--participation", type=float, default=0.2,
+            help="Part des utilisateurs qui participent à chaque défi",
+        )
+        parser.add_argument("--graine", type=int, default=0)
+        parser.add_argument("--taille-lot", type=int, default=generation.TAILLE_LOT)
+        parser.add_argument(
+            "--catalogue-seulement", action="store_true",
+            help="Ne charge que les groupes musculaires et les exercices de départ",
+        )
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        if options["catalogue_seulement"]:
+            generation.charger_catalogue()
+            generation.publier_exercices()
+            self.stdout.write(self.style.SUCCESS("Catalogue de départ chargé."))
+            return
+
+        totaux = generation.generer(
+            options["utilisateurs"],
+            exercices=options["exercices"],
+            entrainements=options["entrainements"],
+            badges=options["badges"],
+            defis=options["defis"],
+            participation=options["participation"],
+            graine=options["graine"],
+            taille_lot=options["taille_lot"],
+            journal=self.stdout.write,
+            completions_par_entrainement=options["completions"],
+            maintenant=options["reference"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(totaux.values())} lignes générées en {time.perf_counter() - debut:.1f} s."
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from site_web import images
+
+
+class Command(BaseCommand):
+    help = "Génère en parallèle les variantes redimensionnées des images existantes du dossier media/"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processus", type=int, help="Nombre de processus (par défaut : un par cœur)")
+        parser.add_argument("--forcer", action="store_true", help="Régénère les variantes déjà présentes")
+
+    def handle(self, *args, **options):
+        noms = list(images.images_existantes())
+        ecrits = erreurs = 0
+        for nom, nombre, erreur in images.generer_en_parallele(noms, options["processus"], options["forcer"]):
+            if erreur:
+                erreurs += 1
+                self.stderr.write(f"{nom} : {erreur}")
+            ecrits += nombre
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(noms)} images traitées, {ecrits} variantes écrites, {erreurs} erreurs."
+        ))
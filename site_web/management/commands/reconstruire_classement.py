@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from site_web import classement
+
+
+class Command(BaseCommand):
+    help = "Recalcule en bloc les rangs matérialisés du classement à partir des statistiques"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--champ",
+            action="append",
+            choices=classement.CHAMPS,
+            help="Champ de tri à reconstruire (par défaut : tous)",
+        )
+
+    def handle(self, *args, **options):
+        champs = options["champ"] or classement.CHAMPS
+        classement.reconstruire(champs)
+        self.stdout.write(self.style.SUCCESS(f"Classement reconstruit pour : {', '.join(champs)}"))
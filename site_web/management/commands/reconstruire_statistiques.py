@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from site_web import completions
+
+
+class Command(BaseCommand):
+    help = "Recalcule les statistiques, les cumuls par période et le classement à partir du journal des complétions"
+
+    def handle(self, *args, **options):
+        completions.reconstruire_statistiques()
+        completions.reconstruire_cumuls()
+        self.stdout.write(self.style.SUCCESS("Statistiques et cumuls reconstruits à partir du journal."))
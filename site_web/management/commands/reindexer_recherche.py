@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from site_web import recherche
+from site_web.models import Exercice
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte des exercices approuvés"
+
+    def handle(self, *args, **options):
+        exercices = Exercice.objects.filter(est_approuve=True)
+        recherche.reindexer(exercices)
+        self.stdout.write(self.style.SUCCESS(f"{exercices.count()} exercices indexés."))
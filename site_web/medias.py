@@ -0,0 +1,127 @@
+"""Décompte des références aux images stockées par empreinte
+
+Plusieurs lignes peuvent pointer vers le même fichier « contenu/… » ; on ne le
+supprime, avec ses variantes, que lorsque la dernière référence disparaît.
+Les signaux tiennent le décompte à jour ; recompter() le reconstruit à partir
+des champs d'image en cas de doute.
+"""
+
+import logging
+import os
+
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from . import images
+from .models import Badge, Exercice, FichierMedia, User
+from .stockage import est_adresse, stockage_contenu
+
+logger = logging.getLogger(__name__)
+
+CHAMPS = ((User, 'avatar'), (Exercice, 'image'), (Badge, 'icone'))
+
+
+def retenir(nom):
+    """Ajoute une référence à un fichier stocké par empreinte"""
+    if not est_adresse(nom):
+        return
+    if FichierMedia.objects.filter(nom=nom).update(references=F('references') + 1):
+        return
+    try:
+        with transaction.atomic():
+            FichierMedia.objects.create(nom=nom, references=1)
+    except IntegrityError:
+        FichierMedia.objects.filter(nom=nom).update(references=F('references') + 1)
+
+
+def liberer(nom):
+    """Retire une référence ; le fichier et ses variantes sont supprimés après la dernière"""
+    if not est_adresse(nom):
+        return
+    FichierMedia.objects.filter(nom=nom, references__gt=0).update(references=F('references') - 1)
+    transaction.on_commit(lambda: _supprimer_si_orphelin(nom))
+
+
+def _supprimer_si_orphelin(nom):
+    supprimes, _ = FichierMedia.objects.filter(nom=nom, references=0).delete()
+    if supprimes:
+        supprimer_fichier(nom)
+
+
+def supprimer_fichier(nom, storage=stockage_contenu):
+    """Supprime un fichier et ses variantes redimensionnées"""
+    for taille in images.TAILLES:
+        for extension in images.FORMATS:
+            storage.delete(images.nom_variante(nom, taille, extension))
+    images.marquer_variantes(nom, False)
+    storage.delete(nom)
+
+
+def recompter():
+    """Reconstruit le décompte à partir des champs d'image ; retourne le nombre de fichiers"""
+    totaux = {}
+    for modele, champ in CHAMPS:
+        lignes = (
+            modele.objects
+            .filter(**{f'{champ}__startswith': 'contenu/'})
+            .values_list(champ)
+            .annotate(total=Count('pk'))
+            .order_by()
+        )
+        for nom, total in lignes:
+            totaux[nom] = totaux.get(nom, 0) + total
+
+    with transaction.atomic():
+        FichierMedia.objects.all().delete()
+        FichierMedia.objects.bulk_create(
+            [FichierMedia(nom=nom, references=total) for nom, total in totaux.items()],
+            batch_size=1000,
+        )
+    return len(totaux)
+
+
+def convertir(supprimer_originaux=False):
+    """Déplace les images existantes vers le stockage par empreinte et réécrit les chemins
+
+    Chaque fichier distinct n'est lu qu'une fois ; les lignes sont réécrites
+    par nom d'origine avec un seul UPDATE. Retourne (noms convertis, fichiers
+    créés, fichiers manquants).
+    """
+    conversions = {}
+    manquants = []
+    for modele, champ in CHAMPS:
+        noms = (
+            modele.objects
+            .exclude(**{f'{champ}__startswith': 'contenu/'})
+            .exclude(**{champ: ''})
+            .exclude(**{f'{champ}__isnull': True})
+            .values_list(champ, flat=True)
+            .distinct()
+            .order_by()
+        )
+        for ancien in noms:
+            if ancien not in conversions:
+                if not stockage_contenu.exists(ancien):
+                    manquants.append(ancien)
+                    continue
+                with stockage_contenu.open(ancien, 'rb') as fichier:
+                    conversions[ancien] = stockage_contenu.save(ancien, File(fichier))
+            # update() ne déclenche pas les signaux : le décompte est refait d'un bloc ensuite
+            modele.objects.filter(**{champ: ancien}).update(**{champ: conversions[ancien]})
+
+    recompter()
+
+    nouveaux = sorted(set(conversions.values()))
+    for nom, _, erreur in images.generer_en_parallele(nouveaux):
+        if erreur:
+            logger.warning("Variantes impossibles pour %s : %s", nom, erreur)
+
+    if supprimer_originaux:
+        # Les valeurs par défaut des champs restent la cible des nouvelles lignes
+        conserves = {modele._meta.get_field(champ).get_default() for modele, champ in CHAMPS}
+        for ancien in conversions:
+            if ancien not in conserves and os.path.exists(stockage_contenu.path(ancien)):
+                supprimer_fichier(ancien)
+
+    return conversions, nouveaux, manquants
@@ -0,0 +1,386 @@
+"""Métriques des requêtes au format texte de Prometheus
+
+Le middleware mesure chaque requête et range les mesures sous le nom d'URL
+de la vue : durée, nombre et durée des requêtes SQL, temps de rendu des
+gabarits, taille de la réponse et code de statut. Les requêtes SQL sont
+chronométrées sur chaque connexion dès son ouverture, quel que soit le
+thread où l'ORM s'exécute. Chaque processus cumule
+ses mesures en mémoire et les écrit au plus toutes les INTERVALLE secondes
+dans son propre fichier sous METRIQUES_DOSSIER ; la vue /metrics additionne
+les fichiers de tous les processus (workers gunicorn compris). Pour que les
+compteurs ne reculent pas sans que le dossier grossisse à chaque
+redémarrage, un processus qui se termine verse ses cumuls dans un fichier
+commun (CUMUL) et supprime le sien ; le fichier d'un processus mort sans
+passer par là (tué, plantage) y est versé dès qu'il a plus de RETENTION
+secondes. Les versements et les lectures se coordonnent par un verrou de
+fichier : le dossier est propre à une machine.
+"""
+
+import atexit
+import contextvars
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates
+
+INTERVALLE = 5
+CUMUL = "cumul.json"
+# Âge au-delà duquel le fichier d'un processus disparu est versé dans CUMUL
+RETENTION = 3600
+SECONDES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+NOMBRES_SQL = (1, 2, 5, 10, 20, 50, 100, 200)
+OCTETS = (1024, 10240, 102400, 1048576, 10485760)
+
+DESCRIPTIONS = {
+    "repxp_requete_duree_secondes": ("histogram", "Durée des requêtes par vue"),
+    "repxp_requete_sql_nombre": ("histogram", "Requêtes SQL par requête HTTP, par vue"),
+    "repxp_reponse_octets": ("histogram", "Taille des réponses par vue"),
+    "repxp_requetes_total": ("counter", "Requêtes par vue et par code de statut"),
+    "repxp_sql_requetes_total": ("counter", "Requêtes SQL exécutées par vue"),
+    "repxp_sql_duree_secondes_total": ("counter", "Temps passé dans les requêtes SQL par vue"),
+    "repxp_gabarits_duree_secondes_total": ("counter", "Temps de rendu des gabarits par vue"),
+    "repxp_cache_total": ("counter", "Lectures des espaces de cache par niveau atteint (local, partage) ou échec"),
+}
+
+_mesure = contextvars.ContextVar("mesure", default=None)
+
+
+def dossier():
+    return Path(getattr(settings, "METRIQUES_DOSSIER", Path(settings.BASE_DIR) / ".cache" / "metriques"))
+
+
+class Registre:
+    """Compteurs et histogrammes d'un processus, écrits périodiquement sur disque"""
+
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.compteurs = {}
+        self.histogrammes = {}
+        self.ecrit = time.monotonic()
+        self.pid = None
+        self.fichier = None
+
+    def ajouter(self, nom, etiquettes, valeur=1):
+        cle = (nom, etiquettes)
+        self.compteurs[cle] = self.compteurs.get(cle, 0) + valeur
+
+    def observer(self, nom, etiquettes, valeur, bornes):
+        cle = (nom, etiquettes)
+        seaux = self.histogrammes.get(cle)
+        if seaux is None:
+            seaux = self.histogrammes[cle] = [0] * len(bornes) + [0, 0]
+        for i, borne in enumerate(bornes):
+            if valeur <= borne:
+                seaux[i] += 1
+        seaux[-2] += 1
+        seaux[-1] += valeur
+
+    def compter(self, nom, etiquettes, valeur=1):
+        """ajouter() hors d'une requête mesurée, par exemple depuis caches"""
+        with self.verrou:
+            self.ajouter(nom, etiquettes, valeur)
+
+    def enregistrer(self, vue, statut, duree, sql_nombre, sql_duree, gabarits_duree, octets):
+        etiquettes = (("vue", vue),)
+        with self.verrou:
+            self.ajouter("repxp_requetes_total", etiquettes + (("statut", str(statut)),))
+            self.ajouter("repxp_sql_requetes_total", etiquettes, sql_nombre)
+            self.ajouter("repxp_sql_duree_secondes_total", etiquettes, sql_duree)
+            self.ajouter("repxp_gabarits_duree_secondes_total", etiquettes, gabarits_duree)
+            self.observer("repxp_requete_duree_secondes", etiquettes, duree, SECONDES)
+            self.observer("repxp_requete_sql_nombre", etiquettes, sql_nombre, NOMBRES_SQL)
+            if octets is not None:
+                self.observer("repxp_reponse_octets", etiquettes, octets, OCTETS)
+        if time.monotonic() - self.ecrit > INTERVALLE:
+            self.ecrire()
+
+    def ecrire(self):
+        """Remplace le fichier du processus par ses cumuls actuels"""
+        with self.verrou:
+            self.ecrit = time.monotonic()
+            donnees = _serialiser(self.compteurs, self.histogrammes)
+        if not donnees["compteurs"]:
+            return
+        if self.pid != os.getpid():
+            # Un nom propre à chaque processus, même après un fork (gunicorn --preload) ou
+            # la réutilisation d'un pid : aucun fichier ne reprend les cumuls d'un autre
+            self.pid = os.getpid()
+            self.fichier = f"{self.pid}-{uuid.uuid4().hex[:8]}.json"
+        repertoire = dossier()
+        repertoire.mkdir(parents=True, exist_ok=True)
+        _ecrire_fichier(repertoire / self.fichier, donnees)
+
+    def clore(self):
+        """Verse les cumuls du processus dans CUMUL et supprime son fichier ; appelé à la sortie"""
+        with self.verrou:
+            donnees = _serialiser(self.compteurs, self.histogrammes)
+            self.compteurs.clear()
+            self.histogrammes.clear()
+        if not donnees["compteurs"]:
+            return
+        with _verrou_dossier(fcntl.LOCK_EX):
+            # Le fichier du processus n'est qu'un instantané plus ancien des mêmes cumuls
+            _verser(donnees)
+            if self.pid == os.getpid() and self.fichier:
+                (dossier() / self.fichier).unlink(missing_ok=True)
+
+    def vider(self):
+        with self.verrou:
+            self.compteurs.clear()
+            self.histogrammes.clear()
+
+
+def _serialiser(compteurs, histogrammes):
+    return {
+        "compteurs": [[nom, list(etiquettes), valeur] for (nom, etiquettes), valeur in compteurs.items()],
+        "histogrammes": [[nom, list(etiquettes), seaux] for (nom, etiquettes), seaux in histogrammes.items()],
+    }
+
+
+def _ecrire_fichier(fichier, donnees):
+    temporaire = fichier.with_suffix(".tmp")
+    temporaire.write_text(json.dumps(donnees))
+    os.replace(temporaire, fichier)
+
+
+def _lire_fichier(fichier):
+    try:
+        return json.loads(fichier.read_text())
+    except (OSError, ValueError):
+        return None  # fichier absent ou en cours de remplacement
+
+
+def _ajouter(compteurs, histogrammes, donnees):
+    for nom, etiquettes, valeur in donnees["compteurs"]:
+        cle = (nom, tuple(map(tuple, etiquettes)))
+        compteurs[cle] = compteurs.get(cle, 0) + valeur
+    for nom, etiquettes, seaux in donnees["histogrammes"]:
+        cle = (nom, tuple(map(tuple, etiquettes)))
+        if cle in histogrammes:
+            histogrammes[cle] = [a + b for a, b in zip(histogrammes[cle], seaux)]
+        else:
+            histogrammes[cle] = list(seaux)
+
+
+@contextmanager
+def _verrou_dossier(mode):
+    """Verrou partagé pour lire le dossier, exclusif pour verser des fichiers dans CUMUL"""
+    repertoire = dossier()
+    repertoire.mkdir(parents=True, exist_ok=True)
+    with open(repertoire / ".verrou", "a") as verrou:
+        fcntl.flock(verrou, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(verrou, fcntl.LOCK_UN)
+
+
+def _verser(donnees=None, fichiers=()):
+    """Ajoute des cumuls et le contenu de fichiers à CUMUL, puis supprime ces fichiers ; sous verrou exclusif"""
+    compteurs, histogrammes = {}, {}
+    for lues in [_lire_fichier(dossier() / CUMUL), donnees, *(_lire_fichier(fichier) for fichier in fichiers)]:
+        if lues is not None:
+            _ajouter(compteurs, histogrammes, lues)
+    _ecrire_fichier(dossier() / CUMUL, _serialiser(compteurs, histogrammes))
+    for fichier in fichiers:
+        fichier.unlink(missing_ok=True)
+
+
+def _vivant(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # processus d'un autre utilisateur
+    return True
+
+
+def _abandonnes():
+    """Fichiers de processus disparus sans avoir versé leurs cumuls, plus vieux que RETENTION"""
+    limite = time.time() - RETENTION
+    abandonnes = []
+    for fichier in dossier().glob("*-*.json"):
+        pid = fichier.name.partition("-")[0]
+        try:
+            ancien = fichier.stat().st_mtime < limite
+        except OSError:
+            continue
+        if ancien and pid.isdigit() and int(pid) != os.getpid() and not _vivant(int(pid)):
+            abandonnes.append(fichier)
+    return abandonnes
+
+
+registre = Registre()
+atexit.register(registre.clore)
+
+
+def _additionner():
+    """Cumuls de tous les processus lus dans le dossier des métriques"""
+    abandonnes = _abandonnes()
+    if abandonnes:
+        with _verrou_dossier(fcntl.LOCK_EX):
+            _verser(fichiers=abandonnes)
+    compteurs, histogrammes = {}, {}
+    with _verrou_dossier(fcntl.LOCK_SH):
+        for fichier in sorted(dossier().glob("*.json")):
+            donnees = _lire_fichier(fichier)
+            if donnees is not None:
+                _ajouter(compteurs, histogrammes, donnees)
+    return compteurs, histogrammes
+
+
+def cumuls(nom):
+    """{étiquettes: valeur} d'un compteur, additionné sur tous les processus"""
+    registre.ecrire()
+    compteurs, _ = _additionner()
+    return {etiquettes: valeur for (autre, etiquettes), valeur in compteurs.items() if autre == nom}
+
+
+def _etiquettes(etiquettes, **autres):
+    paires = list(etiquettes) + list(autres.items())
+    return "{" + ",".join(f'{cle}="{valeur}"' for cle, valeur in paires) + "}"
+
+
+def exposition():
+    """Texte au format d'exposition de Prometheus pour l'ensemble des processus"""
+    registre.ecrire()
+    compteurs, histogrammes = _additionner()
+
+    bornes = {
+        "repxp_requete_duree_secondes": SECONDES,
+        "repxp_requete_sql_nombre": NOMBRES_SQL,
+        "repxp_reponse_octets": OCTETS,
+    }
+    lignes = []
+    for nom, (genre, description) in DESCRIPTIONS.items():
+        lignes += [f"# HELP {nom} {description}", f"# TYPE {nom} {genre}"]
+        if genre == "counter":
+            for (autre, etiquettes), valeur in sorted(compteurs.items()):
+                if autre == nom:
+                    lignes.append(f"{nom}{_etiquettes(etiquettes)} {valeur}")
+        else:
+            for (autre, etiquettes), seaux in sorted(histogrammes.items()):
+                if autre != nom:
+                    continue
+                for borne, total in zip(bornes[nom], seaux):
+                    lignes.append(f"{nom}_bucket{_etiquettes(etiquettes, le=borne)} {total}")
+                lignes.append(f"{nom}_bucket{_etiquettes(etiquettes, le='+Inf')} {seaux[-2]}")
+                lignes.append(f"{nom}_sum{_etiquettes(etiquettes)} {seaux[-1]}")
+                lignes.append(f"{nom}_count{_etiquettes(etiquettes)} {seaux[-2]}")
+    return "\n".join(lignes) + "\n"
+
+
+def _chronometrer_sql(execute, sql, params, many, context):
+    mesure = _mesure.get()
+    if mesure is None:
+        return execute(sql, params, many, context)
+    debut = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        mesure["sql_nombre"] += 1
+        mesure["sql_duree"] += time.perf_counter() - debut
+
+
+@receiver(connection_created)
+def _installer_chronometre(sender, connection, **kwargs):
+    """Chronomètre posé sur chaque connexion, dans le thread qui l'ouvre
+
+    Sous ASGI, l'ORM s'exécute dans le thread de sync_to_async et non dans
+    celui de la boucle d'événements : la mesure de la requête en cours lui
+    parvient par la variable de contexte, que sync_to_async recopie.
+    """
+    if _chronometrer_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_chronometrer_sql)
+
+
+class MesureMiddleware:
+    """Mesure chaque requête et l'attribue au nom d'URL de sa vue
+
+    Synchrone sous WSGI, asynchrone sous ASGI : un middleware seulement
+    synchrone ferait passer chaque requête par un thread partagé et
+    annulerait l'intérêt des vues asynchrones.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mesure = {"sql_nombre": 0, "sql_duree": 0.0, "gabarits_duree": 0.0, "profondeur": 0}
+        jeton = _mesure.set(mesure)
+        debut = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _mesure.reset(jeton)
+        return self._enregistrer(request, response, mesure, time.perf_counter() - debut)
+
+    async def __acall__(self, request):
+        mesure = {"sql_nombre": 0, "sql_duree": 0.0, "gabarits_duree": 0.0, "profondeur": 0}
+        jeton = _mesure.set(mesure)
+        debut = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _mesure.reset(jeton)
+        return self._enregistrer(request, response, mesure, time.perf_counter() - debut)
+
+    def _enregistrer(self, request, response, mesure, duree):
+        correspondance = getattr(request, "resolver_match", None)
+        vue = (correspondance.url_name or correspondance.view_name) if correspondance else "non_resolue"
+        octets = None if response.streaming else len(response.content)
+        registre.enregistrer(
+            vue, response.status_code, duree,
+            mesure["sql_nombre"], mesure["sql_duree"], mesure["gabarits_duree"], octets,
+        )
+        return response
+
+
+class _GabaritMesure:
+    def __init__(self, gabarit):
+        self.gabarit = gabarit
+
+    def __getattr__(self, nom):
+        return getattr(self.gabarit, nom)
+
+    def render(self, context=None, request=None):
+        mesure = _mesure.get()
+        if mesure is None:
+            return self.gabarit.render(context, request)
+        # Un gabarit rendu pendant le rendu d'un autre est déjà compté dans le premier
+        mesure["profondeur"] += 1
+        debut = time.perf_counter()
+        try:
+            return self.gabarit.render(context, request)
+        finally:
+            mesure["profondeur"] -= 1
+            if mesure["profondeur"] == 0:
+                mesure["gabarits_duree"] += time.perf_counter() - debut
+
+
+class GabaritsMesures(DjangoTemplates):
+    """Moteur de gabarits Django qui chronomètre les rendus pour le middleware"""
+
+    def from_string(self, template_code):
+        return _GabaritMesure(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _GabaritMesure(super().get_template(template_name))
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+
+def remplir_classement(apps, schema_editor):
+    Statistiques = apps.get_model('site_web', 'Statistiques')
+    Classement = apps.get_model('site_web', 'Classement')
+    champs = ['badges_obtenus', 'reps_effectuees', 'sets_effectues', 'entrainements_completes', 'exercices_completes']
+
+    for champ in champs:
+        lignes = (
+            Statistiques.objects
+            .annotate(rang=Window(RowNumber(), order_by=[F(champ).desc(), F('id').asc()]))
+            .values_list('id', champ, 'rang')
+        )
+        Classement.objects.bulk_create(
+            [Classement(statistiques_id=sid, champ=champ, valeur=valeur, rang=rang) for sid, valeur, rang in lignes],
+            batch_size=2000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_web', '0016_alter_defis_date_limite_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Classement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('champ', models.CharField(choices=[('badges_obtenus', 'Badges'), ('reps_effectuees', 'Répétitions'), ('sets_effectues', 'Séries'), ('entrainements_completes', 'Entraînements'), ('exercices_completes', 'Exercices')], max_length=30, verbose_name='Champ de tri')),
+                ('valeur', models.PositiveIntegerField(default=0, verbose_name='Valeur')),
+                ('rang', models.PositiveIntegerField(verbose_name='Rang')),
+                ('statistiques', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rangs', to='site_web.statistiques', verbose_name='Statistiques')),
+            ],
+            options={
+                'verbose_name': 'Rang au classement',
+                'verbose_name_plural': 'Classement',
+                'ordering': ['champ', 'rang'],
+                'indexes': [models.Index(fields=['champ', 'rang'], name='classement_champ_rang_idx'), models.Index(fields=['champ', '-valeur', 'statistiques'], name='classement_champ_valeur_idx')],
+                'unique_together': {('statistiques', 'champ')},
+            },
+        ),
+        migrations.RunPython(remplir_classement, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def reprendre_statistiques(apps, schema_editor):
+    """Reporte les compteurs existants dans le journal pour que la reconstruction ne perde rien"""
+    Statistiques = apps.get_model('site_web', 'Statistiques')
+    CompletionEntrainement = apps.get_model('site_web', 'CompletionEntrainement')
+    CompletionEntrainement.objects.bulk_create([
+        CompletionEntrainement(
+            user_id=stat.user_id_id,
+            cle_idempotence=f"reprise-{stat.id}",
+            sets=stat.sets_effectues,
+            reps=stat.reps_effectuees,
+            exercices=stat.exercices_completes,
+            entrainements=stat.entrainements_completes,
+        )
+        for stat in Statistiques.objects.all()
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_web', '0017_classement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompletionEntrainement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle_idempotence', models.CharField(max_length=64, verbose_name="Clé d'idempotence")),
+                ('date_completion', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date de complétion')),
+                ('sets', models.PositiveIntegerField(default=0, verbose_name='Séries')),
+                ('reps', models.PositiveIntegerField(default=0, verbose_name='Répétitions')),
+                ('exercices', models.PositiveIntegerField(default=0, verbose_name='Exercices')),
+                ('entrainements', models.PositiveIntegerField(default=1, verbose_name='Entraînements')),
+                ('entrainement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='completions', to='site_web.entrainement', verbose_name='Entraînement')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='completions', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': "Complétion d'entraînement",
+                'verbose_name_plural': "Complétions d'entraînements",
+                'ordering': ['date_completion'],
+                'unique_together': {('user', 'cle_idempotence')},
+            },
+        ),
+        migrations.RunPython(reprendre_statistiques, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+
+def remplir_cumuls(apps, schema_editor):
+    CompletionEntrainement = apps.get_model('site_web', 'CompletionEntrainement')
+    CumulPeriode = apps.get_model('site_web', 'CumulPeriode')
+    evenements = CompletionEntrainement.objects.exclude(cle_idempotence__startswith='reprise-')
+
+    for granularite, tronquer in (('jour', TruncDay), ('semaine', TruncWeek), ('mois', TruncMonth)):
+        totaux = (
+            evenements
+            .annotate(periode=tronquer('date_completion'))
+            .values('user', 'periode')
+            .annotate(
+                total_sets=Sum('sets'),
+                total_reps=Sum('reps'),
+                total_entrainements=Sum('entrainements'),
+                total_exercices=Sum('exercices'),
+            )
+            .order_by()
+        )
+        CumulPeriode.objects.bulk_create([
+            CumulPeriode(
+                user_id=ligne['user'],
+                granularite=granularite,
+                debut=ligne['periode'].date(),
+                sets_effectues=ligne['total_sets'],
+                reps_effectuees=ligne['total_reps'],
+                entrainements_completes=ligne['total_entrainements'],
+                exercices_completes=ligne['total_exercices'],
+            )
+            for ligne in totaux
+        ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_web', '0018_completionentrainement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CumulPeriode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularite', models.CharField(choices=[('jour', "Aujourd'hui"), ('semaine', 'Cette semaine'), ('mois', 'Ce mois-ci')], max_length=10, verbose_name='Granularité')),
+                ('debut', models.DateField(verbose_name='Début de la période')),
+                ('sets_effectues', models.PositiveIntegerField(default=0, verbose_name='Séries effectués')),
+                ('reps_effectuees', models.PositiveIntegerField(default=0, verbose_name='Répétitions effectuées')),
+                ('entrainements_completes', models.PositiveIntegerField(default=0, verbose_name='Entraînements complétés')),
+                ('exercices_completes', models.PositiveIntegerField(default=0, verbose_name='Exercices complétés')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cumuls', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur')),
+            ],
+            options={
+                'verbose_name': 'Cumul par période',
+                'verbose_name_plural': 'Cumuls par période',
+                'ordering': ['-debut', 'granularite'],
+                'indexes': [models.Index(fields=['granularite', 'debut', '-sets_effectues'], name='cumul_sets_idx'), models.Index(fields=['granularite', 'debut', '-reps_effectuees'], name='cumul_reps_idx'), models.Index(fields=['granularite', 'debut', '-entrainements_completes'], name='cumul_entrainements_idx'), models.Index(fields=['granularite', 'debut', '-exercices_completes'], name='cumul_exercices_idx')],
+                'unique_together': {('user', 'granularite', 'debut')},
+            },
+        ),
+        migrations.RunPython(remplir_cumuls, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from site_web import recherche
+
+
+def creer_index(apps, schema_editor):
+    Exercice = apps.get_model('site_web', 'Exercice')
+    recherche.creer_index(schema_editor)
+    recherche.reindexer(Exercice.objects.using(schema_editor.connection.alias).filter(est_approuve=True))
+
+
+def supprimer_index(apps, schema_editor):
+    recherche.supprimer_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_web', '0019_cumulperiode'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index, supprimer_index),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-18 13:43
+
+import site_web.stockage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_web', '0020_exercice_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FichierMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=100, unique=True, verbose_name='Nom dans le stockage')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Références')),
+            ],
+            options={
+                'verbose_name': 'Fichier média',
+                'verbose_name_plural': 'Fichiers médias',
+                'ordering': ['nom'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='badge',
+            name='icone',
+            field=models.ImageField(storage=site_web.stockage.StockageParContenu(), upload_to='badges/icones/'),
+        ),
+        migrations.AlterField(
+            model_name='exercice',
+            name='image',
+            field=models.ImageField(blank=True, storage=site_web.stockage.StockageParContenu(), upload_to='images_exercices/'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(blank=True, default='avatars/default_avatar.png', null=True, storage=site_web.stockage.StockageParContenu(), upload_to='avatars/'),
+        ),
+    ]
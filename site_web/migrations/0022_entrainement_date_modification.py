@@ -0,0 +1,18 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_web', '0021_fichiermedia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entrainement',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Date de modification'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_web', '0022_entrainement_date_modification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassementDefi',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rang', models.PositiveIntegerField(verbose_name='Rang')),
+                ('badges_obtenus', models.PositiveIntegerField(default=0, verbose_name='Badges obtenus')),
+                ('derniere_completion', models.DateTimeField(blank=True, null=True, verbose_name='Dernier badge obtenu le')),
+            ],
+            options={
+                'verbose_name': 'Classement final de défi',
+                'verbose_name_plural': 'Classements finaux des défis',
+                'ordering': ['defi', 'rang'],
+            },
+        ),
+        migrations.AddField(
+            model_name='defis',
+            name='date_cloture',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Date de clôture'),
+        ),
+        migrations.AddField(
+            model_name='userbadgeprogress',
+            name='est_fige',
+            field=models.BooleanField(default=False, verbose_name='Figée à la clôture du défi'),
+        ),
+        migrations.AddIndex(
+            model_name='defis',
+            index=models.Index(condition=models.Q(('date_cloture__isnull', True)), fields=['date_limite'], name='defi_a_cloturer_idx'),
+        ),
+        migrations.AddField(
+            model_name='classementdefi',
+            name='defi',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='classement_final', to='site_web.defis', verbose_name='Défi'),
+        ),
+        migrations.AddField(
+            model_name='classementdefi',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='classements_defis', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur'),
+        ),
+        migrations.AddIndex(
+            model_name='classementdefi',
+            index=models.Index(fields=['defi', 'rang'], name='classement_defi_rang_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='classementdefi',
+            unique_together={('defi', 'user')},
+        ),
+    ]
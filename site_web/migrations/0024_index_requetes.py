@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('site_web', '0023_cloture_defis'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entrainement',
+            index=models.Index(fields=['createur', 'nom', 'id'], name='entrainement_createur_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exercice',
+            index=models.Index(condition=models.Q(('est_approuve', True)), fields=['nom'], name='exercice_approuve_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exercice',
+            index=models.Index(condition=models.Q(('est_approuve', True)), fields=['groupe_musculaire', 'nom'], name='exercice_approuve_groupe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exercice',
+            index=models.Index(condition=models.Q(('est_approuve', False)), fields=['nom'], name='exercice_a_revoir_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_staff', False), ('is_superuser', False)), fields=['username'], name='user_athlete_username_idx'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+CHAMPS = ['badges_obtenus', 'reps_effectuees', 'sets_effectues', 'entrainements_completes', 'exercices_completes']
+COMPTEURS = ['sets_effectues', 'reps_effectuees', 'entrainements_completes', 'exercices_completes']
+
+
+def une_ligne_par_utilisateur(apps, schema_editor):
+    """Fusionne les doublons créés par des get_or_create concurrents et crée les lignes manquantes"""
+    User = apps.get_model('site_web', 'User')
+    Statistiques = apps.get_model('site_web', 'Statistiques')
+    Classement = apps.get_model('site_web', 'Classement')
+
+    doublons = Statistiques.objects.values('user_id').annotate(total=Count('id')).filter(total__gt=1)
+    modifie = False
+    for doublon in doublons:
+        gardee, *autres = Statistiques.objects.filter(user_id=doublon['user_id']).order_by('id')
+        # Chaque complétion n'a incrémenté qu'une des lignes : les compteurs s'additionnent
+        for autre in autres:
+            for compteur in COMPTEURS:
+                setattr(gardee, compteur, getattr(gardee, compteur) + getattr(autre, compteur))
+            gardee.badges_obtenus = max(gardee.badges_obtenus, autre.badges_obtenus)
+        gardee.save()
+        Statistiques.objects.filter(pk__in=[autre.pk for autre in autres]).delete()
+        modifie = True
+
+    manquants = User.objects.filter(statistiques__isnull=True).values_list('id', flat=True)
+    creees = Statistiques.objects.bulk_create(
+        [Statistiques(user_id_id=user_id) for user_id in manquants.iterator()],
+        batch_size=2000,
+    )
+    modifie = modifie or bool(creees)
+
+    if modifie:
+        Classement.objects.all().delete()
+        for champ in CHAMPS:
+            lignes = (
+                Statistiques.objects
+                .annotate(rang=Window(RowNumber(), order_by=[F(champ).desc(), F('id').asc()]))
+                .values_list('id', champ, 'rang')
+            )
+            Classement.objects.bulk_create(
+                [Classement(statistiques_id=sid, champ=champ, valeur=valeur, rang=rang) for sid, valeur, rang in lignes],
+                batch_size=2000,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_web', '0024_index_requetes'),
+    ]
+
+    operations = [
+        migrations.RunPython(une_ligne_par_utilisateur, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='statistiques',
+            name='user_id',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='statistiques', to=settings.AUTH_USER_MODEL, verbose_name='Utilisateur'),
+        ),
+    ]
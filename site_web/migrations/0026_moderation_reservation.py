@@ -0,0 +1,25 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_web', '0025_statistiques_unique_par_utilisateur'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercice',
+            name='reserve_jusqua',
+            field=models.DateTimeField(blank=True, null=True, verbose_name="Réservé jusqu'à"),
+        ),
+        migrations.AddField(
+            model_name='exercice',
+            name='reserve_par',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='exercices_reserves', to=settings.AUTH_USER_MODEL, verbose_name='Réservé par'),
+        ),
+    ]
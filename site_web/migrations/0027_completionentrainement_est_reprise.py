@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+def marquer_reprises(apps, schema_editor):
+    """Les reprises de 0018 : clé « reprise-<id des statistiques> » et aucun entraînement"""
+    CompletionEntrainement = apps.get_model('site_web', 'CompletionEntrainement')
+    CompletionEntrainement.objects.filter(
+        cle_idempotence__regex=r'^reprise-[0-9]+$', entrainement__isnull=True,
+    ).update(est_reprise=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_web', '0026_moderation_reservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='completionentrainement',
+            name='est_reprise',
+            field=models.BooleanField(default=False, verbose_name='Reprise des compteurs antérieurs'),
+        ),
+        migrations.RunPython(marquer_reprises, migrations.RunPython.noop),
+    ]
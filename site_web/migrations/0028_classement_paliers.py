@@ -0,0 +1,64 @@
+# Generated by Django 5.2.5 on 2026-10-18 14:59
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remplir_paliers(apps, schema_editor):
+    """Un palier par champ et par valeur, avec le rang de sa première ligne"""
+    Classement = apps.get_model('site_web', 'Classement')
+    PalierClassement = apps.get_model('site_web', 'PalierClassement')
+    paliers = []
+    for champ in Classement.objects.values_list('champ', flat=True).distinct():
+        rang = 1
+        valeurs = Classement.objects.filter(champ=champ).values('valeur').annotate(nombre=Count('id')).order_by('-valeur')
+        for ligne in valeurs:
+            paliers.append(PalierClassement(champ=champ, valeur=ligne['valeur'], nombre=ligne['nombre'], rang=rang))
+            rang += ligne['nombre']
+    PalierClassement.objects.bulk_create(paliers, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_web', '0027_completionentrainement_est_reprise'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PalierClassement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('champ', models.CharField(choices=[('badges_obtenus', 'Badges'), ('reps_effectuees', 'Répétitions'), ('sets_effectues', 'Séries'), ('entrainements_completes', 'Entraînements'), ('exercices_completes', 'Exercices')], max_length=30, verbose_name='Champ de tri')),
+                ('valeur', models.PositiveIntegerField(verbose_name='Valeur')),
+                ('nombre', models.PositiveIntegerField(default=0, verbose_name='Nombre de lignes')),
+                ('rang', models.PositiveIntegerField(verbose_name='Rang de la première ligne')),
+            ],
+            options={
+                'verbose_name': 'Palier du classement',
+                'verbose_name_plural': 'Paliers du classement',
+                'ordering': ['champ', '-valeur'],
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='classement',
+            options={'ordering': ['champ', '-valeur', 'statistiques'], 'verbose_name': 'Rang au classement', 'verbose_name_plural': 'Classement'},
+        ),
+        migrations.RemoveIndex(
+            model_name='classement',
+            name='classement_champ_rang_idx',
+        ),
+        migrations.RemoveField(
+            model_name='classement',
+            name='rang',
+        ),
+        migrations.AddIndex(
+            model_name='palierclassement',
+            index=models.Index(fields=['champ', 'rang'], name='palier_champ_rang_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='palierclassement',
+            unique_together={('champ', 'valeur')},
+        ),
+        migrations.RunPython(remplir_paliers, migrations.RunPython.noop),
+    ]
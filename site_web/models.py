@@ -7,6 +7,8 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError
 from dateutil.relativedelta import relativedelta
 
+from .stockage import stockage_contenu
+
 # Create your models here.
 class Sexe(models.TextChoices):
     """Modèle des sexes"""
@@ -19,6 +21,7 @@ class User(AbstractUser):
 
     avatar = models.ImageField(
         upload_to="avatars/",
+        storage=stockage_contenu,
         null=True,
         blank=True,
         default='avatars/default_avatar.png'
@@ -59,6 +62,14 @@ class User(AbstractUser):
         verbose_name = "Utilisateur"
         verbose_name_plural = "Utilisateurs"
         ordering = ["id"]
+        indexes = [
+            # Recherche d'utilisateurs : seuls les athlètes sont listés aux non-administrateurs
+            models.Index(
+                fields=["username"],
+                condition=models.Q(is_staff=False, is_superuser=False),
+                name="user_athlete_username_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.username}"
@@ -142,16 +153,42 @@ class Exercice(models.Model):
 
     image = models.ImageField(
         upload_to="images_exercices/",
+        storage=stockage_contenu,
         blank=True
     )
 
     est_approuve = models.BooleanField(default=False)
 
+    reserve_par = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        related_name="exercices_reserves",
+        verbose_name="Réservé par",
+        null=True,
+        blank=True,
+    )
+
+    reserve_jusqua = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Réservé jusqu'à"
+    )
+
     class Meta:
         """Classe meta des exercices"""
         verbose_name = "Exercice"
         verbose_name_plural = "Exercices"
         ordering = ["nom", "groupe_musculaire"]
+        indexes = [
+            # La banque ne montre que les exercices approuvés, la revue que les autres
+            models.Index(fields=["nom"], condition=models.Q(est_approuve=True), name="exercice_approuve_nom_idx"),
+            models.Index(
+                fields=["groupe_musculaire", "nom"],
+                condition=models.Q(est_approuve=True),
+                name="exercice_approuve_groupe_idx",
+            ),
+            models.Index(fields=["nom"], condition=models.Q(est_approuve=False), name="exercice_a_revoir_idx"),
+        ]
 
     def __str__(self):
         return f"{self.nom}"
@@ -171,6 +208,10 @@ class Entrainement(models.Model):
         verbose_name="Date de création"
     )
 
+    date_modification = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Date de modification"
+    )
 
     exercices = models.ManyToManyField(
         Exercice,
@@ -194,6 +235,9 @@ class Entrainement(models.Model):
         verbose_name = "Entrainement"
         verbose_name_plural = "Entrainements"
         ordering = ["nom"]
+        indexes = [
+            models.Index(fields=["createur", "nom", "id"], name="entrainement_createur_nom_idx"),
+        ]
 
     def __str__(self):
         return f"{self.nom}"
@@ -247,7 +291,7 @@ class Badge(models.Model):
 
     nom = models.CharField(max_length=100)
     description = models.TextField()
-    icone = models.ImageField(upload_to='badges/icones/')
+    icone = models.ImageField(upload_to='badges/icones/', storage=stockage_contenu)
     categorie = models.CharField(max_length=50, choices=CATEGORIES)
     code = models.SlugField(
         unique=True,
@@ -268,7 +312,15 @@ class Badge(models.Model):
 class Statistiques(models.Model):
     """Modèle des statistiques utilisateur"""
 
-    user_id = models.ForeignKey(
+    CHAMPS_CLASSEMENT = [
+        ('badges_obtenus', 'Badges'),
+        ('reps_effectuees', 'Répétitions'),
+        ('sets_effectues', 'Séries'),
+        ('entrainements_completes', 'Entraînements'),
+        ('exercices_completes', 'Exercices'),
+    ]
+
+    user_id = models.OneToOneField(
         User,
         on_delete=models.CASCADE,
         related_name="statistiques",
@@ -308,6 +360,202 @@ class Statistiques(models.Model):
 
     def __str__(self):
         return f"Statistiques de {self.user_id.username}"
+
+
+class CompletionEntrainement(models.Model):
+    """Modèle du journal des entraînements complétés, en ajout seulement"""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="completions",
+        verbose_name="Utilisateur"
+    )
+
+    entrainement = models.ForeignKey(
+        Entrainement,
+        on_delete=models.SET_NULL,
+        related_name="completions",
+        verbose_name="Entraînement",
+        null=True,
+        blank=True
+    )
+
+    cle_idempotence = models.CharField(
+        max_length=64,
+        verbose_name="Clé d'idempotence"
+    )
+
+    date_completion = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Date de complétion"
+    )
+
+    sets = models.PositiveIntegerField(default=0, verbose_name="Séries")
+    reps = models.PositiveIntegerField(default=0, verbose_name="Répétitions")
+    exercices = models.PositiveIntegerField(default=0, verbose_name="Exercices")
+    entrainements = models.PositiveIntegerField(default=1, verbose_name="Entraînements")
+
+    # Compteurs antérieurs au journal, repris à sa création : sans date réelle, hors des cumuls par période
+    est_reprise = models.BooleanField(default=False, verbose_name="Reprise des compteurs antérieurs")
+
+    class Meta:
+        """Classe meta du journal des complétions"""
+        verbose_name = "Complétion d'entraînement"
+        verbose_name_plural = "Complétions d'entraînements"
+        ordering = ["date_completion"]
+        unique_together = ('user', 'cle_idempotence')
+
+    def __str__(self):
+        return f"{self.user} - {self.entrainement} ({self.date_completion:%Y-%m-%d})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError("Une complétion enregistrée ne peut pas être modifiée.")
+        super().save(*args, **kwargs)
+
+
+class CumulPeriode(models.Model):
+    """Modèle des cumuls d'un utilisateur par jour, semaine ou mois"""
+
+    GRANULARITES = [
+        ('jour', 'Aujourd\'hui'),
+        ('semaine', 'Cette semaine'),
+        ('mois', 'Ce mois-ci'),
+    ]
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="cumuls",
+        verbose_name="Utilisateur"
+    )
+
+    granularite = models.CharField(
+        max_length=10,
+        choices=GRANULARITES,
+        verbose_name="Granularité"
+    )
+
+    debut = models.DateField(
+        verbose_name="Début de la période"
+    )
+
+    sets_effectues = models.PositiveIntegerField(default=0, verbose_name="Séries effectués")
+    reps_effectuees = models.PositiveIntegerField(default=0, verbose_name="Répétitions effectuées")
+    entrainements_completes = models.PositiveIntegerField(default=0, verbose_name="Entraînements complétés")
+    exercices_completes = models.PositiveIntegerField(default=0, verbose_name="Exercices complétés")
+
+    class Meta:
+        """Classe meta des cumuls par période"""
+        verbose_name = "Cumul par période"
+        verbose_name_plural = "Cumuls par période"
+        ordering = ["-debut", "granularite"]
+        unique_together = ('user', 'granularite', 'debut')
+        indexes = [
+            models.Index(fields=["granularite", "debut", "-sets_effectues"], name="cumul_sets_idx"),
+            models.Index(fields=["granularite", "debut", "-reps_effectuees"], name="cumul_reps_idx"),
+            models.Index(fields=["granularite", "debut", "-entrainements_completes"], name="cumul_entrainements_idx"),
+            models.Index(fields=["granularite", "debut", "-exercices_completes"], name="cumul_exercices_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.granularite} du {self.debut}"
+
+
+class Classement(models.Model):
+    """Modèle des rangs matérialisés du classement, une ligne par statistique et par champ de tri"""
+
+    statistiques = models.ForeignKey(
+        Statistiques,
+        on_delete=models.CASCADE,
+        related_name="rangs",
+        verbose_name="Statistiques"
+    )
+
+    champ = models.CharField(
+        max_length=30,
+        choices=Statistiques.CHAMPS_CLASSEMENT,
+        verbose_name="Champ de tri"
+    )
+
+    valeur = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Valeur"
+    )
+
+    class Meta:
+        """Classe meta du classement"""
+        verbose_name = "Rang au classement"
+        verbose_name_plural = "Classement"
+        ordering = ["champ", "-valeur", "statistiques"]
+        unique_together = ('statistiques', 'champ')
+        indexes = [
+            models.Index(fields=["champ", "-valeur", "statistiques"], name="classement_champ_valeur_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.statistiques.user_id} - {self.valeur} ({self.champ})"
+
+
+class PalierClassement(models.Model):
+    """Modèle des paliers du classement : les lignes d'un champ de tri qui partagent une même valeur"""
+
+    champ = models.CharField(
+        max_length=30,
+        choices=Statistiques.CHAMPS_CLASSEMENT,
+        verbose_name="Champ de tri"
+    )
+
+    valeur = models.PositiveIntegerField(
+        verbose_name="Valeur"
+    )
+
+    nombre = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Nombre de lignes"
+    )
+
+    rang = models.PositiveIntegerField(
+        verbose_name="Rang de la première ligne"
+    )
+
+    class Meta:
+        """Classe meta des paliers du classement"""
+        verbose_name = "Palier du classement"
+        verbose_name_plural = "Paliers du classement"
+        ordering = ["champ", "-valeur"]
+        unique_together = ('champ', 'valeur')
+        indexes = [
+            models.Index(fields=["champ", "rang"], name="palier_champ_rang_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.champ} = {self.valeur} : {self.nombre} ligne(s) dès le rang {self.rang}"
+
+
+class FichierMedia(models.Model):
+    """Modèle du décompte des références aux fichiers stockés par empreinte"""
+
+    nom = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name="Nom dans le stockage"
+    )
+
+    references = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Références"
+    )
+
+    class Meta:
+        """Classe meta des fichiers médias"""
+        verbose_name = "Fichier média"
+        verbose_name_plural = "Fichiers médias"
+        ordering = ["nom"]
+
+    def __str__(self):
+        return f"{self.nom} ({self.references})"
  
 class Defis(models.Model):
     """Modèle des défis"""
@@ -321,6 +569,11 @@ class Defis(models.Model):
     date_limite = models.DateTimeField(
         verbose_name="Date limite de complétion",
     )
+    date_cloture = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Date de clôture",
+    )
   
     badges = models.ManyToManyField(Badge, through="DefiBadge")
 
@@ -329,6 +582,10 @@ class Defis(models.Model):
         verbose_name = "Défi"
         verbose_name_plural = "Défis"
         ordering =  ["nom"]
+        indexes = [
+            # Seuls les défis pas encore clôturés sont cherchés par date limite
+            models.Index(fields=["date_limite"], condition=models.Q(date_cloture__isnull=True), name="defi_a_cloturer_idx"),
+        ]
 
     def __str__(self):
         return f"Défi {self.nom}"
@@ -360,9 +617,45 @@ class UserBadgeProgress(models.Model):
     defi = models.ForeignKey(Defis, on_delete=models.CASCADE, null=False)
     est_complete = models.BooleanField(default=False)
     date_completion = models.DateTimeField(null=True, blank=True)
+    est_fige = models.BooleanField(default=False, verbose_name="Figée à la clôture du défi")
 
     class Meta:
         unique_together = ('user', 'badge', 'defi')
 
     def __str__(self):
-        return f"{self.user} - {self.badge}"
\ No newline at end of file
+        return f"{self.user} - {self.badge}"
+
+
+class ClassementDefi(models.Model):
+    """Modèle du classement final d'un défi, écrit à sa clôture"""
+
+    defi = models.ForeignKey(
+        Defis,
+        on_delete=models.CASCADE,
+        related_name="classement_final",
+        verbose_name="Défi"
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="classements_defis",
+        verbose_name="Utilisateur"
+    )
+
+    rang = models.PositiveIntegerField(verbose_name="Rang")
+    badges_obtenus = models.PositiveIntegerField(default=0, verbose_name="Badges obtenus")
+    derniere_completion = models.DateTimeField(null=True, blank=True, verbose_name="Dernier badge obtenu le")
+
+    class Meta:
+        """Classe meta du classement final des défis"""
+        verbose_name = "Classement final de défi"
+        verbose_name_plural = "Classements finaux des défis"
+        ordering = ["defi", "rang"]
+        unique_together = ('defi', 'user')
+        indexes = [
+            models.Index(fields=["defi", "rang"], name="classement_defi_rang_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.rang}e - {self.user} ({self.defi})"
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""File de modération des exercices proposés
+
+Chaque modérateur réserve un lot d'exercices en attente pour une durée
+limitée (un bail). Sous PostgreSQL, les lignes libres sont verrouillées avec
+SELECT … FOR UPDATE SKIP LOCKED : deux modérateurs qui réservent en même
+temps reçoivent des lots disjoints sans s'attendre. Ailleurs (SQLite), un
+UPDATE conditionnel sur les colonnes du bail fait la même chose, les
+écritures y étant sérialisées. Un bail expiré rend les exercices au premier
+modérateur suivant.
+
+Les décisions d'un lot sont appliquées en bloc et seulement sur les
+exercices dont le modérateur tient encore le bail ; il en va de même des
+corrections apportées à un exercice avant de le décider. Le nombre d'exercices en
+attente est gardé dans le cache.
+"""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import signals
+from .models import Exercice
+
+TAILLE_LOT = 10
+BAIL = timedelta(minutes=15)
+CLE_EN_ATTENTE = "moderation:en_attente"
+DUREE_VIE = 300
+
+
+def en_attente():
+    """Nombre d'exercices en attente de modération, lu dans le cache"""
+    total = cache.get(CLE_EN_ATTENTE)
+    if total is None:
+        total = Exercice.objects.filter(est_approuve=False).count()
+        cache.set(CLE_EN_ATTENTE, total, DUREE_VIE)
+    return total
+
+
+def invalider():
+    transaction.on_commit(lambda: cache.delete(CLE_EN_ATTENTE))
+
+
+def _libres(maintenant):
+    return Exercice.objects.filter(est_approuve=False).filter(
+        Q(reserve_jusqua__isnull=True) | Q(reserve_jusqua__lt=maintenant)
+    ).order_by("id")
+
+
+def reserves(user, maintenant=None):
+    """Exercices dont l'utilisateur tient le bail"""
+    maintenant = maintenant or timezone.now()
+    return (
+        Exercice.objects
+        .filter(est_approuve=False, reserve_par=user, reserve_jusqua__gte=maintenant)
+        .select_related("groupe_musculaire")
+        .order_by("id")
+    )
+
+
+def reserver(user, taille=TAILLE_LOT):
+    """Prolonge le bail des exercices déjà réservés et complète le lot jusqu'à « taille »"""
+    maintenant = timezone.now()
+    echeance = maintenant + BAIL
+    with transaction.atomic():
+        deja = reserves(user, maintenant).update(reserve_jusqua=echeance)
+        manquants = taille - deja
+        if manquants > 0:
+            if connection.features.has_select_for_update_skip_locked:
+                ids = list(
+                    _libres(maintenant).select_for_update(skip_locked=True).values_list("id", flat=True)[:manquants]
+                )
+                Exercice.objects.filter(pk__in=ids).update(reserve_par=user, reserve_jusqua=echeance)
+            else:
+                # Le bail est revérifié dans l'UPDATE lui-même : une ligne prise entre-temps est ignorée
+                _libres(maintenant).filter(
+                    pk__in=list(_libres(maintenant).values_list("id", flat=True)[:manquants])
+                ).update(reserve_par=user, reserve_jusqua=echeance)
+    return list(reserves(user, maintenant))
+
+
+def liberer(user, ids=None):
+    """Rend des exercices réservés (tous par défaut) à la file"""
+    lignes = Exercice.objects.filter(reserve_par=user, est_approuve=False)
+    if ids is not None:
+        lignes = lignes.filter(pk__in=ids)
+    return lignes.update(reserve_par=None, reserve_jusqua=None)
+
+
+def enregistrer(user, form):
+    """Enregistre le formulaire d'un exercice si l'utilisateur en tient toujours le bail
+
+    Retourne l'exercice enregistré, ou None si le bail a expiré ou a été
+    repris par un autre modérateur entre-temps.
+    """
+    with transaction.atomic():
+        if not reserves(user).filter(pk=form.instance.pk).select_for_update(of=("self",)).exists():
+            return None
+        return form.save()
+
+
+def decider(user, approuves=(), refuses=()):
+    """Approuve et refuse en bloc des exercices réservés par l'utilisateur
+
+    Les ids dont le bail a expiré ou appartient à un autre modérateur sont
+    ignorés. Retourne (nombre d'approuvés, nombre de refusés).
+    """
+    maintenant = timezone.now()
+    with transaction.atomic():
+        tenus = reserves(user, maintenant).select_for_update(of=("self",))
+        a_approuver = list(tenus.filter(pk__in=approuves))
+        a_refuser = list(tenus.filter(pk__in=refuses).exclude(pk__in=approuves).values_list("id", flat=True))
+
+        nb_approuves = Exercice.objects.filter(pk__in=[exercice.pk for exercice in a_approuver]).update(
+            est_approuve=True, reserve_par=None, reserve_jusqua=None,
+        )
+        # delete() envoie les signaux de chaque exercice : index de recherche et images référencées
+        nb_refuses = Exercice.objects.filter(pk__in=a_refuser).delete()[1].get(Exercice._meta.label, 0)
+
+        # update() ne déclenche pas les signaux : ce que fait indexer_exercice, une fois pour le lot
+        for exercice in a_approuver:
+            exercice._avant = {"est_approuve": False, "groupe_musculaire_id": exercice.groupe_musculaire_id}
+            exercice.est_approuve = True
+        if a_approuver:
+            signals.exercices_enregistres(a_approuver)
+    return nb_approuves, nb_refuses
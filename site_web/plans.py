@@ -0,0 +1,118 @@
+"""Plans d'exécution des requêtes émises par les vues
+
+Chaque scénario du banc d'essai est appelé une fois pendant qu'un
+execute_wrapper retient le SQL et ses paramètres. Chaque requête distincte
+est ensuite passée à EXPLAIN (EXPLAIN QUERY PLAN sous SQLite, EXPLAIN au
+format JSON sous PostgreSQL). Le plan est marqué quand il parcourt une table
+entière ou qu'il trie dans une structure temporaire, deux signes qu'un index
+manque pour cette forme de requête.
+"""
+
+import json
+import random
+import re
+
+from django.db import connection
+
+from . import banc_essai
+
+# Requêtes sans intérêt pour les index
+_IGNOREES = re.compile(r'^\s*(SAVEPOINT|RELEASE|ROLLBACK|INSERT|BEGIN|COMMIT)\b', re.IGNORECASE)
+_TABLE_SQLITE = re.compile(r'^(?:SCAN|SEARCH) (\S+)')
+
+
+def capturer(clients=1, graine=0):
+    """{scénario: [(sql, paramètres)]} : requêtes distinctes émises par chaque vue"""
+    aleatoire = random.Random(graine)
+    connectes, client_admin = banc_essai.connecter(clients)
+    captures = {}
+    for scenario in banc_essai.scenarios():
+        client, entrainements = connectes[0]
+        if scenario[4]:
+            client = client_admin
+        requetes = {}
+
+        def retenir(execute, sql, params, many, context):
+            if not many and not _IGNOREES.match(sql):
+                requetes.setdefault(sql, params)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(retenir):
+            banc_essai.appeler(scenario, client, entrainements, aleatoire, graine=graine)
+        captures[scenario[0]] = list(requetes.items())
+    return captures
+
+
+def _expliquer_sqlite(sql, params):
+    with connection.cursor() as curseur:
+        curseur.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        lignes = [detail for _, _, _, detail in curseur.fetchall()]
+    alertes = []
+    for detail in lignes:
+        # « SCAN t » lit toute la table ; « SCAN t USING … INDEX » parcourt un index dans l'ordre voulu
+        if detail.startswith("SCAN ") and " USING " not in detail and "VIRTUAL TABLE" not in detail:
+            alertes.append(("parcours", _TABLE_SQLITE.match(detail)[1], detail))
+        elif detail.startswith("USE TEMP B-TREE"):
+            alertes.append(("tri", None, detail))
+    return lignes, alertes
+
+
+def _noeuds(noeud):
+    yield noeud
+    for enfant in noeud.get("Plans", []):
+        yield from _noeuds(enfant)
+
+
+def _expliquer_postgresql(sql, params):
+    with connection.cursor() as curseur:
+        curseur.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = curseur.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    lignes, alertes = [], []
+    for noeud in _noeuds(plan[0]["Plan"]):
+        genre = noeud["Node Type"]
+        lignes.append(f"{genre} {noeud.get('Relation Name', '')} (lignes estimées : {noeud.get('Plan Rows')})".strip())
+        if genre == "Seq Scan":
+            alertes.append(("parcours", noeud["Relation Name"], lignes[-1]))
+        elif genre in ("Sort", "Incremental Sort"):
+            alertes.append(("tri", None, f"{genre} sur {', '.join(noeud.get('Sort Key', []))}"))
+    return lignes, alertes
+
+
+def expliquer(sql, params):
+    """(lignes du plan, alertes) ; une alerte est (genre, table ou None, détail)"""
+    if connection.vendor == "postgresql":
+        return _expliquer_postgresql(sql, params)
+    if connection.vendor == "sqlite":
+        return _expliquer_sqlite(sql, params)
+    raise NotImplementedError(f"EXPLAIN n'est pas pris en charge pour {connection.vendor}")
+
+
+def tailles(tables):
+    """Nombre de lignes de chaque table, pour ne pas signaler le parcours d'une petite table"""
+    nom = connection.ops.quote_name
+    resultat = {}
+    with connection.cursor() as curseur:
+        existantes = set(connection.introspection.table_names(curseur))
+        for table in tables:
+            if table in existantes:
+                curseur.execute(f"SELECT COUNT(*) FROM {nom(table)}")
+                resultat[table] = curseur.fetchone()[0]
+    return resultat
+
+
+def analyser(captures, lignes_min=1000):
+    """{scénario: [{"sql", "plan", "alertes"}]} ; les parcours de tables de moins de lignes_min lignes sont tolérés"""
+    rapports = {nom: [] for nom in captures}
+    for nom, requetes in captures.items():
+        for sql, params in requetes:
+            plan, alertes = expliquer(sql, params)
+            rapports[nom].append({"sql": sql, "plan": plan, "alertes": alertes})
+
+    tables = {table for rapport in rapports.values() for requete in rapport for _, table, _ in requete["alertes"] if table}
+    petites = {table for table, total in tailles(tables).items() if total < lignes_min}
+    for rapport in rapports.values():
+        for requete in rapport:
+            requete["alertes"] = [alerte for alerte in requete["alertes"] if alerte[1] not in petites]
+    return rapports
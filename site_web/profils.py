@@ -0,0 +1,62 @@
+"""Lecture des statistiques des profils à travers le cache
+
+Les pages de profil lisent les compteurs d'un utilisateur avec une seule
+requête au cache : l'entrée de l'utilisateur et la version de l'espace
+« statistiques » sont demandées ensemble. Une entrée d'une version
+antérieure est ignorée, ce qui permet aux recalculs en bloc d'invalider tous
+les profils d'un coup ; une complétion ne supprime que l'entrée de son
+utilisateur. En cas d'échec, la ligne est lue dans la base et mise en cache,
+sans jamais être créée pendant une requête GET.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import caches
+from .models import Statistiques
+
+ESPACE = "statistiques"
+DUREE_VIE = 300
+CHAMPS = [champ for champ, _ in Statistiques.CHAMPS_CLASSEMENT]
+
+
+def _cle(user_id):
+    return f"{ESPACE}:{user_id}"
+
+
+def statistiques(user_id):
+    """Compteurs d'un utilisateur ; des zéros s'il n'a pas encore de ligne"""
+    cle, cle_version = _cle(user_id), f"version:{ESPACE}"
+    valeurs = cache.get_many([cle, cle_version])
+    version = valeurs.get(cle_version, 1)
+    entree = valeurs.get(cle)
+    if entree is not None and entree[0] == version:
+        return entree[1]
+
+    compteurs = Statistiques.objects.filter(user_id=user_id).values(*CHAMPS).first() or dict.fromkeys(CHAMPS, 0)
+    cache.set(cle, (version, compteurs), DUREE_VIE)
+    return compteurs
+
+
+async def astatistiques(user_id):
+    """statistiques() pour les vues asynchrones"""
+    cle, cle_version = _cle(user_id), f"version:{ESPACE}"
+    valeurs = await cache.aget_many([cle, cle_version])
+    version = valeurs.get(cle_version, 1)
+    entree = valeurs.get(cle)
+    if entree is not None and entree[0] == version:
+        return entree[1]
+
+    compteurs = await Statistiques.objects.filter(user_id=user_id).values(*CHAMPS).afirst() or dict.fromkeys(CHAMPS, 0)
+    await cache.aset(cle, (version, compteurs), DUREE_VIE)
+    return compteurs
+
+
+def invalider(user_id):
+    """Oublie l'entrée d'un utilisateur une fois la transaction en cours validée"""
+    transaction.on_commit(lambda: cache.delete(_cle(user_id)))
+
+
+def invalider_tout():
+    """Après un recalcul en bloc : toutes les entrées deviennent périmées"""
+    caches.invalider(ESPACE)
@@ -0,0 +1,149 @@
+"""Index de recherche plein texte des exercices
+
+Le nom et la description des exercices approuvés sont indexés sans accents et
+réduits à une racine française légère. Sur SQLite l'index est une table FTS5
+classée par bm25 ; sur PostgreSQL c'est une colonne tsvector (configuration
+« french ») couverte par un index GIN et classée par ts_rank. Les autres
+moteurs retombent sur un filtre icontains.
+"""
+
+import re
+import unicodedata
+
+from django.db import connection, connections
+from django.db.models.expressions import RawSQL
+
+TABLE = 'site_web_exercice_fts'
+
+_MOTS = re.compile(r'[a-z0-9]+')
+
+
+def normaliser(texte):
+    """Minuscules sans accents (« Épaules » -> « epaules »)"""
+    texte = unicodedata.normalize('NFKD', texte or '')
+    return ''.join(c for c in texte if not unicodedata.combining(c)).lower()
+
+
+def raciner(mot):
+    """Racine française légère : pluriels, -aux et e final"""
+    if len(mot) > 5 and mot.endswith('aux'):
+        return mot[:-3] + 'al'
+    if len(mot) > 3 and mot[-1] in 'sx':
+        mot = mot[:-1]
+    if len(mot) > 4 and mot.endswith('e'):
+        mot = mot[:-1]
+    return mot
+
+
+def mots(texte):
+    """Mots normalisés et racinés d'un texte"""
+    return [raciner(mot) for mot in _MOTS.findall(normaliser(texte))]
+
+
+def actif():
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def creer_index(schema_editor):
+    """Crée la table d'index propre au moteur de la base"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {TABLE} USING fts5(nom, description, tokenize='unicode61 remove_diacritics 2')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE {TABLE} ("
+            "exercice_id bigint PRIMARY KEY REFERENCES site_web_exercice(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(f"CREATE INDEX {TABLE}_document_idx ON {TABLE} USING GIN (document)")
+
+
+def supprimer_index(schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+def _ecrire(curseur, vendor, exercice_id, nom, description):
+    if vendor == 'sqlite':
+        curseur.execute(f"DELETE FROM {TABLE} WHERE rowid = %s", [exercice_id])
+        curseur.execute(
+            f"INSERT INTO {TABLE} (rowid, nom, description) VALUES (%s, %s, %s)",
+            [exercice_id, ' '.join(mots(nom)), ' '.join(mots(description))],
+        )
+    else:
+        curseur.execute(
+            f"INSERT INTO {TABLE} (exercice_id, document) VALUES (%s, "
+            "setweight(to_tsvector('french', %s), 'A') || setweight(to_tsvector('french', %s), 'B')) "
+            "ON CONFLICT (exercice_id) DO UPDATE SET document = EXCLUDED.document",
+            [exercice_id, normaliser(nom), normaliser(description)],
+        )
+
+
+def indexer(exercice):
+    """Ajoute ou met à jour un exercice dans l'index ; les exercices non approuvés en sont retirés"""
+    if not actif():
+        return
+    if not exercice.est_approuve:
+        retirer(exercice.pk)
+        return
+    with connection.cursor() as curseur:
+        _ecrire(curseur, connection.vendor, exercice.pk, exercice.nom, exercice.description)
+
+
+def retirer(exercice_id):
+    if not actif():
+        return
+    colonne = 'rowid' if connection.vendor == 'sqlite' else 'exercice_id'
+    with connection.cursor() as curseur:
+        curseur.execute(f"DELETE FROM {TABLE} WHERE {colonne} = %s", [exercice_id])
+
+
+def reindexer(exercices, using=None):
+    """Reconstruit l'index à partir d'un queryset d'exercices approuvés"""
+    conn = connections[using or exercices.db]
+    if conn.vendor not in ('sqlite', 'postgresql'):
+        return
+    with conn.cursor() as curseur:
+        curseur.execute(f"DELETE FROM {TABLE}")
+        for exercice_id, nom, description in exercices.values_list('id', 'nom', 'description').iterator():
+            _ecrire(curseur, conn.vendor, exercice_id, nom, description)
+
+
+def _requete(terme, vendor):
+    if vendor == 'sqlite':
+        return ' '.join(f'"{mot}"*' for mot in mots(terme))
+    return ' & '.join(f'{mot}:*' for mot in _MOTS.findall(normaliser(terme)))
+
+
+def filtrer(exercices, terme):
+    """Exercices du queryset correspondant au terme, du plus pertinent au moins pertinent
+
+    La correspondance et le score sont des sous-requêtes de la requête des
+    exercices : le total et chaque page sont calculés par la base, sans
+    limite sur le nombre de résultats. Sans index, retombe sur icontains.
+    """
+    vendor = connections[exercices.db].vendor
+    if vendor not in ('sqlite', 'postgresql'):
+        return exercices.filter(nom__icontains=terme)
+
+    requete = _requete(terme, vendor)
+    if not requete:
+        return exercices.none()
+
+    exercice_id = f"{connections[exercices.db].ops.quote_name(exercices.model._meta.db_table)}.id"
+    if vendor == 'sqlite':
+        ids = RawSQL(f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s", [requete])
+        # bm25 : plus petit = plus pertinent
+        ordre = RawSQL(
+            f"(SELECT bm25({TABLE}, 10.0, 1.0) FROM {TABLE} WHERE {TABLE} MATCH %s AND rowid = {exercice_id})",
+            [requete],
+        ).asc()
+    else:
+        ids = RawSQL(f"SELECT exercice_id FROM {TABLE} WHERE document @@ to_tsquery('french', %s)", [requete])
+        ordre = RawSQL(
+            f"(SELECT ts_rank(document, to_tsquery('french', %s)) FROM {TABLE} WHERE exercice_id = {exercice_id})",
+            [requete],
+        ).desc()
+    return exercices.filter(id__in=ids).order_by(ordre, 'id')
@@ -0,0 +1,153 @@
+"""Signaux des modèles du site"""
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import autocompletion, badges, caches, classement, images, medias, moderation, profils, recherche
+from .models import Badge, DefiBadge, Defis, Entrainement, Exercice, GroupeMusculaire, Statistiques, User
+
+
+@receiver(post_save, sender=User)
+def creer_statistiques(sender, instance, created, raw=False, **kwargs):
+    """Chaque utilisateur a sa ligne de statistiques dès l'inscription ; les pages n'en créent jamais"""
+    if created and not raw:
+        Statistiques.objects.get_or_create(user_id=instance)
+
+
+@receiver(post_save, sender=Statistiques)
+def synchroniser_classement(sender, instance, **kwargs):
+    """Déplace les rangs de l'utilisateur quand ses compteurs changent"""
+    classement.synchroniser(instance)
+    profils.invalider(instance.user_id_id)
+
+
+@receiver(pre_delete, sender=Statistiques)
+def retirer_du_classement(sender, instance, **kwargs):
+    """Referme le classement derrière un utilisateur supprimé"""
+    classement.retirer(instance)
+
+
+def _invalider_banque(*groupes_ids):
+    caches.invalider("banque:tous", *(f"banque:{groupe_id}" for groupe_id in groupes_ids if groupe_id))
+
+
+@receiver(pre_save, sender=Exercice)
+def memoriser_exercice(sender, instance, **kwargs):
+    """Retient l'état publié de l'exercice avant sa modification"""
+    instance._avant = (
+        Exercice.objects.filter(pk=instance.pk).values("est_approuve", "groupe_musculaire_id").first()
+        if instance.pk else None
+    )
+
+
+def exercices_enregistres(exercices):
+    """Index de recherche, suggestions et caches après l'enregistrement d'exercices
+
+    Appelé par indexer_exercice pour chaque exercice enregistré, et pour tout
+    le lot après un update() en bloc, qui n'envoie pas de signaux. L'état
+    retenu par memoriser_exercice (« _avant ») dit si l'exercice était déjà
+    publié et dans quel groupe.
+    """
+    publies, groupes, en_attente = False, set(), False
+    for exercice in exercices:
+        recherche.indexer(exercice)
+        avant = getattr(exercice, "_avant", None) or {}
+        if exercice.est_approuve or avant.get("est_approuve"):
+            publies = True
+            groupes.update((exercice.groupe_musculaire_id, avant.get("groupe_musculaire_id")))
+        if not exercice.est_approuve or avant.get("est_approuve") is False:
+            en_attente = True
+    autocompletion.invalider()
+    # La liste des entraînements affiche le nom des exercices
+    caches.invalider("entrainements")
+    if publies:
+        _invalider_banque(*groupes)
+    if en_attente:
+        moderation.invalider()
+
+
+@receiver(post_save, sender=Exercice)
+def indexer_exercice(sender, instance, **kwargs):
+    """Garde l'index de recherche à jour à la création, à l'approbation et à la modification"""
+    exercices_enregistres([instance])
+
+
+@receiver(post_delete, sender=Exercice)
+def retirer_exercice(sender, instance, **kwargs):
+    recherche.retirer(instance.pk)
+    autocompletion.invalider()
+    caches.invalider("entrainements")
+    if instance.est_approuve:
+        _invalider_banque(instance.groupe_musculaire_id)
+    else:
+        moderation.invalider()
+
+
+@receiver(post_save, sender=GroupeMusculaire)
+@receiver(post_delete, sender=GroupeMusculaire)
+def invalider_groupe(sender, instance, **kwargs):
+    """Les suggestions et la banque affichent le nom du groupe musculaire"""
+    autocompletion.invalider()
+    caches.invalider("groupes")
+    _invalider_banque(instance.pk)
+
+
+@receiver(post_save, sender=Entrainement)
+@receiver(post_delete, sender=Entrainement)
+def invalider_entrainements(sender, instance, raw=False, **kwargs):
+    """Périme les fragments en cache de la liste des entraînements de son créateur"""
+    if not raw:
+        caches.invalider(f"entrainements:{instance.createur_id}")
+
+
+@receiver(post_save, sender=Badge)
+@receiver(post_delete, sender=Badge)
+@receiver(post_save, sender=Defis)
+@receiver(post_delete, sender=Defis)
+@receiver(post_save, sender=DefiBadge)
+@receiver(post_delete, sender=DefiBadge)
+def invalider_regles(sender, instance, **kwargs):
+    """Les règles des défis en cours dépendent des codes des badges, des liens et des dates limites"""
+    badges.invalider()
+    if sender is Badge:
+        caches.invalider("badges")
+
+
+CHAMPS_IMAGE = {User: "avatar", Exercice: "image", Badge: "icone"}
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Exercice)
+@receiver(pre_save, sender=Badge)
+def memoriser_image(sender, instance, update_fields=None, **kwargs):
+    """Retient le fichier référencé avant la modification"""
+    champ = CHAMPS_IMAGE[sender]
+    if update_fields is not None and champ not in update_fields:
+        return
+    instance._image_avant = (
+        sender.objects.filter(pk=instance.pk).values_list(champ, flat=True).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Exercice)
+@receiver(post_save, sender=Badge)
+def generer_variantes(sender, instance, update_fields=None, **kwargs):
+    """Compte la référence au fichier et crée ses variantes redimensionnées"""
+    champ = CHAMPS_IMAGE[sender]
+    if update_fields is not None and champ not in update_fields:
+        return
+    fichier = getattr(instance, champ)
+    avant = getattr(instance, "_image_avant", None)
+    if fichier.name != avant:
+        medias.retenir(fichier.name)
+        medias.liberer(avant)
+    images.generer_pour(fichier)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Exercice)
+@receiver(post_delete, sender=Badge)
+def liberer_image(sender, instance, **kwargs):
+    medias.liberer(getattr(instance, CHAMPS_IMAGE[sender]).name)
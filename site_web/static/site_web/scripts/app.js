@@ -0,0 +1,47 @@
+// Autocomplétion des champs portant data-autocompletion="<url de l'API>"
+document.querySelectorAll("input[data-autocompletion]").forEach((champ, numero) => {
+  const liste = document.createElement("datalist");
+  liste.id = `autocompletion-${numero}`;
+  champ.setAttribute("list", liste.id);
+  champ.after(liste);
+
+  let derniere = null;
+  champ.addEventListener("input", () => {
+    const prefixe = champ.value.trim();
+    if (!prefixe || prefixe === derniere) {
+      return;
+    }
+    derniere = prefixe;
+
+    fetch(`${champ.dataset.autocompletion}?q=${encodeURIComponent(prefixe)}`)
+      .then((reponse) => reponse.json())
+      .then((donnees) => {
+        if (prefixe !== derniere) {
+          return;
+        }
+        liste.replaceChildren(
+          ...donnees.resultats.map((exercice) => {
+            const option = document.createElement("option");
+            option.value = exercice.nom;
+            option.label = exercice.groupe || "";
+            return option;
+          })
+        );
+      });
+  });
+});
+
+// Fenêtres de confirmation partagées : le lien qui les ouvre fournit l'action et le nom
+document.querySelectorAll(".modal[data-confirmation]").forEach((fenetre) => {
+  fenetre.addEventListener("show.bs.modal", (evenement) => {
+    const lien = evenement.relatedTarget;
+    const formulaire = fenetre.querySelector("form");
+    formulaire.action = lien.dataset.action;
+    fenetre.querySelector("[data-nom]").textContent = `l'entraînement "${lien.dataset.nom}"?`;
+
+    const cle = formulaire.querySelector("input[name=cle]");
+    if (cle) {
+      cle.value = `${cle.dataset.prefixe}-${lien.dataset.entrainement}`;
+    }
+  });
+});
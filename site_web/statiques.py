@@ -0,0 +1,270 @@
+"""Construction des fichiers statiques
+
+Au moment de collectstatic, le stockage des statiques :
+- retire des feuilles de style du site les règles dont aucun sélecteur ne
+  correspond à une classe présente dans les gabarits, les formulaires ou les
+  scripts (à la manière de PurgeCSS : on cherche les mots, pas le DOM) ;
+- réenregistre les PNG sans perte et réduit les ICO aux tailles utiles ;
+- puis laisse WhiteNoise ajouter l'empreinte au nom et produire les
+  variantes .gz et .br.
+
+La commande construire_statiques compile aussi styles.sass quand un
+compilateur Sass est disponible et rapporte le poids des statiques par page.
+
+ServeurStatiques remplace le middleware de WhiteNoise pour qu'il fonctionne
+aussi en mode asynchrone sous ASGI.
+"""
+
+import os
+import re
+from io import BytesIO
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.template.loader import get_template
+from PIL import Image
+from whitenoise.middleware import WhiteNoiseMiddleware
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+APPLICATION = Path(__file__).resolve().parent
+FEUILLES_A_PURGER = ('site_web/css/styles.css', 'site_web/css/bootstrap.css')
+TAILLES_ICO = ((16, 16), (24, 24), (32, 32), (48, 48), (64, 64))
+
+# Classes ajoutées par le JavaScript de Bootstrap, absentes des gabarits
+CLASSES_DYNAMIQUES = {
+    'show', 'showing', 'hide', 'hiding', 'fade', 'collapse', 'collapsing', 'collapse-horizontal',
+    'active', 'disabled', 'modal-open', 'modal-backdrop', 'modal-static', 'offcanvas-backdrop',
+    'dropdown-menu-end', 'dropdown-menu-start', 'dropup', 'dropend', 'dropstart',
+    'was-validated', 'is-valid', 'is-invalid', 'valid-feedback', 'invalid-feedback',
+    'tooltip', 'tooltip-inner', 'tooltip-arrow', 'popover', 'popover-arrow', 'popover-header', 'popover-body',
+    'carousel-item-start', 'carousel-item-end', 'carousel-item-next', 'carousel-item-prev',
+    'toast-container', 'visually-hidden',
+}
+PREFIXES_DYNAMIQUES = ('bs-tooltip-', 'bs-popover-', 'select2')
+
+_MOTS = re.compile(r'[A-Za-z_][A-Za-z0-9_-]*')
+# « alert-{{ message.tags }} » ou « text-bg-{% if … %} » : toute classe de ce préfixe peut servir
+_PREFIXES = re.compile(r'([A-Za-z_][A-Za-z0-9_-]*-)(?=\{[{%])')
+_CLASSES = re.compile(r'\.((?:[A-Za-z0-9_-]|\\.)+)')
+
+
+def sources_du_contenu():
+    """Fichiers où peuvent apparaître des noms de classes : gabarits, formulaires et scripts"""
+    dossiers = [Path(d) for moteur in settings.TEMPLATES for d in moteur.get('DIRS', [])]
+    dossiers += [APPLICATION / 'templates', APPLICATION / 'static']
+    for dossier in dossiers:
+        for chemin in sorted(dossier.rglob('*')):
+            if chemin.suffix in ('.html', '.js', '.txt'):
+                yield chemin
+    yield from sorted(APPLICATION.glob('*.py'))
+
+
+def vocabulaire(chemins=None):
+    """Mots et préfixes de classes utilisés par le site"""
+    mots, prefixes = set(CLASSES_DYNAMIQUES), set(PREFIXES_DYNAMIQUES)
+    for chemin in chemins or sources_du_contenu():
+        texte = Path(chemin).read_text(encoding='utf-8', errors='ignore')
+        mots.update(_MOTS.findall(texte))
+        prefixes.update(_PREFIXES.findall(texte))
+    return mots, tuple(prefixes)
+
+
+def _blocs(css):
+    """Découpe un niveau de CSS en (prélude, corps) ; le corps vaut None pour « @charset …; »"""
+    blocs, debut, profondeur, i, prelude = [], 0, 0, 0, None
+    while i < len(css):
+        c = css[i]
+        if css.startswith('/*', i):
+            fin = css.find('*/', i + 2)
+            fin = len(css) if fin == -1 else fin + 2
+            if profondeur == 0 and css.startswith('/*!', i):
+                blocs.append((css[i:fin], None))
+            if profondeur == 0:
+                debut = fin
+            i = fin
+            continue
+        if c in '"\'':
+            fin = i + 1
+            while fin < len(css) and css[fin] != c:
+                fin += 2 if css[fin] == '\\' else 1
+            i = fin + 1
+            continue
+        if c == '{':
+            if profondeur == 0:
+                prelude, debut = css[debut:i], i + 1
+            profondeur += 1
+        elif c == '}':
+            profondeur -= 1
+            if profondeur == 0:
+                blocs.append((prelude.strip(), css[debut:i]))
+                debut = i + 1
+        elif c == ';' and profondeur == 0:
+            blocs.append((css[debut:i + 1].strip(), None))
+            debut = i + 1
+        i += 1
+    return blocs
+
+
+def _selecteurs(prelude):
+    """Sépare une liste de sélecteurs sur les virgules hors parenthèses"""
+    morceaux, profondeur, debut = [], 0, 0
+    for i, c in enumerate(prelude):
+        if c in '([':
+            profondeur += 1
+        elif c in ')]':
+            profondeur -= 1
+        elif c == ',' and profondeur == 0:
+            morceaux.append(prelude[debut:i].strip())
+            debut = i + 1
+    morceaux.append(prelude[debut:].strip())
+    return morceaux
+
+
+def _utilise(selecteur, mots, prefixes):
+    # Les pseudo-classes :not(.x) n'excluent rien : on ne regarde que les classes hors parenthèses
+    sans_negations = re.sub(r':not\([^)]*\)', '', selecteur)
+    for classe in _CLASSES.findall(sans_negations):
+        classe = classe.replace('\\', '')
+        if classe not in mots and not classe.startswith(prefixes):
+            return False
+    return True
+
+
+def purger(css, mots, prefixes):
+    """Feuille de style réduite aux règles dont au moins un sélecteur peut correspondre"""
+    sortie = []
+    for prelude, corps in _blocs(css):
+        if corps is None:
+            sortie.append(prelude)
+        elif prelude.startswith(('@media', '@supports', '@container', '@layer')):
+            interieur = purger(corps, mots, prefixes)
+            if interieur:
+                sortie.append(f"{prelude}{{\n{interieur}\n}}")
+        elif prelude.startswith('@'):
+            sortie.append(f"{prelude}{{{corps.strip()}}}")
+        else:
+            gardes = [s for s in _selecteurs(prelude) if _utilise(s, mots, prefixes)]
+            if gardes:
+                sortie.append(f"{','.join(gardes)}{{{corps.strip()}}}")
+    return '\n'.join(sortie)
+
+
+def optimiser_image(chemin):
+    """Réenregistre un PNG ou un ICO plus léger ; retourne le nombre d'octets gagnés"""
+    chemin = Path(chemin)
+    avant = chemin.stat().st_size
+    with Image.open(chemin) as image:
+        image.load()
+        tampon = BytesIO()
+        if chemin.suffix.lower() == '.ico':
+            tailles = [t for t in TAILLES_ICO if t[0] <= image.size[0]]
+            image.save(tampon, 'ICO', sizes=tailles)
+        else:
+            couleurs = image.getcolors(256) if image.mode == 'RGB' else None
+            if couleurs:
+                # Une image opaque d'au plus 256 couleurs passe en palette sans aucune perte
+                palette = Image.new('P', (1, 1))
+                palette.putpalette([composante for _, couleur in couleurs for composante in couleur])
+                image = image.quantize(palette=palette, dither=Image.Dither.NONE)
+            image.save(tampon, 'PNG', optimize=True)
+    if tampon.tell() >= avant:
+        return 0
+    chemin.write_bytes(tampon.getvalue())
+    return avant - tampon.tell()
+
+
+def optimiser(nom, chemin, vocabulaire_du_site):
+    """Optimise en place le fichier collecté « nom » selon son type ; retourne True s'il a été traité"""
+    if not os.path.exists(chemin):
+        return False
+    if nom in FEUILLES_A_PURGER:
+        chemin = Path(chemin)
+        css = chemin.read_text(encoding='utf-8')
+        chemin.write_text(purger(css, *vocabulaire_du_site) + '\n', encoding='utf-8')
+        return True
+    if nom.lower().endswith(('.png', '.ico')):
+        optimiser_image(chemin)
+        return True
+    return False
+
+
+class StockageStatiques(CompressedManifestStaticFilesStorage):
+    """Stockage WhiteNoise qui purge les feuilles de style et allège les images avant l'empreinte"""
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            vocabulaire_du_site = vocabulaire()
+            for nom in list(paths):
+                if optimiser(nom, self.path(nom), vocabulaire_du_site):
+                    # L'empreinte est calculée sur le fichier relu : on lui donne la copie allégée
+                    paths[nom] = (self, nom)
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+
+class ServeurStatiques(WhiteNoiseMiddleware):
+    """Middleware WhiteNoise utilisable en mode asynchrone
+
+    Le middleware d'origine est seulement synchrone : sous ASGI, Django ferait
+    passer chaque requête, statique ou non, par un thread partagé.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
+
+
+_STATIC = re.compile(r"""\{%\s*static\s+['"]([^'"]+)['"]""")
+_GABARITS = re.compile(r"""\{%\s*(?:extends|include)\s+['"]([^'"]+)['"]""")
+
+
+def ressources_de_page(nom_gabarit, vus=None):
+    """Fichiers statiques référencés par un gabarit, ses parents et ses inclusions"""
+    vus = set() if vus is None else vus
+    if nom_gabarit in vus:
+        return set()
+    vus.add(nom_gabarit)
+    texte = Path(get_template(nom_gabarit).origin.name).read_text(encoding='utf-8')
+    ressources = set(_STATIC.findall(texte))
+    for autre in _GABARITS.findall(texte):
+        ressources |= ressources_de_page(autre, vus)
+    return ressources
+
+
+def poids(nom):
+    """(source, construit, transféré) en octets pour un fichier statique
+
+    Le poids transféré est celui de la plus petite variante que WhiteNoise peut
+    servir (.br, .gz ou le fichier construit lui-même).
+    """
+    source = finders.find(nom)
+    source = os.path.getsize(source) if source else 0
+    try:
+        construit = staticfiles_storage.path(staticfiles_storage.stored_name(nom))
+    except ValueError:
+        construit = staticfiles_storage.path(nom)
+    if not os.path.exists(construit):
+        return source, source, source
+    tailles = [os.path.getsize(construit)]
+    tailles += [os.path.getsize(construit + ext) for ext in ('.gz', '.br') if os.path.exists(construit + ext)]
+    return source, tailles[0], min(tailles)
@@ -0,0 +1,52 @@
+"""Stockage des images téléversées par empreinte de contenu
+
+Un fichier est enregistré sous « contenu/ab/<sha256>.<ext> », quel que soit
+son nom d'origine ou le champ qui le reçoit. Deux téléversements identiques
+aboutissent donc au même fichier, et une adresse ne change jamais de contenu,
+ce qui permet de la servir avec des en-têtes de cache immuables. Le décompte
+des références est tenu à part (voir medias.py).
+"""
+
+import hashlib
+from pathlib import PurePosixPath
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+DOSSIER = 'contenu'
+
+
+def empreinte(contenu):
+    """SHA-256 hexadécimal d'un fichier Django, lu par morceaux"""
+    hachage = hashlib.sha256()
+    for morceau in contenu.chunks():
+        hachage.update(morceau)
+    return hachage.hexdigest()
+
+
+def nom_contenu(valeur, extension):
+    """« 3fa4…e1 », « .PNG » -> « contenu/3f/3fa4…e1.png »"""
+    return f"{DOSSIER}/{valeur[:2]}/{valeur}{extension.lower()}"
+
+
+def est_adresse(nom):
+    return bool(nom) and nom.startswith(f"{DOSSIER}/")
+
+
+@deconstructible(path='site_web.stockage.StockageParContenu')
+class StockageParContenu(FileSystemStorage):
+    """Stockage de fichiers dont le nom est l'empreinte du contenu"""
+
+    def __init__(self, **kwargs):
+        # Réécrire une adresse existante ne peut que reproduire les mêmes octets
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+    def _save(self, name, content):
+        nom = nom_contenu(empreinte(content), PurePosixPath(name).suffix)
+        if self.exists(nom):
+            return nom
+        return super()._save(nom, content)
+
+
+stockage_contenu = StockageParContenu()
@@ -0,0 +1,33 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from site_web import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def image_responsive(fichier, taille, **attributs):
+    """Balise <picture> servant les variantes WebP/JPEG d'une image affichée à « taille » px"""
+    if not fichier or not fichier.name:
+        return ""
+
+    storage = fichier.storage
+    if not images.variantes_presentes(fichier.name, storage):
+        return format_html('<img src="{}"{}>', fichier.url, flatatt(attributs))
+
+    def srcset(extension):
+        return ", ".join(
+            f"{storage.url(images.nom_variante(fichier.name, largeur, extension))} {largeur}w"
+            for largeur in images.TAILLES
+        )
+
+    repli = next((largeur for largeur in images.TAILLES if largeur >= int(taille)), images.TAILLES[-1])
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}px">'
+        '<img src="{}" srcset="{}" sizes="{}px"{}></picture>',
+        srcset("webp"), taille,
+        storage.url(images.nom_variante(fichier.name, repli, "jpg")), srcset("jpg"), taille,
+        flatatt(attributs),
+    )
@@ -1,3 +1,563 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    autocompletion, badges, caches, classement, completions, defis, exports, generation, images, medias, metriques,
+    moderation, recherche,
+)
+from .forms import EntrainementForm
+from .models import (
+    Badge, ClassementDefi, CompletionEntrainement, CumulPeriode, DefiBadge, Defis, Entrainement, Exercice,
+    ExerciceEntrainement, GroupeMusculaire, PalierClassement, Statistiques, User, UserBadgeProgress,
+)
+
+
+class SiteTestCase(TestCase):
+    """Cache en mémoire, médias et métriques dans un dossier temporaire, statiques sans manifeste"""
+
+    @classmethod
+    def setUpClass(cls):
+        dossier = Path(tempfile.mkdtemp())
+        cls.addClassCleanup(shutil.rmtree, dossier, ignore_errors=True)
+        shutil.copytree(settings.MEDIA_ROOT, dossier / "media", ignore=shutil.ignore_patterns("variantes"))
+        reglages = override_settings(
+            CACHES={nom: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": nom} for nom in settings.CACHES},
+            MEDIA_ROOT=str(dossier / "media"),
+            METRIQUES_DOSSIER=str(dossier / "metriques"),
+            STORAGES={**settings.STORAGES, "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}},
+        )
+        reglages.enable()
+        cls.addClassCleanup(reglages.disable)
+        super().setUpClass()
+
+
+class ClassementTests(SiteTestCase):
+    """Rangs matérialisés : mises à jour incrémentales comparées à l'ordre attendu et à reconstruire()"""
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f"athlete{i}", password="x") for i in range(6)]
+        self.stats = [Statistiques.objects.get(user_id=user) for user in self.users]
+
+    def rangs(self, champ):
+        return [(ligne.statistiques_id, ligne.rang) for ligne in classement.RangsClassement(champ)[0:100]]
+
+    def paliers(self, champ):
+        return list(PalierClassement.objects.filter(champ=champ).order_by("-valeur").values_list("valeur", "nombre", "rang"))
+
+    def attendus(self, champ):
+        ordre = sorted(Statistiques.objects.all(), key=lambda stats: (-getattr(stats, champ), stats.id))
+        return [(stats.id, rang) for rang, stats in enumerate(ordre, 1)]
+
+    def verifier(self):
+        for champ in classement.CHAMPS:
+            self.assertEqual(self.rangs(champ), self.attendus(champ), champ)
+
+    def modifier(self, stats, **valeurs):
+        stats.refresh_from_db()
+        for champ, valeur in valeurs.items():
+            setattr(stats, champ, valeur)
+        stats.save()
+
+    def test_insertion(self):
+        for champ in classement.CHAMPS:
+            self.assertEqual(self.rangs(champ), [(stats.id, rang) for rang, stats in enumerate(self.stats, 1)])
+        self.assertEqual(classement.RangsClassement("reps_effectuees").count(), len(self.users))
+
+    def test_montee(self):
+        self.modifier(self.stats[4], reps_effectuees=50)
+        self.modifier(self.stats[2], reps_effectuees=20)
+        self.assertEqual(self.rangs("reps_effectuees")[:2], [(self.stats[4].id, 1), (self.stats[2].id, 2)])
+        self.verifier()
+
+    def test_descente(self):
+        for i, stats in enumerate(self.stats):
+            self.modifier(stats, sets_effectues=10 * (i + 1))
+        self.modifier(self.stats[5], sets_effectues=0)
+        self.assertEqual(self.rangs("sets_effectues")[-1], (self.stats[5].id, len(self.stats)))
+        self.verifier()
+
+    def test_egalite_departagee_par_id(self):
+        self.modifier(self.stats[3], exercices_completes=7)
+        self.modifier(self.stats[1], exercices_completes=7)
+        self.assertEqual(self.rangs("exercices_completes")[:2], [(self.stats[1].id, 1), (self.stats[3].id, 2)])
+        self.verifier()
+
+    def test_suppression(self):
+        self.modifier(self.stats[2], reps_effectuees=30)
+        self.users[2].delete()
+        self.users[4].delete()
+        self.verifier()
+        self.assertEqual(classement.RangsClassement("reps_effectuees").count(), len(self.users) - 2)
+
+    def test_identique_a_reconstruire(self):
+        hasard = random.Random(0)
+        for _ in range(200):
+            stats = hasard.choice(self.stats)
+            champ = hasard.choice(classement.CHAMPS)
+            stats.refresh_from_db()
+            self.modifier(stats, **{champ: max(0, getattr(stats, champ) + hasard.randint(-5, 10))})
+        self.users[0].delete()
+        self.users.append(User.objects.create(username="nouveau", password="x"))
+
+        incrementaux = {champ: (self.rangs(champ), self.paliers(champ)) for champ in classement.CHAMPS}
+        classement.reconstruire()
+        for champ in classement.CHAMPS:
+            self.assertEqual(incrementaux[champ], (self.rangs(champ), self.paliers(champ)), champ)
+        self.verifier()
+
+    def test_egalites_non_renumerotees(self):
+        # Quitter un palier de cinq égalités met à jour la ligne et deux paliers, pas les égalités
+        self.modifier(self.stats[0], reps_effectuees=10)
+        with CaptureQueriesContext(connection) as requetes:
+            self.modifier(self.stats[3], reps_effectuees=5)
+        ecritures = [requete["sql"] for requete in requetes if requete["sql"].startswith("UPDATE")]
+        classements = [sql for sql in ecritures if '"site_web_classement"' in sql]
+        paliers = [sql for sql in ecritures if '"site_web_palierclassement"' in sql]
+        self.assertEqual(len(classements), 1)
+        self.assertTrue(paliers)
+        self.assertTrue(all("reps_effectuees" in sql for sql in paliers))
+        self.assertEqual(self.paliers("reps_effectuees"), [(10, 1, 1), (5, 1, 2), (0, 4, 3)])
+        self.verifier()
+
+    def test_pages_et_curseurs(self):
+        for i, stats in enumerate(self.stats):
+            self.modifier(stats, reps_effectuees=[3, 7, 3, 0, 7, 3][i])
+        attendus = self.attendus("reps_effectuees")
+        self.assertEqual(
+            [(ligne.statistiques_id, ligne.rang) for ligne in classement.RangsClassement("reps_effectuees")[2:5]],
+            attendus[2:5],
+        )
+        self.assertEqual(classement.RangsClassement("reps_effectuees").count(), len(self.stats))
+        page = classement.page_apres("reps_effectuees", None, 2)
+        suite = classement.page_apres("reps_effectuees", classement.decoder_curseur(page["suivant"]), 2)
+        self.assertEqual([(ligne.statistiques_id, ligne.rang) for ligne in suite["lignes"]], attendus[2:4])
+        retour = classement.page_avant("reps_effectuees", classement.decoder_curseur(suite["precedent"]), 2)
+        self.assertEqual([(ligne.statistiques_id, ligne.rang) for ligne in retour["lignes"]], attendus[0:2])
+        autour = classement.autour("reps_effectuees", self.stats[2], 1)
+        self.assertEqual([(ligne.statistiques_id, ligne.rang) for ligne in autour["lignes"]], attendus[2:5])
+        with self.assertRaises(ValueError):
+            classement.decoder_curseur("abc")
+
+    def test_page_d_accueil(self):
+        self.modifier(self.stats[4], reps_effectuees=9)
+        client = Client()
+        client.force_login(self.users[0])
+        reponse = client.get(reverse("index"), {"sort": "reps_effectuees"})
+        self.assertEqual(
+            [(personne["user"].id, personne["rang"]) for personne in reponse.context["classement"]][:2],
+            [(self.users[4].id, 1), (self.users[0].id, 2)],
+        )
+
+
+class ClassementApiTests(SiteTestCase):
+    """API du classement : autour de l'utilisateur, puis pages voisines par curseurs"""
+
+    def setUp(self):
+        self.users = [User.objects.create(username=f"athlete{i}", password="x") for i in range(8)]
+        for i, user in enumerate(self.users):
+            stats = Statistiques.objects.get(user_id=user)
+            stats.reps_effectuees = [5, 9, 5, 0, 12, 5, 3, 9][i]
+            stats.save()
+        self.client = Client()
+        self.client.force_login(self.users[2])
+
+    def lire(self, **parametres):
+        reponse = self.client.get(reverse("classement_api"), {"sort": "reps_effectuees", "n": 2, **parametres})
+        self.assertEqual(reponse.status_code, 200)
+        return reponse.json()
+
+    def test_curseurs_aller_retour(self):
+        ordre = [4, 1, 7, 0, 2, 5, 6, 3]
+        autour = self.lire()
+        self.assertEqual(autour["moi"]["rang"], 5)
+        self.assertEqual([ligne["user_id"] for ligne in autour["lignes"]], [self.users[i].id for i in ordre[2:7]])
+
+        suivante = self.lire(apres=autour["suivant"])
+        self.assertEqual([(ligne["user_id"], ligne["rang"]) for ligne in suivante["lignes"]], [(self.users[3].id, 8)])
+        self.assertIsNone(suivante["suivant"])
+
+        precedente = self.lire(avant=autour["precedent"])
+        self.assertEqual(
+            [(ligne["user_id"], ligne["rang"]) for ligne in precedente["lignes"]],
+            [(self.users[4].id, 1), (self.users[1].id, 2)],
+        )
+        self.assertIsNone(precedente["precedent"])
+        retour = self.lire(apres=precedente["suivant"])
+        self.assertEqual([ligne["rang"] for ligne in retour["lignes"]], [3, 4])
+
+    def test_curseur_invalide(self):
+        for curseur in ("abc", "-1.3", "5"):
+            reponse = self.client.get(reverse("classement_api"), {"apres": curseur})
+            self.assertEqual(reponse.status_code, 400, curseur)
+
+
+class CompletionTests(SiteTestCase):
+    """Clé d'idempotence fournie par le client"""
+
+    def setUp(self):
+        self.user = User.objects.create(username="athlete", password="x")
+        self.entrainement = Entrainement.objects.create(nom="Jambes", createur=self.user)
+
+    def test_cle_longue_condensee(self):
+        completion, cree = completions.completer_entrainement(self.user, self.entrainement, "x" * 500)
+        self.assertTrue(cree)
+        self.assertEqual(len(completion.cle_idempotence), 64)
+        _, cree = completions.completer_entrainement(self.user, self.entrainement, "x" * 500)
+        self.assertFalse(cree)
+        self.assertEqual(Statistiques.objects.get(user_id=self.user).entrainements_completes, 1)
+
+    def test_cle_reprise_comptee_dans_les_cumuls(self):
+        completions.completer_entrainement(self.user, self.entrainement, "reprise-1")
+        CompletionEntrainement.objects.create(user=self.user, cle_idempotence="reprise-2", est_reprise=True, reps=50)
+        completions.reconstruire_cumuls()
+        cumul = CumulPeriode.objects.get(user=self.user, granularite="jour")
+        self.assertEqual((cumul.entrainements_completes, cumul.reps_effectuees), (1, 0))
+
+
+class DefisTests(SiteTestCase):
+    """Les règles d'un défi ne comptent que l'activité entre sa création et sa date limite"""
+
+    def setUp(self):
+        self.user = User.objects.create(username="athlete", password="x")
+        self.entrainement = Entrainement.objects.create(nom="Jambes", createur=self.user)
+        # Activité antérieure au défi
+        CompletionEntrainement.objects.create(
+            user=self.user, cle_idempotence="ancienne", entrainements=1,
+            date_completion=timezone.now() - timezone.timedelta(days=30),
+        )
+        completions.reconstruire_statistiques()
+        self.defi = Defis.objects.create(nom="Octobre", date_limite=timezone.now() + timezone.timedelta(days=7))
+        badge = Badge.objects.create(
+            nom="Premier", description="Un entraînement", icone="badges/icones/premier.png",
+            categorie="ASSIDUITE", code="premier-entrainement",
+        )
+        DefiBadge.objects.create(defi=self.defi, badge=badge)
+
+    def complete(self):
+        return UserBadgeProgress.objects.filter(user=self.user, defi=self.defi, est_complete=True).exists()
+
+    def test_activite_anterieure_ignoree(self):
+        self.assertEqual(badges.evaluer_defi(self.defi), 0)
+        self.assertFalse(self.complete())
+        badges.evaluer(Statistiques.objects.get(user_id=self.user))
+        self.assertFalse(self.complete())
+
+    def test_completion_dans_la_fenetre(self):
+        completions.completer_entrainement(self.user, self.entrainement)
+        self.assertTrue(self.complete())
+
+    def test_evaluation_du_defi_dans_la_fenetre(self):
+        CompletionEntrainement.objects.create(user=self.user, cle_idempotence="recente", entrainements=1)
+        self.assertEqual(badges.evaluer_defi(self.defi), 1)
+        self.assertTrue(self.complete())
+
+
+class ClotureTests(SiteTestCase):
+    """Clôture d'un défi échu : progressions figées et classement final écrits une seule fois"""
+
+    def setUp(self):
+        maintenant = timezone.now()
+        self.users = [User.objects.create(username=f"athlete{i}", password="x") for i in range(3)]
+        self.defi = Defis.objects.create(nom="Septembre", date_limite=maintenant - timezone.timedelta(days=1))
+        recompenses = [
+            Badge.objects.create(
+                nom=f"Badge {i}", description="Badge", icone="badges/icones/badge.png", categorie="AUTRE", code=f"badge-{i}",
+            )
+            for i in range(2)
+        ]
+        # athlete0 : deux badges, le dernier hier ; athlete2 : deux badges, le dernier avant-hier ; athlete1 : un badge
+        for user, obtenus, jours in ((self.users[0], 2, 1), (self.users[1], 1, 3), (self.users[2], 2, 2)):
+            for i, badge in enumerate(recompenses):
+                UserBadgeProgress.objects.create(
+                    user=user, badge=badge, defi=self.defi, est_complete=i < obtenus,
+                    date_completion=maintenant - timezone.timedelta(days=jours + 1 - i) if i < obtenus else None,
+                )
+
+    def test_classement_final(self):
+        lignes = sorted(defis.classement_final(self.defi.pk), key=lambda ligne: ligne[3])
+        self.assertEqual(
+            [(user_id, obtenus, rang) for user_id, obtenus, _, rang in lignes],
+            [(self.users[2].id, 2, 1), (self.users[0].id, 2, 2), (self.users[1].id, 1, 3)],
+        )
+
+    def test_cloture_unique(self):
+        self.assertEqual(defis.cloturer(self.defi.pk), 3)
+        self.assertFalse(UserBadgeProgress.objects.filter(defi=self.defi, est_fige=False).exists())
+        classes = list(ClassementDefi.objects.filter(defi=self.defi).values_list("user_id", "rang"))
+
+        with CaptureQueriesContext(connection) as requetes:
+            self.assertIsNone(defis.cloturer(self.defi.pk))
+        ecritures = [requete["sql"] for requete in requetes if requete["sql"].startswith(("UPDATE", "INSERT", "DELETE"))]
+        self.assertEqual(len(ecritures), 1)
+        self.assertEqual(list(ClassementDefi.objects.filter(defi=self.defi).values_list("user_id", "rang")), classes)
+        self.assertEqual(defis.cloturer_echus(), [])
+
+
+class RechercheTests(SiteTestCase):
+    """Recherche plein texte de la banque, sans plafond sur le nombre de résultats"""
+
+    @classmethod
+    def setUpTestData(cls):
+        groupe = GroupeMusculaire.objects.create(nom="Bras")
+        for i in range(230):
+            Exercice.objects.create(
+                nom=f"Curl variante {i}", groupe_musculaire=groupe, series_sugg=3, reps_sugg=10,
+                description="Flexion des coudes avec haltères, dos droit.", est_approuve=True,
+            )
+        Exercice.objects.create(
+            nom="Squat", groupe_musculaire=groupe, series_sugg=3, reps_sugg=10,
+            description="Flexion des jambes, curl interdit.", est_approuve=True,
+        )
+
+    def test_total_et_ordre(self):
+        resultats = recherche.filtrer(Exercice.objects.all(), "curl")
+        self.assertEqual(resultats.count(), 231)
+        # Le nom pèse plus que la description
+        self.assertEqual(resultats.last().nom, "Squat")
+        self.assertFalse(recherche.filtrer(Exercice.objects.all(), "?!").exists())
+
+    def test_liste_du_constructeur(self):
+        widget = EntrainementForm().fields["exercice_1"].widget
+        noms = list(widget.filter_queryset(None, "curl variante 22").values_list("nom", flat=True))
+        self.assertEqual(noms[0], "Curl variante 22")
+        self.assertEqual(len(noms), 11)
+        # Aucun début de nom : la recherche plein texte sur la description prend le relais
+        self.assertTrue(widget.filter_queryset(None, "coudes").exists())
+
+    def test_derniere_page_de_la_banque(self):
+        client = Client()
+        client.force_login(User.objects.create(username="athlete", password="x"))
+        reponse = client.get(reverse("bank"), {"recherche": "curl", "page": 12})
+        self.assertContains(reponse, "Page 12 / 12")
+        self.assertContains(reponse, "Squat")
+
+    def test_parametres_invalides_de_la_banque(self):
+        client = Client()
+        client.force_login(User.objects.create(username="athlete", password="x"))
+        reponse = client.get(reverse("bank"), {"groupemusculaire": "abc", "page": "-1"})
+        self.assertContains(reponse, "Page 1 / 12")
+
+
+class ModerationTests(SiteTestCase):
+    """Lot réservé : contenu affiché et corrections limitées au titulaire du bail"""
+
+    def setUp(self):
+        self.groupe = GroupeMusculaire.objects.create(nom="Dos")
+        self.exercice = Exercice.objects.create(
+            nom="Tirage", groupe_musculaire=self.groupe, series_sugg=3, reps_sugg=10,
+            description="Tirage vertical à la poulie haute.",
+        )
+        self.admin = User.objects.create(username="admin", password="x", is_staff=True)
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def donnees(self, **valeurs):
+        return {
+            "nom": "Tirage poulie", "groupe_musculaire": self.groupe.pk, "series_sugg": 4, "reps_sugg": 8,
+            "description": "Tirage vertical à la poulie haute, buste droit.", **valeurs,
+        }
+
+    def test_lot_affiche_la_description(self):
+        reponse = self.client.get(reverse("review"))
+        self.assertContains(reponse, "Tirage vertical à la poulie haute.")
+        self.assertContains(reponse, reverse("reviser_exercice", args=[self.exercice.pk]))
+
+    def test_correction_puis_acceptation(self):
+        self.client.get(reverse("review"))
+        url = reverse("reviser_exercice", args=[self.exercice.pk])
+        self.assertContains(self.client.get(url), "Tirage vertical")
+        self.assertRedirects(self.client.post(url, self.donnees(action="ACCEPTER")), reverse("review"))
+        self.exercice.refresh_from_db()
+        self.assertEqual((self.exercice.nom, self.exercice.series_sugg, self.exercice.est_approuve), ("Tirage poulie", 4, True))
+
+    def test_decision_publie_le_lot(self):
+        moderation.reserver(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(moderation.decider(self.admin, approuves=[self.exercice.pk]), (1, 0))
+        self.assertTrue(recherche.filtrer(Exercice.objects.all(), "poulie").exists())
+        self.assertEqual(moderation.en_attente(), 0)
+
+    def test_correction_sans_bail_refusee(self):
+        self.client.get(reverse("review"))
+        autre = Client()
+        autre.force_login(User.objects.create(username="autre", password="x", is_staff=True))
+        url = reverse("reviser_exercice", args=[self.exercice.pk])
+        self.assertRedirects(autre.post(url, self.donnees()), reverse("review"))
+        self.exercice.refresh_from_db()
+        self.assertEqual(self.exercice.nom, "Tirage")
+
+
+class MetriquesTests(SiteTestCase):
+    """Requêtes SQL comptées par vue, y compris quand l'ORM tourne hors de la boucle d'événements"""
+
+    def sql(self, vue):
+        return metriques.registre.compteurs.get(("repxp_sql_requetes_total", (("vue", vue),)), 0)
+
+    async def test_vue_asynchrone(self):
+        user = await User.objects.acreate(username="athlete", password="x")
+        client = AsyncClient()
+        await client.aforce_login(user)
+        avant = self.sql("bank")
+        reponse = await client.get(reverse("bank"))
+        self.assertEqual(reponse.status_code, 200)
+        self.assertGreater(self.sql("bank"), avant)
+
+    def test_processus_termines_verses_dans_le_cumul(self):
+        dossier, etiquettes = metriques.dossier(), (("espace", "essai"), ("resultat", "local"))
+        registre = metriques.Registre()
+        registre.compter("repxp_cache_total", etiquettes, 3)
+        registre.ecrire()
+        fichier = dossier / registre.fichier
+        self.assertTrue(fichier.exists())
+        registre.clore()
+        self.assertFalse(fichier.exists())
+
+        # Processus tué sans avoir versé ses cumuls
+        abandonne = dossier / "999999999-00000000.json"
+        abandonne.write_text(json.dumps({"compteurs": [["repxp_cache_total", etiquettes, 2]], "histogrammes": []}))
+        ancien = time.time() - metriques.RETENTION - 1
+        os.utime(abandonne, (ancien, ancien))
+        self.assertEqual(metriques.cumuls("repxp_cache_total")[tuple(etiquettes)], 5)
+        self.assertFalse(abandonne.exists())
+        self.assertEqual(metriques.cumuls("repxp_cache_total")[tuple(etiquettes)], 5)
+
+    def test_vue_synchrone(self):
+        client = Client()
+        client.force_login(User.objects.create(username="admin", password="x", is_staff=True))
+        avant = self.sql("review")
+        client.get(reverse("review"))
+        self.assertGreater(self.sql("review"), avant)
+
+
+class CachesTests(SiteTestCase):
+    """Version d'un espace lue d'un seul aller-retour une fois créée"""
+
+    def test_version_sans_add_apres_creation(self):
+        self.assertEqual(caches.version("essai"), 1)
+        caches.invalider("essai")
+        with mock.patch.object(caches.cache, "add") as add:
+            self.assertEqual(caches.version("essai"), 2)
+        add.assert_not_called()
+
+
+class ExportsTests(SiteTestCase):
+    """Exports en flux : en-tête, nombre de lignes et champs joints"""
+
+    def setUp(self):
+        self.user = User.objects.create(username="athlete", password="x")
+        groupe = GroupeMusculaire.objects.create(nom="Jambes")
+        self.entrainement = Entrainement.objects.create(nom="Jambes", createur=self.user)
+        for nom in ("Squat", "Fente"):
+            exercice = Exercice.objects.create(
+                nom=nom, groupe_musculaire=groupe, series_sugg=3, reps_sugg=10, description="Exercice des jambes.",
+            )
+            ExerciceEntrainement.objects.create(entrainement=self.entrainement, exercice=exercice)
+        for _ in range(3):
+            completions.completer_entrainement(self.user, self.entrainement)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def telecharger(self, format):
+        reponse = self.client.get(reverse("exporter_donnees", args=[format]))
+        self.assertEqual(reponse.status_code, 200)
+        self.assertTrue(reponse.streaming)
+        return b"".join(reponse.streaming_content).decode()
+
+    def test_csv_de_l_utilisateur(self):
+        lignes = list(csv.reader(io.StringIO(self.telecharger("csv"))))
+        self.assertEqual(lignes[0], exports.colonnes(exports.sections_utilisateur(self.user.id)))
+        self.assertEqual(lignes[0][0], "type")
+        types = [ligne[0] for ligne in lignes[1:]]
+        self.assertEqual(types, ["statistiques"] + ["entrainement"] * 2 + ["completion"] * 3)
+
+    def test_jsonl_de_l_utilisateur(self):
+        objets = [json.loads(ligne) for ligne in self.telecharger("jsonl").splitlines()]
+        self.assertEqual(len(objets), 6)
+        self.assertEqual({objet["exercice"] for objet in objets if objet["type"] == "entrainement"}, {"Squat", "Fente"})
+        self.assertEqual(objets[0]["entrainements_completes"], 3)
+
+    def test_format_inconnu(self):
+        self.assertEqual(self.client.get(reverse("exporter_donnees", args=["xml"])).status_code, 404)
+
+    def test_commande_en_colonnes(self):
+        # Sans --sortie, l'export est écrit tel quel sur la sortie standard du processus
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as sortie:
+            call_command("exporter_donnees", "entrainements", "--format", "colonnes", "--taille-lot", "1")
+        groupes = [json.loads(ligne) for ligne in sortie.getvalue().splitlines()]
+        self.assertEqual([groupe["lignes"] for groupe in groupes], [1, 1])
+        self.assertEqual([groupe["colonnes"]["exercice"] for groupe in groupes], [["Squat"], ["Fente"]])
+        self.assertEqual(groupes[0]["colonnes"]["createur"], ["athlete"])
+
+    def test_action_de_l_administration(self):
+        autre = User.objects.create(username="autre", password="x")
+        admin = Client()
+        admin.force_login(User.objects.create(username="admin", password="x", is_staff=True, is_superuser=True))
+        reponse = admin.post(reverse("admin:site_web_statistiques_changelist"), {
+            "action": "exporter_csv",
+            "_selected_action": [self.user.statistiques.pk, autre.statistiques.pk],
+        })
+        self.assertEqual(reponse["Content-Disposition"], 'attachment; filename="repxp-statistiques.csv"')
+        lignes = list(csv.reader(io.StringIO(b"".join(reponse.streaming_content).decode())))
+        self.assertEqual(lignes[0], exports.section_statistiques(Statistiques.objects.none()).colonnes)
+        self.assertEqual([ligne[1] for ligne in lignes[1:]], ["athlete", "autre"])
+
+
+class ImagesTests(SiteTestCase):
+    """Présence des variantes gardée en cache par nom de fichier"""
+
+    def test_stockage_interroge_une_fois(self):
+        nom = "avatars/inconnu.png"
+        with mock.patch.object(default_storage, "exists", return_value=True) as exists:
+            for _ in range(3):
+                self.assertTrue(images.variantes_presentes(nom))
+            images._presentes.vider()
+            self.assertTrue(images.variantes_presentes(nom))
+        # Le second appel au stockage est évité par le cache partagé
+        self.assertEqual(exists.call_count, 1)
+
+    def test_suppression_oubliee(self):
+        images.marquer_variantes("avatars/a.png", True)
+        medias.supprimer_fichier("avatars/a.png")
+        with mock.patch.object(default_storage, "exists", return_value=False) as exists:
+            self.assertFalse(images.variantes_presentes("avatars/a.png"))
+        self.assertEqual(exists.call_count, 0)
+
+
+class GenerationTests(SiteTestCase):
+    """Les données générées sont la projection de leur journal de complétions"""
+
+    def test_catalogue_trouve_par_la_recherche(self):
+        call_command("generer_donnees", "--catalogue-seulement", stdout=io.StringIO())
+        self.assertTrue(recherche.filtrer(Exercice.objects.all(), "corde").exists())
+        self.assertTrue(autocompletion.suggestions("cor"))
+
+    def test_statistiques_et_cumuls_issus_du_journal(self):
+        reference = timezone.now()
+        totaux = generation.generer(30, exercices=20, entrainements=2, badges=2, defis=1, maintenant=reference)
+        self.assertGreater(totaux["CompletionEntrainement"], 0)
+        self.assertFalse(CompletionEntrainement.objects.filter(date_completion__gt=reference).exists())
+
+        champs = list(completions.PROJECTION.values())
+        generes = list(Statistiques.objects.order_by("user_id").values_list(*champs))
+        cumuls = sorted(CumulPeriode.objects.values_list("user_id", "granularite", "debut", *champs))
+        completions.reconstruire_statistiques()
+        completions.reconstruire_cumuls()
+        self.assertEqual(generes, list(Statistiques.objects.order_by("user_id").values_list(*champs)))
+        self.assertEqual(cumuls, sorted(CumulPeriode.objects.values_list("user_id", "granularite", "debut", *champs)))
@@ -1,13 +1,18 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from . import views
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('metrics', views.metrics, name='metrics'),
+    path('api/classement/', views.classement_api, name='classement_api'),
     path('exercices/new/', views.creer_exercice, name='creer_exercice'),
     path('exercices/review', views.review, name='review'),
+    path('exercices/review/<int:exercice_id>/', views.reviser_exercice, name='reviser_exercice'),
     path('exercices/bank', views.bank, name='bank'),
+    path('exercices/autocompletion', views.autocompletion_exercices, name='autocompletion_exercices'),
+    re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<chemin>(?:variantes/)?contenu/.+)$', views.media_immuable, name='media_immuable'),
     path('exercices/proposer', views.proposer_exercice, name='proposer_exercice'),
     path('workouts/new', views.new_workout, name='new_workout'),
     path('workouts/edit/<int:workout_id>/', views.edit_workout, name='edit_workout'),
@@ -22,6 +27,7 @@ urlpatterns = [
     path('users/', views.user_search, name='user_search'),
     path('profile/', views.profile, name="profile"),
     path('profile/edit/', views.edit_profile, name="edit_profile"),
+    path('profile/export.<str:format>', views.exporter_donnees, name="exporter_donnees"),
     path('users/', views.user_search, name='user_search'),
     path('badges/create/', views.create_badge, name='create_badge'),
     path('badges/', views.badge_list, name='badge_list'),
@@ -1,41 +1,121 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import uuid
+
+from django.conf import settings
+from django.shortcuts import aget_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, get_user_model
 from django.contrib import messages
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
 from django.core.paginator import Paginator
+from django.db.models import prefetch_related_objects
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.views.static import serve
 from .forms import ExerciceForm, RegisterForm, ConnexionForm, EntrainementForm, UserSearchForm, CustomUserChangeForm, BadgeForm, DefiForm
-from .models import Exercice, ExerciceEntrainement, User, Entrainement, Badge, GroupeMusculaire, Statistiques, DefiBadge
+from . import autocompletion, badges, caches, classement, completions, exports, metriques, moderation, profils
+from . import recherche as index_recherche
+from .models import Exercice, ExerciceEntrainement, User, Entrainement, Badge, GroupeMusculaire, Statistiques, DefiBadge, CumulPeriode
 
 # Create your views here.
 def est_admin(user):
     return user.is_authenticated and user.is_staff
 
-def index(request):
-    """Page d'accueil de activities"""
-    sort_by = request.GET.get('sort')
+async def charger_utilisateur(request):
+    """Utilisateur lu avec l'ORM asynchrone ; les gabarits le relisent ensuite sans requête"""
+    request.user = await request.auser()
+    return request.user
 
-    sort_fields = ['badges_obtenus', 'reps_effectuees', 'sets_effectues','entrainements_completes', 'exercices_completes']
+async def paginer(objets, par_page, numero):
+    """Paginator.get_page pour les vues asynchrones : le total et la page sont lus avant le rendu"""
+    paginator = Paginator(objets, par_page)
+    paginator.count = await objets.acount()
+    page_obj = paginator.get_page(numero)
+    page_obj.object_list = [objet async for objet in page_obj.object_list]
+    return page_obj
 
-    if sort_by not in sort_fields:
-        sort_by = 'badges_obtenus'
+async def index(request):
+    """Page d'accueil de activities"""
+    user = await charger_utilisateur(request)
+    sort_by = request.GET.get('sort')
+    periode = request.GET.get('periode')
 
-    statistiques = Statistiques.objects.select_related('user_id').order_by(f'-{sort_by}')
+    if periode not in classement.PERIODES:
+        periode = None
 
-    classement = []
-    rang = 1
-    for stat in statistiques:
-        classement.append({
-            'rang': rang,
-            'user': stat.user_id,
+    if periode:
+        if sort_by not in classement.CHAMPS_PERIODE:
+            sort_by = classement.CHAMPS_PERIODE[0]
+        lignes = classement.cumuls_periode(sort_by, periode)
+    else:
+        if sort_by not in classement.CHAMPS:
+            sort_by = classement.CHAMP_DEFAUT
+        lignes = classement.RangsClassement(sort_by)
+
+    page_obj = await paginer(lignes, 50, request.GET.get("page"))
+
+    rangs = []
+    for rang, ligne in enumerate(page_obj, page_obj.start_index()):
+        stat = ligne if periode else ligne.statistiques
+        rangs.append({
+            'rang': rang if periode else ligne.rang,
+            'user': stat.user if periode else stat.user_id,
             'sets_effectues': stat.sets_effectues,
             'reps_effectuees': stat.reps_effectuees,
             'entrainements_completes': stat.entrainements_completes,
             'exercices_completes': stat.exercices_completes,
-            'badges_obtenus': stat.badges_obtenus,
+            'badges_obtenus': None if periode else stat.badges_obtenus,
         })
-        rang += 1
 
-    return render(request, "site_web/index.html", {"est_admin": est_admin(request.user),"classement": classement, "current_sort": sort_by})
+    return render(request, "site_web/index.html", {
+        "est_admin": est_admin(user),
+        "classement": rangs,
+        "page_obj": page_obj,
+        "current_sort": sort_by,
+        "periode": periode,
+        "periodes": CumulPeriode.GRANULARITES,
+    })
+
+@login_required
+def classement_api(request):
+    """API JSON du classement : rang de l'utilisateur et ses voisins, paginé par curseurs"""
+    sort_by = request.GET.get('sort')
+    if sort_by not in classement.CHAMPS:
+        sort_by = classement.CHAMP_DEFAUT
+
+    try:
+        n = min(max(int(request.GET.get('n', 5)), 1), 50)
+        apres = request.GET.get('apres')
+        avant = request.GET.get('avant')
+        if apres:
+            resultat = classement.page_apres(sort_by, classement.decoder_curseur(apres), n)
+        elif avant:
+            resultat = classement.page_avant(sort_by, classement.decoder_curseur(avant), n)
+        else:
+            statistiques = Statistiques.objects.filter(user_id=request.user).first()
+            resultat = classement.autour(sort_by, statistiques, n)
+    except ValueError:
+        return JsonResponse({"erreur": "Paramètre invalide."}, status=400)
+
+    def ligne_json(ligne):
+        user = ligne.statistiques.user_id
+        return {
+            "rang": ligne.rang,
+            "valeur": ligne.valeur,
+            "user_id": user.id,
+            "username": user.username,
+            "avatar": user.avatar.url if user.avatar else None,
+        }
+
+    return JsonResponse({
+        "sort": sort_by,
+        "moi": ligne_json(resultat["moi"]) if resultat.get("moi") else None,
+        "lignes": [ligne_json(ligne) for ligne in resultat["lignes"]],
+        "precedent": resultat["precedent"],
+        "suivant": resultat["suivant"],
+    })
 
 def register(request):
     if request.method == 'POST':
@@ -63,60 +143,130 @@ def connexion(request):
 
 @login_required
 def review(request):
+    """File de modération : chaque administrateur travaille sur son propre lot réservé"""
     if not est_admin(request.user):
         messages.error(request,  "Vous n'avez pas la permission d'accéder à cette page.")
         return redirect("index")
 
-    to_review = Exercice.objects.filter(est_approuve=False).count()
-    exercice = Exercice.objects.filter(est_approuve=False).first()
-
     if request.method == "POST":
-        action = request.POST.get("action")
+        if request.POST.get("action") == "LIBERER":
+            moderation.liberer(request.user)
+            messages.info(request, "Les exercices réservés ont été rendus à la file.")
+            return redirect("index")
 
-        if action == "ACCEPTER":
-            form = ExerciceForm(request.POST, request.FILES, instance=exercice)
-            if form.is_valid():
-                approved_exercice = form.save(commit=False)
-                approved_exercice.est_approuve = True
-                approved_exercice.save()
-                messages.success(request,  "Exercice accepté !")
+        decisions = {
+            int(cle.removeprefix("decision_")): valeur
+            for cle, valeur in request.POST.items()
+            if cle.startswith("decision_") and cle.removeprefix("decision_").isdigit()
+        }
+        approuves, refuses = moderation.decider(
+            request.user,
+            approuves=[exercice_id for exercice_id, valeur in decisions.items() if valeur == "ACCEPTER"],
+            refuses=[exercice_id for exercice_id, valeur in decisions.items() if valeur == "REFUSER"],
+        )
+        messages.success(request, f"{approuves} exercice(s) accepté(s), {refuses} refusé(s).")
+        return redirect("review")
+
+    return render(request, "site_web/exercices/review.html", {
+        "exercices": moderation.reserver(request.user),
+        "to_review": moderation.en_attente(),
+        "duree_bail": int(moderation.BAIL.total_seconds() // 60),
+        "est_admin": est_admin(request.user)
+    })
+
+@login_required
+def reviser_exercice(request, exercice_id):
+    """Correction d'un exercice du lot réservé avant la décision ; « ACCEPTER » l'approuve aussitôt"""
+    if not est_admin(request.user):
+        messages.error(request,  "Vous n'avez pas la permission d'accéder à cette page.")
+        return redirect("index")
+
+    exercice = moderation.reserves(request.user).filter(pk=exercice_id).first()
+    if exercice is None:
+        messages.error(request, "Cet exercice ne vous est plus réservé.")
+        return redirect("review")
+
+    if request.method == "POST":
+        form = ExerciceForm(request.POST, request.FILES, instance=exercice)
+        if form.is_valid():
+            if not moderation.enregistrer(request.user, form):
+                messages.error(request, "Le bail de cet exercice a expiré avant l'enregistrement.")
                 return redirect("review")
-        elif action == "REFUSER":
-            exercice.delete()
-            messages.success(request, "Exercice refusé!")
+            if request.POST.get("action") == "ACCEPTER":
+                moderation.decider(request.user, approuves=[exercice.pk])
+                messages.success(request, "Exercice accepté !")
+            else:
+                messages.success(request, "Exercice modifié.")
             return redirect("review")
     else:
         form = ExerciceForm(instance=exercice)
 
-    return render(request, "site_web/exercices/review.html", {
+    return render(request, "site_web/exercices/reviser_exercice.html", {
         "form": form,
-        "exercices": exercice,
-        "to_review": to_review,
+        "exercice": exercice,
         "est_admin": est_admin(request.user)
     })
 
-@login_required
-def bank(request):
-    recherche = request.GET.get("recherche")
-    exercices = Exercice.objects.filter(est_approuve=True)
-    groupe_musculaire_filtre = request.GET.get("groupemusculaire")
-    groupes_musculaires = GroupeMusculaire.objects.all()
+@caches.memoriser("groupes", duree=60 * 60)
+async def groupes_musculaires():
+    return [groupe async for groupe in GroupeMusculaire.objects.order_by("id")]
 
-    if groupe_musculaire_filtre:
-        groupe_musculaire_filtre = int(groupe_musculaire_filtre)
+@caches.memoriser(lambda groupe, recherche, page: f"banque:{groupe or 'tous'}", duree=60 * 60)
+async def resultats_banque(groupe, recherche, page):
+    """Fragment HTML d'une page de résultats de la banque"""
+    exercices = Exercice.objects.filter(est_approuve=True).select_related("groupe_musculaire")
 
     if recherche:
-        exercices = exercices.filter(nom__icontains=recherche)
+        exercices = index_recherche.filtrer(exercices, recherche)
+
+    if groupe:
+        exercices = exercices.filter(groupe_musculaire__id=groupe)
+
+    page_obj = await paginer(exercices, 20, page)
+    return render_to_string("partials/bank_resultats.html", {
+        "page_obj": page_obj,
+        "recherche": recherche,
+        "groupe_musculaire_filtre": groupe,
+    })
+
+@login_required
+async def bank(request):
+    user = await charger_utilisateur(request)
+    recherche = (request.GET.get("recherche") or "").strip()
+    groupe_musculaire_filtre = request.GET.get("groupemusculaire")
+    groupe_musculaire_filtre = int(groupe_musculaire_filtre) if groupe_musculaire_filtre and groupe_musculaire_filtre.isdigit() else None
 
-    if groupe_musculaire_filtre:
-        exercices = exercices.filter(groupe_musculaire__id=groupe_musculaire_filtre)
+    page = request.GET.get("page")
+    page = page if page and page.isdigit() else "1"
 
     return render(request, 'site_web/exercices/bank.html', {
-        'exercices': exercices,
-        'est_admin': est_admin(request.user),
-        'groupe_musculaire_filtre' : groupe_musculaire_filtre, 'groupes_musculaires' : groupes_musculaires
+        'resultats': await resultats_banque(groupe_musculaire_filtre, recherche, page),
+        'recherche': recherche,
+        'est_admin': est_admin(user),
+        'compteurs_cache': await caches.acompteurs("banque") if est_admin(user) else None,
+        'groupe_musculaire_filtre' : groupe_musculaire_filtre, 'groupes_musculaires' : await groupes_musculaires()
     })
 
+@login_required
+def autocompletion_exercices(request):
+    """API JSON des suggestions d'exercices pour un préfixe, servie par l'index en mémoire"""
+    return JsonResponse({"resultats": autocompletion.suggestions(request.GET.get("q", ""))})
+
+def metrics(request):
+    """Métriques Prometheus de toutes les vues, pour le personnel ou un collecteur muni du jeton"""
+    jeton = settings.METRIQUES_JETON
+    entete = request.headers.get("Authorization", "")
+    if not est_admin(request.user) and not (jeton and constant_time_compare(entete, f"Bearer {jeton}")):
+        return HttpResponseForbidden()
+    return HttpResponse(metriques.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+def media_immuable(request, chemin):
+    """Sert un fichier stocké par empreinte (ou une de ses variantes) avec un cache d'un an"""
+    # serve() lève Http404 : seules les réponses trouvées reçoivent les en-têtes immuables
+    reponse = serve(request, chemin, document_root=settings.MEDIA_ROOT)
+    patch_cache_control(reponse, public=True, max_age=365 * 24 * 3600, immutable=True)
+    return reponse
+
 @login_required
 def creer_exercice(request):
     """Vue pour créer un exercice par un admin"""
@@ -209,15 +359,16 @@ def edit_workout(request, workout_id):
                         return render(request, 'site_web/workouts/edit_workout.html', {"est_admin": est_admin(request.user), "entrainement": entrainement, "form": form, "exercices": exercices})
                     exercices_ids.append(ex_id)
 
-                entrainement.nom = form.cleaned_data["nom"]
-                entrainement.save()
-
                 for i, exercice in enumerate(exercices, 1):
                     exercice.exercice = form.cleaned_data[f"exercice_{i}"]
                     exercice.sets = form.cleaned_data[f"sets_{i}"]
                     exercice.reps = form.cleaned_data[f"reps_{i}"]
                     exercice.save()
 
+                # Enregistré en dernier : sa date de modification change la clé de son fragment en cache
+                entrainement.nom = form.cleaned_data["nom"]
+                entrainement.save()
+
                 messages.success(request, "Entraînement modifié !")
                 return redirect("my_workouts")
         else:
@@ -238,27 +389,61 @@ def edit_workout(request, workout_id):
 @login_required
 def my_workouts(request):
     """Vue pour voir mes entraînements"""
-    recherche = request.GET.get("recherche")
-    entrainements = Entrainement.objects.filter(createur=request.user).prefetch_related('exerciceentrainement_set')
+    recherche = request.GET.get("recherche", "")
+    entrainements = Entrainement.objects.filter(createur=request.user).order_by('nom', 'id')
 
     if recherche:
         entrainements = entrainements.filter(nom__icontains=recherche)
+    page_obj = Paginator(entrainements, 20).get_page(request.GET.get("page"))
+    page_obj.object_list = list(page_obj.object_list)
+
+    # Les fragments varient aussi avec les noms d'exercices (espace « entrainements ») et
+    # avec les actions de l'utilisateur sur ses entraînements
+    version_fragments = f"{caches.version('entrainements')}.{caches.version(f'entrainements:{request.user.id}')}"
+
+    # Les exercices ne sont chargés, en une seule chaîne de prefetch, que pour les fragments absents du cache
+    cles = {
+        entrainement.pk: make_template_fragment_key(
+            "entrainement", [entrainement.id, entrainement.date_modification, version_fragments]
+        )
+        for entrainement in page_obj
+    }
+    presents = cache.get_many(cles.values())
+    prefetch_related_objects(
+        [entrainement for entrainement in page_obj if cles[entrainement.pk] not in presents],
+        'exerciceentrainement_set__exercice',
+    )
     return render(request, 'site_web/workouts/my_workouts.html', {
-        "entrainements": entrainements, "est_admin": est_admin(request.user)})
+        "page_obj": page_obj,
+        "recherche": recherche,
+        "version_fragments": version_fragments,
+        "cle_completion": uuid.uuid4().hex,
+        "est_admin": est_admin(request.user)})
 
 @login_required
-def profile(request):
-    user = request.user
-    statistiques = Statistiques.objects.get_or_create(user_id=user)
+async def profile(request):
+    user = await charger_utilisateur(request)
 
     context = {
         "user": user,
-        "stats": statistiques,
+        "stats": await profils.astatistiques(user.id),
         "est_admin": est_admin(user),
     }
 
     return render(request, "site_web/profil/profil.html", context)
 
+@login_required
+def exporter_donnees(request, format):
+    """Télécharge en flux l'historique complet de l'utilisateur (CSV ou JSON Lines)"""
+    if format not in exports.FORMATS:
+        raise Http404("Format d'export inconnu.")
+    return exports.reponse(
+        request,
+        exports.sections_utilisateur(request.user.id),
+        format,
+        f"repxp-{request.user.username}",
+    )
+
 @login_required()
 def edit_profile(request):
     if request.method == 'POST':
@@ -274,11 +459,12 @@ def edit_profile(request):
     return render(request, 'site_web/profil/edit_profil.html', {'form': form, "est_admin": est_admin(request.user)})
 
 @login_required
-def user_search(request):
+async def user_search(request):
     """Vue pour rechercher des utilisateurs"""
+    user = await charger_utilisateur(request)
 
     form = UserSearchForm(request.GET or None)
-    if request.user.is_staff or request.user.is_superuser:
+    if user.is_staff or user.is_superuser:
         users = User.objects.all().order_by("username")
     else:
         users = User.objects.filter(is_staff=False, is_superuser=False).order_by("username")
@@ -288,9 +474,7 @@ def user_search(request):
         if username:
             users = users.filter(username__icontains=username)
 
-    paginator = Paginator(users, 15)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    page_obj = await paginer(users, 15, request.GET.get("page"))
 
     return render(
         request,
@@ -298,7 +482,7 @@ def user_search(request):
         {
             "form": form,
             "page_obj": page_obj,
-            "username": form.cleaned_data.get("username") if form.is_valid() else "", "est_admin": est_admin(request.user)
+            "username": form.cleaned_data.get("username") if form.is_valid() else "", "est_admin": est_admin(user)
         },
     )
 
@@ -323,26 +507,12 @@ def complete_workout(request, workout_id):
 
     if entrainement.createur == request.user:
         if request.method == "POST":
-            entrainement = Entrainement.objects.get(id=workout_id, createur=request.user)
+            completion, cree = completions.completer_entrainement(request.user, entrainement, request.POST.get("cle"))
 
-            statistiques, _ = Statistiques.objects.get_or_create(user_id=request.user)
-
-            total_sets = 0
-            total_reps = 0
-            exercices_count = 0
-
-            for exercice in entrainement.exerciceentrainement_set.all():
-                total_sets += exercice.sets
-                total_reps += exercice.sets * exercice.reps
-                exercices_count += 1
-
-            statistiques.sets_effectues += total_sets
-            statistiques.reps_effectuees += total_reps
-            statistiques.entrainements_completes += 1
-            statistiques.exercices_completes += exercices_count
-            statistiques.save()
-
-            messages.success(request, f"Entraînement complété! +{total_sets} sets, +{total_reps} reps")
+            if cree:
+                messages.success(request, f"Entraînement complété! +{completion.sets} sets, +{completion.reps} reps")
+            else:
+                messages.info(request, "Cet entraînement a déjà été comptabilisé.")
         return redirect("my_workouts")
     else:
             messages.error(request, "Vous n'avez pas la permission d'accéder à cette page.")
@@ -350,21 +520,20 @@ def complete_workout(request, workout_id):
 
 
 @login_required
-def view_other_user_profile(request, user_id):
+async def view_other_user_profile(request, user_id):
     """Vue pour voir le profil d'un autre utilisateur"""
-    other_user = get_object_or_404(get_user_model(), id=user_id)
+    user = await charger_utilisateur(request)
+    other_user = await aget_object_or_404(get_user_model(), id=user_id)
 
-    if not request.user.is_staff and not request.user.is_superuser:
+    if not user.is_staff and not user.is_superuser:
         if other_user.is_staff or other_user.is_superuser:
             messages.error(request, "Vous n'avez pas la permission de voir ce profil.")
             return redirect("index")
 
-    statistiques = Statistiques.objects.get_or_create(user_id=other_user)
-
     context = {
         "other_user": other_user,
-        "stats": statistiques,
-        "est_admin": est_admin(request.user),
+        "stats": await profils.astatistiques(other_user.id),
+        "est_admin": est_admin(user),
     }
     return render(request, "site_web/profil/other_user_profile.html", context)
 
@@ -387,14 +556,17 @@ def create_badge(request):
 
     return render(request, "site_web/badges/create_badge.html", {"form": form})
 
+@caches.memoriser("badges", duree=60 * 60)
+def badges_disponibles():
+    return list(Badge.objects.order_by("categorie", "nom"))
+
 @login_required
 def badge_list(request):
     """Vue pour afficher la liste des badges disponibles."""
-    badges = Badge.objects.all().order_by("categorie", "nom")
     if not (request.user.is_staff or request.user.is_superuser):
         messages.error(request, "Vous n'avez pas la permission d'accéder à cette page.")
         return redirect("index")
-    return render(request, "site_web/badges/badge_list.html", {"badges": badges})
+    return render(request, "site_web/badges/badge_list.html", {"badges": badges_disponibles()})
 
 @login_required
 def create_defi(request):
@@ -411,8 +583,9 @@ def create_defi(request):
 
             for badge in form.cleaned_data['badges']:
                 DefiBadge.objects.create(defi=defi, badge=badge)
+            attribues = badges.evaluer_defi(defi)
 
-            messages.success(request, "Défi créé avec succès !")
+            messages.success(request, f"Défi créé avec succès ! {attribues} badge(s) déjà obtenu(s) par les participants.")
             return redirect('index')
     else:
         form = DefiForm()